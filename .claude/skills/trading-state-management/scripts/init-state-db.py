@@ -11,7 +11,8 @@
     - trades: 約定済み取引
     - daily_performance: 日次パフォーマンス
     - strategy_params: 戦略パラメータ履歴
-    - execution_logs: 実行ログ
+    - execution_logs: 実行ログ（execution_logs_v ビュー経由で読み書き）
+    - event_types / log_levels: 実行ログのenumルックアップ
 """
 
 import argparse
@@ -20,6 +21,23 @@ import sqlite3
 import sys
 from datetime import datetime
 
+# スキーマバージョン（PRAGMA user_version に記録。一致すればDDLをスキップ）
+SCHEMA_VERSION = 1
+
+# 接続単位のパフォーマンス設定（スキーマ作成前に適用）
+# page_size は DB作成時に固定されるため、journal_mode=WAL より前に単独で設定する
+PAGE_SIZE_SQL = "PRAGMA page_size=4096"
+
+PRAGMA_SQL = """
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA mmap_size=268435456;
+PRAGMA cache_size=-65536;
+"""
+
+# 時刻カラム（*_at, timestamp, last_updated, effective_*）は UTC epoch ミリ秒の INTEGER。
+# TEXT比較や julianday() 変換を避け、範囲検索・ソート・差分計算を整数演算で行う。
+# 取引日を表す entry_date / close_date / date は 'YYYY-MM-DD' の TEXT のまま。
 SCHEMA_SQL = """
 -- ポジション管理
 CREATE TABLE IF NOT EXISTS positions (
@@ -34,7 +52,7 @@ CREATE TABLE IF NOT EXISTS positions (
     take_profit_price REAL,
     strategy TEXT,
     entry_date TEXT NOT NULL,
-    last_updated TEXT NOT NULL,
+    last_updated INTEGER NOT NULL,
     status TEXT NOT NULL DEFAULT 'open' CHECK(status IN ('open', 'closed')),
     close_date TEXT,
     close_price REAL,
@@ -46,6 +64,8 @@ CREATE TABLE IF NOT EXISTS positions (
 CREATE INDEX IF NOT EXISTS idx_positions_symbol ON positions(symbol);
 CREATE INDEX IF NOT EXISTS idx_positions_status ON positions(status);
 CREATE INDEX IF NOT EXISTS idx_positions_entry_date ON positions(entry_date);
+-- 複合インデックス: status='open' AND symbol=? をインデックスのみで解決
+CREATE INDEX IF NOT EXISTS idx_positions_status_symbol ON positions(status, symbol);
 
 -- 注文記録
 CREATE TABLE IF NOT EXISTS orders (
@@ -63,10 +83,10 @@ CREATE TABLE IF NOT EXISTS orders (
     status TEXT NOT NULL DEFAULT 'new',
     filled_qty REAL DEFAULT 0,
     filled_avg_price REAL,
-    submitted_at TEXT NOT NULL,
-    filled_at TEXT,
-    canceled_at TEXT,
-    expired_at TEXT,
+    submitted_at INTEGER NOT NULL,
+    filled_at INTEGER,
+    canceled_at INTEGER,
+    expired_at INTEGER,
     strategy TEXT,
     signal_score REAL,
     notes TEXT
@@ -74,8 +94,11 @@ CREATE TABLE IF NOT EXISTS orders (
 
 CREATE INDEX IF NOT EXISTS idx_orders_symbol ON orders(symbol);
 CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);
-CREATE INDEX IF NOT EXISTS idx_orders_submitted_at ON orders(submitted_at);
+-- 時系列カラムは「新しい順」で読むため DESC インデックス（ORDER BY ... DESC の一時B-tree回避）
+CREATE INDEX IF NOT EXISTS idx_orders_submitted_at ON orders(submitted_at DESC);
 CREATE INDEX IF NOT EXISTS idx_orders_alpaca_id ON orders(alpaca_order_id);
+CREATE INDEX IF NOT EXISTS idx_orders_symbol_status_submitted
+    ON orders(symbol, status, submitted_at);
 
 -- 約定済み取引
 CREATE TABLE IF NOT EXISTS trades (
@@ -89,23 +112,29 @@ CREATE TABLE IF NOT EXISTS trades (
     commission REAL DEFAULT 0,
     slippage REAL DEFAULT 0,
     pnl REAL,
-    pnl_pct REAL,
-    holding_period_days INTEGER,
+    -- pnl_pct / holding_period_days はエンジン側で算出する（INSERTで指定しない）
+    pnl_pct REAL GENERATED ALWAYS AS (
+        CASE WHEN total_value != 0 THEN pnl * 100.0 / total_value END
+    ) STORED,
+    holding_period_days INTEGER GENERATED ALWAYS AS (
+        (timestamp - entry_timestamp) / 86400000
+    ) VIRTUAL,
     strategy TEXT,
     entry_reason TEXT,
     exit_reason TEXT,
-    timestamp TEXT NOT NULL,
+    entry_timestamp INTEGER,
+    timestamp INTEGER NOT NULL,
     notes TEXT
 );
 
 CREATE INDEX IF NOT EXISTS idx_trades_symbol ON trades(symbol);
-CREATE INDEX IF NOT EXISTS idx_trades_timestamp ON trades(timestamp);
+CREATE INDEX IF NOT EXISTS idx_trades_timestamp ON trades(timestamp DESC);
 CREATE INDEX IF NOT EXISTS idx_trades_strategy ON trades(strategy);
+CREATE INDEX IF NOT EXISTS idx_trades_symbol_timestamp ON trades(symbol, timestamp DESC);
 
--- 日次パフォーマンス
+-- 日次パフォーマンス（主キー=日付のため WITHOUT ROWID で1本のB-treeに集約）
 CREATE TABLE IF NOT EXISTS daily_performance (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    date TEXT NOT NULL UNIQUE,
+    date TEXT PRIMARY KEY,
     portfolio_value REAL NOT NULL,
     cash REAL NOT NULL,
     positions_value REAL NOT NULL,
@@ -120,9 +149,7 @@ CREATE TABLE IF NOT EXISTS daily_performance (
     sharpe_ratio_30d REAL,
     benchmark_return_pct REAL,
     notes TEXT
-);
-
-CREATE INDEX IF NOT EXISTS idx_daily_perf_date ON daily_performance(date);
+) WITHOUT ROWID;
 
 -- 戦略パラメータ履歴
 CREATE TABLE IF NOT EXISTS strategy_params (
@@ -130,52 +157,95 @@ CREATE TABLE IF NOT EXISTS strategy_params (
     strategy_name TEXT NOT NULL,
     params_json TEXT NOT NULL,
     version TEXT NOT NULL,
-    effective_from TEXT NOT NULL,
-    effective_to TEXT,
+    effective_from INTEGER NOT NULL,
+    effective_to INTEGER,
     change_reason TEXT,
     performance_before TEXT,
-    created_at TEXT NOT NULL DEFAULT (datetime('now'))
+    created_at INTEGER NOT NULL DEFAULT (CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER))
 );
 
 CREATE INDEX IF NOT EXISTS idx_strategy_params_name ON strategy_params(strategy_name);
 CREATE INDEX IF NOT EXISTS idx_strategy_params_effective ON strategy_params(effective_from);
 
 -- 実行ログ
+-- 行数が際限なく増えるため、event_type / level は整数IDで保持して行幅とインデックスを縮める。
+-- 参照・書き込みは TEXT を返す execution_logs_v ビュー経由で行う。
+CREATE TABLE IF NOT EXISTS log_levels (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+INSERT OR IGNORE INTO log_levels (id, name) VALUES
+    (1, 'debug'), (2, 'info'), (3, 'warning'), (4, 'error'), (5, 'critical');
+
+CREATE TABLE IF NOT EXISTS event_types (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
 CREATE TABLE IF NOT EXISTS execution_logs (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
-    timestamp TEXT NOT NULL DEFAULT (datetime('now')),
-    event_type TEXT NOT NULL,
+    timestamp INTEGER NOT NULL DEFAULT (CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)),
+    event_type_id INTEGER NOT NULL REFERENCES event_types(id),
     details_json TEXT,
-    level TEXT NOT NULL DEFAULT 'info'
-        CHECK(level IN ('debug', 'info', 'warning', 'error', 'critical')),
+    level_id INTEGER NOT NULL DEFAULT 2 REFERENCES log_levels(id),
     agent_version TEXT,
     execution_time_ms INTEGER,
     tokens_used INTEGER,
     cost_usd REAL
 );
 
-CREATE INDEX IF NOT EXISTS idx_exec_logs_timestamp ON execution_logs(timestamp);
-CREATE INDEX IF NOT EXISTS idx_exec_logs_level ON execution_logs(level);
-CREATE INDEX IF NOT EXISTS idx_exec_logs_event ON execution_logs(event_type);
-
--- メタデータテーブル（スキーマバージョン管理）
+CREATE INDEX IF NOT EXISTS idx_exec_logs_timestamp ON execution_logs(timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_exec_logs_level ON execution_logs(level_id);
+CREATE INDEX IF NOT EXISTS idx_exec_logs_event ON execution_logs(event_type_id);
+CREATE INDEX IF NOT EXISTS idx_exec_logs_event_ts
+    ON execution_logs(event_type_id, timestamp DESC);
+
+CREATE VIEW IF NOT EXISTS execution_logs_v AS
+SELECT l.id, l.timestamp, e.name AS event_type, l.details_json, v.name AS level,
+       l.agent_version, l.execution_time_ms, l.tokens_used, l.cost_usd
+FROM execution_logs l
+JOIN event_types e ON e.id = l.event_type_id
+JOIN log_levels v ON v.id = l.level_id;
+
+-- ビューへのINSERTを整数IDに変換する（未知のevent_typeは自動登録、未知のlevelはNOT NULL違反）
+CREATE TRIGGER IF NOT EXISTS execution_logs_v_insert
+INSTEAD OF INSERT ON execution_logs_v
+BEGIN
+    INSERT OR IGNORE INTO event_types (name) VALUES (NEW.event_type);
+    INSERT INTO execution_logs (
+        timestamp, event_type_id, details_json, level_id,
+        agent_version, execution_time_ms, tokens_used, cost_usd
+    ) VALUES (
+        COALESCE(NEW.timestamp, (CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER))),
+        (SELECT id FROM event_types WHERE name = NEW.event_type),
+        NEW.details_json,
+        (SELECT id FROM log_levels WHERE name = COALESCE(NEW.level, 'info')),
+        NEW.agent_version, NEW.execution_time_ms, NEW.tokens_used, NEW.cost_usd
+    );
+END;
+
+-- メタデータテーブル（スキーマバージョン管理、キー検索のみなので WITHOUT ROWID）
 CREATE TABLE IF NOT EXISTS schema_meta (
     key TEXT PRIMARY KEY,
     value TEXT NOT NULL,
-    updated_at TEXT NOT NULL DEFAULT (datetime('now'))
-);
+    updated_at INTEGER NOT NULL DEFAULT (CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER))
+) WITHOUT ROWID;
 """
 
 INITIAL_DATA_SQL = """
 -- スキーマバージョン
-INSERT OR REPLACE INTO schema_meta (key, value, updated_at)
-VALUES ('schema_version', '1.0', datetime('now'));
+INSERT OR REPLACE INTO schema_meta (key, value)
+VALUES ('schema_version', '1.0');
+
+INSERT OR REPLACE INTO schema_meta (key, value)
+VALUES ('created_at', datetime('now'));
 
-INSERT OR REPLACE INTO schema_meta (key, value, updated_at)
-VALUES ('created_at', datetime('now'), datetime('now'));
+INSERT OR REPLACE INTO schema_meta (key, value)
+VALUES ('description', 'Alpaca Trading Bot State Database');
 
-INSERT OR REPLACE INTO schema_meta (key, value, updated_at)
-VALUES ('description', 'Alpaca Trading Bot State Database', datetime('now'));
+-- クエリプランナーが複合インデックスを選択できるよう統計情報を収集
+ANALYZE;
 """
 
 
@@ -187,8 +257,16 @@ def init_database(db_path: str, force: bool = False) -> None:
     if db_dir:
         os.makedirs(db_dir, exist_ok=True)
 
-    # 既存チェック
+    # 既存チェック（最新スキーマなら何もしない）
     if os.path.exists(db_path) and not force:
+        conn = sqlite3.connect(db_path)
+        try:
+            user_version = conn.execute("PRAGMA user_version").fetchone()[0]
+        finally:
+            conn.close()
+        if user_version == SCHEMA_VERSION:
+            print(f"スキーマは最新です (user_version={SCHEMA_VERSION}): {db_path}")
+            return
         print(f"データベースが既に存在します: {db_path}")
         print("上書きするには --force オプションを使用してください")
         sys.exit(1)
@@ -201,18 +279,22 @@ def init_database(db_path: str, force: bool = False) -> None:
     # DB作成
     conn = sqlite3.connect(db_path)
     try:
+        conn.execute(PAGE_SIZE_SQL)
+
         # WALモード有効化（読み書きの並行処理を改善）
+        # journal_mode はトランザクション内で変更できないためスクリプトの前に実行
         conn.execute("PRAGMA journal_mode=WAL")
 
-        # スキーマ作成
-        conn.executescript(SCHEMA_SQL)
-        print("テーブル作成完了")
-
-        # 初期データ投入
-        conn.executescript(INITIAL_DATA_SQL)
-        print("初期データ投入完了")
-
-        conn.commit()
+        # PRAGMA + スキーマ作成 + 初期データ投入を1回のスクリプト・1トランザクションで実行
+        conn.executescript(
+            PRAGMA_SQL
+            + "BEGIN;\n"
+            + SCHEMA_SQL
+            + INITIAL_DATA_SQL
+            + f"PRAGMA user_version={SCHEMA_VERSION};\n"
+            + "COMMIT;\n"
+        )
+        print("テーブル作成・初期データ投入完了")
 
         # テーブル一覧の確認
         cursor = conn.execute(
@@ -8,44 +8,50 @@ Usage:
     python main.py midday       # 日中モニタリング
     python main.py eod          # EODスナップショット
     python main.py health_check # ヘルスチェック
+    python main.py midday --daemon --interval 5  # 常駐して5分ごとにモニタリング
 """
 
 import argparse
+import contextlib
 import fcntl
-import json
+import functools
 import logging
 import os
 import sqlite3
 import sys
 import time
-from datetime import date, datetime
+from collections.abc import Iterator
+from datetime import UTC, date, datetime, timedelta
+from typing import Any
 
-from modules.config import AppConfig, load_config
+import orjson
+
+from modules.config import AppConfig, get_config
 from modules.data_collector import collect_market_data
-from modules.db import init_db
-from modules.health import run_full_health_check
-from modules.llm_analyzer import get_trading_decisions
+from modules.db import archive_execution_logs, init_db, open_reader
+from modules.health import CRITICAL_CHECKS, run_full_health_check
+from modules.llm_analyzer import get_trading_decisions, prewarm_claude
 from modules.logger import setup_logger
 from modules.macro import classify_vix_regime, determine_macro_regime
 from modules.order_executor import AlpacaOrderExecutor
 from modules.risk_manager import AlpacaRiskManager
 from modules.state_manager import AlpacaStateManager
-from modules.types import Action
-from modules.universe import get_sector, get_symbols
+from modules.types import Action, OrderResult, TradingDecision
+from modules.universe import get_sectors, get_symbols
+from modules.vix_cache import get_vix
 
 logger = logging.getLogger("trading_agent")
 
 VALID_MODES = ("morning", "midday", "eod", "health_check", "preflight", "report")
+# morning/eod は1日1回の発注・スナップショットを伴うため常駐反復の対象外とする
+DAEMON_MODES = ("midday",)
 
 
-def _fetch_vix() -> float:
-    """yfinanceからVIX指数を取得する。失敗時はデフォルト20.0。"""
+def _fetch_vix(config: AppConfig) -> float:
+    """VIX指数を取得する（TTL付きファイルキャッシュ経由）。失敗時はデフォルト20.0。"""
     try:
-        import yfinance as yf
-
-        vix_data = yf.Ticker("^VIX").history(period="1d")
-        if not vix_data.empty:
-            vix_val = float(vix_data["Close"].iloc[-1])
+        vix_val = get_vix(config.system.cache_dir, config.system.vix_cache_ttl_seconds)
+        if vix_val is not None:
             logger.info(f"VIX fetched: {vix_val:.2f}")
             return vix_val
     except Exception as e:
@@ -61,7 +67,23 @@ def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
         choices=VALID_MODES,
         help="Execution mode",
     )
-    return parser.parse_args(argv)
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep running and repeat the pipeline every --interval minutes",
+    )
+    parser.add_argument(
+        "--interval",
+        type=int,
+        default=5,
+        help="Daemon interval in minutes (default: 5)",
+    )
+    args = parser.parse_args(argv)
+    if args.daemon and args.mode not in DAEMON_MODES:
+        parser.error(f"--daemon is not supported for mode '{args.mode}'")
+    if args.interval < 1:
+        parser.error("--interval must be >= 1")
+    return args
 
 
 def generate_execution_id(mode: str) -> str:
@@ -70,8 +92,72 @@ def generate_execution_id(mode: str) -> str:
     return f"{now.strftime('%Y%m%d')}_{mode}_{now.strftime('%H%M%S')}"
 
 
-def is_market_open() -> bool:
-    """市場オープン確認 (exchange_calendars)。
+_SESSION_LOOKAHEAD_DAYS = 30
+_TRADING_DAYS_FILL_DAYS = 365
+
+_SQL_TRADING_DAY_LOOKUP = """SELECT
+    EXISTS(SELECT 1 FROM trading_days WHERE date = ?) AS is_session,
+    (SELECT MAX(date) FROM trading_days) AS covered_until"""
+
+_SQL_INSERT_TRADING_DAY = "INSERT OR IGNORE INTO trading_days (date) VALUES (?)"
+
+
+@functools.lru_cache(maxsize=1)
+def _nyse_calendar() -> Any:
+    """XNYS カレンダーを返す。構築コストが大きいため1プロセスで1回だけ生成する。
+
+    例外はキャッシュされないため、失敗時は次回呼び出しで再試行される。
+    """
+    import exchange_calendars as xcals
+
+    return xcals.get_calendar("XNYS")
+
+
+def _nyse_sessions(start: str, days: int) -> list[str]:
+    """start から days 日分のNYSE取引日をISO文字列で返す（カレンダー範囲で打ち切り）。"""
+    nyse = _nyse_calendar()
+    end = min(
+        date.fromisoformat(start) + timedelta(days=days),
+        nyse.last_session.date(),
+    )
+    return list(nyse.sessions_in_range(start, end.isoformat()).strftime("%Y-%m-%d"))
+
+
+@functools.lru_cache(maxsize=1)
+def _upcoming_sessions(start: str) -> frozenset[str]:
+    """start から _SESSION_LOOKAHEAD_DAYS 日分のNYSE取引日をISO文字列の集合で返す。
+
+    日付をキーにキャッシュするため、カレンダー構築（祝日ルール解析）は
+    1プロセス・1日あたり1回で済む。例外はキャッシュされない。
+    """
+    return frozenset(_nyse_sessions(start, _SESSION_LOOKAHEAD_DAYS))
+
+
+def _refresh_trading_days(conn: sqlite3.Connection, start: str) -> None:
+    """trading_days に start から1年分の取引日を補充する。"""
+    conn.executemany(
+        _SQL_INSERT_TRADING_DAY,
+        ((d,) for d in _nyse_sessions(start, _TRADING_DAYS_FILL_DAYS)),
+    )
+    conn.commit()
+    logger.info(f"Refreshed trading_days from {start}")
+
+
+def _is_trading_day(conn: sqlite3.Connection, day: str) -> bool:
+    """trading_days テーブルで取引日判定。未収録の日付なら補充してから判定する。"""
+    row = conn.execute(_SQL_TRADING_DAY_LOOKUP, (day,)).fetchone()
+    if row[1] is None or row[1] < day:
+        _refresh_trading_days(conn, day)
+        row = conn.execute(_SQL_TRADING_DAY_LOOKUP, (day,)).fetchone()
+    return bool(row[0])
+
+
+def is_market_open(conn: sqlite3.Connection | None = None) -> bool:
+    """市場オープン確認。
+
+    conn を渡すと trading_days テーブルを1クエリ引くだけで判定する
+    （exchange_calendars の読込は約1年に1回の補充時のみ）。
+    conn なしの場合は exchange_calendars で直接判定する。
 
     FORCE_MARKET_OPEN=true を設定すると時間外でもパイプラインを実行できる。
     注文はキューに入り次の市場オープン時に執行される。
@@ -81,20 +167,39 @@ def is_market_open() -> bool:
         return True
 
     try:
-        import exchange_calendars as xcals
-
-        nyse = xcals.get_calendar("XNYS")
-        today = date.today()
-        return nyse.is_session(today.isoformat())
+        today = date.today().isoformat()
+        if conn is not None:
+            return _is_trading_day(conn, today)
+        return today in _upcoming_sessions(today)
     except Exception as e:
         logger.warning(f"Could not check market calendar: {e}")
         return True  # フォールバック: 実行を許可
 
 
+def _seconds_until_session(now: datetime) -> float:
+    """NYSE の取引時間中なら 0、時間外なら次の寄り付きまでの秒数を返す。
+
+    now はタイムゾーン付きの現在時刻。FORCE_MARKET_OPEN=true やカレンダー取得失敗時は
+    is_market_open と同様に 0（実行を許可）を返す。
+    """
+    if os.environ.get("FORCE_MARKET_OPEN", "").lower() == "true":
+        return 0.0
+    try:
+        minute = now.astimezone(UTC).replace(second=0, microsecond=0)
+        nyse = _nyse_calendar()
+        if nyse.is_open_on_minute(minute):
+            return 0.0
+        return max(0.0, float((nyse.next_open(minute) - now).total_seconds()))
+    except Exception as e:
+        logger.warning(f"Could not check market session: {e}")
+        return 0.0
+
+
 def run_health_check(config: AppConfig, conn: sqlite3.Connection) -> bool:
     """包括的ヘルスチェック: paper, API, DB, 実行ログ, 回路ブレーカー, ディスク。"""
     logger.info("Running health check...")
-    report = run_full_health_check(config, conn)
+    fail_fast_on = CRITICAL_CHECKS if config.system.health_check_fail_fast else frozenset()
+    report = run_full_health_check(config, conn, fail_fast_on=fail_fast_on)
     logger.info(report.summary())
     return report.all_ok
 
@@ -106,7 +211,7 @@ def run_preflight() -> int:
 
     # 1. config.toml
     try:
-        config = load_config()
+        config = get_config()
         print(f"[OK] config.toml loaded (paper={config.alpaca.paper})")
     except Exception as e:
         print(f"[NG] config.toml: {e}")
@@ -156,7 +261,7 @@ def run_preflight() -> int:
         all_ok = False
 
     # 6. VIX data
-    vix = _fetch_vix()
+    vix = _fetch_vix(config)
     if vix != 20.0:
         print(f"[OK] VIX live data: {vix:.2f}")
     else:
@@ -186,11 +291,33 @@ def run_preflight() -> int:
     return 0 if all_ok else 1
 
 
+_SQL_REPORT_TRADE_STATS = """SELECT
+    COUNT(CASE WHEN status = 'closed' THEN 1 END) AS total,
+    COUNT(CASE WHEN status = 'closed' AND pnl > 0 THEN 1 END) AS wins,
+    COALESCE(SUM(CASE WHEN status = 'closed' THEN pnl END), 0) AS total_pnl,
+    COUNT(CASE WHEN status = 'open' THEN 1 END) AS open_count,
+    AVG(CASE WHEN status = 'closed' AND pnl > 0 THEN pnl END) AS avg_win,
+    AVG(CASE WHEN status = 'closed' AND pnl <= 0 THEN pnl END) AS avg_loss
+FROM positions"""
+
+_SQL_REPORT_MAX_DRAWDOWN = "SELECT MAX(drawdown_pct) FROM daily_snapshots"
+
+_SQL_REPORT_LATEST_SNAPSHOT = """SELECT date, total_equity, daily_pnl_pct, macro_regime, vix_close
+FROM daily_snapshots ORDER BY date DESC LIMIT 1"""
+
+_SQL_REPORT_RECENT_EXECUTIONS = """SELECT execution_id, mode, status, execution_time_ms
+FROM execution_logs ORDER BY started_at DESC LIMIT 5"""
+
+_SQL_REPORT_LATEST_CIRCUIT_BREAKER = """SELECT level, triggered_at
+FROM circuit_breaker ORDER BY triggered_at DESC LIMIT 1"""
+
+
 def run_report() -> int:
     """パフォーマンスレポートを表示する。"""
-    config = load_config()
+    config = get_config()
     conn = init_db(config.system.db_path)
-    conn.row_factory = sqlite3.Row
+    # 1回限りの集計を読むだけなので Row ラッパーを生成せずタプルで受け取る
+    conn.row_factory = None
 
     print("=== Trading Performance Report ===\n")
 
@@ -211,24 +338,10 @@ def run_report() -> int:
     except Exception:
         pass
 
-    # トレード統計
-    row = conn.execute("SELECT COUNT(*) as total FROM positions WHERE status = 'closed'").fetchone()
-    total_closed = row["total"] if row else 0
-
-    row = conn.execute(
-        "SELECT COUNT(*) as wins FROM positions WHERE status = 'closed' AND pnl > 0"
-    ).fetchone()
-    wins = row["wins"] if row else 0
-
-    row = conn.execute(
-        "SELECT COALESCE(SUM(pnl), 0) as total_pnl FROM positions WHERE status = 'closed'"
-    ).fetchone()
-    total_pnl = row["total_pnl"] if row else 0
-
-    row = conn.execute(
-        "SELECT COUNT(*) as open_count FROM positions WHERE status = 'open'"
+    # トレード統計（positions を1回走査して集計）
+    total_closed, wins, total_pnl, open_count, avg_win, avg_loss = conn.execute(
+        _SQL_REPORT_TRADE_STATS
     ).fetchone()
-    open_count = row["open_count"] if row else 0
 
     win_rate = (wins / total_closed * 100) if total_closed > 0 else 0
 
@@ -240,53 +353,36 @@ def run_report() -> int:
 
     # 勝ち/負けの平均
     if total_closed > 0:
-        row = conn.execute(
-            "SELECT AVG(pnl) as avg_win FROM positions WHERE status = 'closed' AND pnl > 0"
-        ).fetchone()
-        avg_win = row["avg_win"] if row and row["avg_win"] else 0
-
-        row = conn.execute(
-            "SELECT AVG(pnl) as avg_loss FROM positions WHERE status = 'closed' AND pnl <= 0"
-        ).fetchone()
-        avg_loss = row["avg_loss"] if row and row["avg_loss"] else 0
-
-        print(f"Avg Win:         ${avg_win:>12,.2f}")
-        print(f"Avg Loss:        ${avg_loss:>12,.2f}")
+        print(f"Avg Win:         ${avg_win or 0:>12,.2f}")
+        print(f"Avg Loss:        ${avg_loss or 0:>12,.2f}")
 
     # ドローダウン
-    row = conn.execute("SELECT MAX(drawdown_pct) as max_dd FROM daily_snapshots").fetchone()
-    max_dd = row["max_dd"] if row and row["max_dd"] else 0
+    (max_dd,) = conn.execute(_SQL_REPORT_MAX_DRAWDOWN).fetchone()
+    max_dd = max_dd or 0
     print(f"\nMax Drawdown:    {max_dd:.2f}%")
 
     # 最新のスナップショット
-    row = conn.execute(
-        "SELECT date, total_equity, daily_pnl_pct, macro_regime, vix_close "
-        "FROM daily_snapshots ORDER BY date DESC LIMIT 1"
-    ).fetchone()
+    row = conn.execute(_SQL_REPORT_LATEST_SNAPSHOT).fetchone()
     if row:
-        print(f"\n--- Latest Snapshot ({row['date']}) ---")
-        print(f"Equity:          ${row['total_equity']:>12,.2f}")
-        print(f"Daily PnL:       {row['daily_pnl_pct']:.2f}%")
-        print(f"Macro Regime:    {row['macro_regime']}")
-        print(f"VIX:             {row['vix_close']:.2f}")
+        snap_date, total_equity, daily_pnl_pct, macro_regime, vix_close = row
+        print(f"\n--- Latest Snapshot ({snap_date}) ---")
+        print(f"Equity:          ${total_equity:>12,.2f}")
+        print(f"Daily PnL:       {daily_pnl_pct:.2f}%")
+        print(f"Macro Regime:    {macro_regime}")
+        print(f"VIX:             {vix_close:.2f}")
 
     # 実行ログ（最新5件）
-    rows = conn.execute(
-        "SELECT execution_id, mode, status, execution_time_ms "
-        "FROM execution_logs ORDER BY started_at DESC LIMIT 5"
-    ).fetchall()
+    rows = conn.execute(_SQL_REPORT_RECENT_EXECUTIONS).fetchall()
     if rows:
         print("\n--- Recent Executions ---")
-        for r in rows:
-            ms = r["execution_time_ms"] or 0
-            print(f"  {r['execution_id']}: {r['mode']} -> {r['status']} ({ms}ms)")
+        for execution_id, run_mode, status, ms in rows:
+            print(f"  {execution_id}: {run_mode} -> {status} ({ms or 0}ms)")
 
     # サーキットブレーカー
-    row = conn.execute(
-        "SELECT level, triggered_at FROM circuit_breaker ORDER BY triggered_at DESC LIMIT 1"
-    ).fetchone()
+    row = conn.execute(_SQL_REPORT_LATEST_CIRCUIT_BREAKER).fetchone()
     if row:
-        print(f"\n[ALERT] Circuit Breaker L{row['level']} triggered at {row['triggered_at']}")
+        level, triggered_at = row
+        print(f"\n[ALERT] Circuit Breaker L{level} triggered at {triggered_at}")
     else:
         print("\nCircuit Breaker: No triggers")
 
@@ -294,9 +390,18 @@ def run_report() -> int:
     return 0
 
 
-def run_pipeline(mode: str) -> int:
+def run_pipeline(
+    mode: str,
+    conn: sqlite3.Connection | None = None,
+    read_conn: sqlite3.Connection | None = None,
+) -> int:
     """メインパイプライン実行。
 
+    Args:
+        mode: 実行モード
+        conn: 既存のDB接続（デーモンモード用）。Noneなら新規に開いて終了時に閉じる。
+        read_conn: 既存の読み取り専用接続（デーモンモード用）
+
     Returns:
         0: 成功, 1: エラー
     """
@@ -309,41 +414,55 @@ def run_pipeline(mode: str) -> int:
     start_time = time.time()
 
     # === 1. 設定読込 + ロガー初期化 + DB接続 ===
-    config = load_config()
+    config = get_config()
     setup_logger(log_dir=config.system.log_dir)
+    if conn is not None:
+        # デーモンモード: 呼び出し側が保持する接続を使い回す（クローズしない）
+        return _run_pipeline_on_conn(mode, config, conn, read_conn, start_time)
+
     conn = init_db(config.system.db_path)
+    read_conn = open_reader(config.system.db_path)
+    try:
+        return _run_pipeline_on_conn(mode, config, conn, read_conn, start_time)
+    finally:
+        if read_conn is not None:
+            read_conn.close()
+        _close_conn(conn)
 
+
+def _run_pipeline_on_conn(
+    mode: str,
+    config: AppConfig,
+    conn: sqlite3.Connection,
+    read_conn: sqlite3.Connection | None,
+    start_time: float,
+) -> int:
+    """DB接続確立後のパイプライン本体。接続のクローズは呼び出し側が担う。"""
     # === 2. execution_id生成 + 重複チェック ===
     execution_id = generate_execution_id(mode)
-    state_manager = AlpacaStateManager(config, conn)
+    state_manager = AlpacaStateManager(config, conn, read_conn=read_conn)
 
     if state_manager.check_execution_id(execution_id):
         logger.warning(f"Execution {execution_id} already exists, skipping")
-        conn.close()
         return 0
 
-    # 実行ログ開始記録
-    state_manager.record_execution_log(
-        execution_id=execution_id,
-        mode=mode,
-        status="running",
-        started_at=datetime.now().isoformat(),
-    )
+    # 実行ログは完了時に1行だけ書く（開始時の"running"行は書かない）
+    started_at = datetime.now().isoformat()
 
     try:
         # === 3. ヘルスチェック ===
         if mode == "health_check":
             success = run_health_check(config, conn)
             status = "success" if success else "error"
-            _finalize_execution(state_manager, execution_id, mode, status, start_time)
-            conn.close()
+            _finalize_execution(state_manager, execution_id, mode, status, start_time, started_at)
             return 0 if success else 1
 
         # === 4. 市場オープン確認 ===
-        if not is_market_open():
+        if not is_market_open(conn):
             logger.info("Market is closed today, skipping")
-            _finalize_execution(state_manager, execution_id, mode, "skipped", start_time)
-            conn.close()
+            _finalize_execution(
+                state_manager, execution_id, mode, "skipped", start_time, started_at
+            )
             return 0
 
         # === 5. Reconciliation ===
@@ -365,23 +484,29 @@ def run_pipeline(mode: str) -> int:
             logger.warning(f"Circuit breaker L{cb_state.level} active, limiting operations")
 
         # === 8. マクロデータ取得 ===
-        macro_data = collect_market_data(["SPY"], config)
-        spy_bar = macro_data.get("SPY")
+        # LLM 分析を行う場合は Claude CLI を先に起動し、起動時間をデータ取得と重ねる
+        if mode == "morning" and not cb_state.active:
+            prewarm_claude(config.system.claude_parallel_sessions)
+
+        # morning/midday はユニバースと SPY を1回のバッチでまとめて取得する
+        symbols = get_symbols() if mode in ("morning", "midday") else []
+        market_data = collect_market_data(["SPY", *symbols], config)
+        spy_bar = market_data.pop("SPY", None)
         spy_close = spy_bar.close if spy_bar else 0
         spy_ma200 = spy_bar.ma_50 if spy_bar else 0  # MA200 from data collector
-        vix = _fetch_vix()
+        vix = _fetch_vix(config)
 
         macro_regime = determine_macro_regime(spy_close, spy_ma200, vix)
         vix_regime = classify_vix_regime(vix)
         logger.info(f"Macro: regime={macro_regime.value}, VIX={vix} ({vix_regime.value})")
 
         # === 9. モード別処理 ===
+        # 約定結果は発注直後に独立してコミットする（後続の書き込みが失敗しても
+        # 送信済み注文の positions/trades を失わないため）。
+        # 判断・スナップショット・実行ログは 1トランザクション（1回のCOMMIT）にまとめる。
+        decisions: list[TradingDecision] = []
         decisions_json = None
-
         if mode in ("morning", "midday"):
-            # 市場データ収集
-            symbols = get_symbols()
-            market_data = collect_market_data(symbols, config)
             logger.info(f"Collected data for {len(market_data)} symbols")
 
             if mode == "morning" and not cb_state.active:
@@ -391,17 +516,23 @@ def run_pipeline(mode: str) -> int:
                     portfolio=portfolio,
                     mode=mode,
                     timeout=config.system.claude_timeout_seconds,
+                    shards=config.system.claude_parallel_sessions,
                 )
                 logger.info(f"LLM returned {len(decisions)} decisions")
 
-                # リスクフィルタリング
+                # リスクフィルタリング（BUY候補を一括判定）
+                buy_symbols = [d.symbol for d in decisions if d.action == Action.BUY]
+                checks = (
+                    risk_manager.can_open_new_positions(
+                        portfolio, get_sectors(buy_symbols), vix_regime
+                    )
+                    if buy_symbols
+                    else {}
+                )
                 filtered = []
                 for d in decisions:
                     if d.action == Action.BUY:
-                        sector = get_sector(d.symbol)
-                        can_open, reason = risk_manager.can_open_new_position(
-                            portfolio, d.symbol, sector, vix_regime
-                        )
+                        can_open, reason = checks[d.symbol]
                         if can_open:
                             filtered.append(d)
                         else:
@@ -413,51 +544,52 @@ def run_pipeline(mode: str) -> int:
                 if filtered:
                     executor = AlpacaOrderExecutor(config)
                     results = executor.execute(filtered, portfolio, execution_id)
-
-                    for result in results:
-                        if result.success:
-                            # BUY結果をDBに記録
-                            buy_decision = next(
-                                (d for d in filtered if d.symbol == result.symbol),
-                                None,
-                            )
-                            if buy_decision and buy_decision.action == Action.BUY:
-                                pos_id = state_manager.open_position(buy_decision, result)
-                                state_manager.record_trade(result, pos_id)
-                            elif buy_decision and buy_decision.action == Action.SELL:
-                                state_manager.close_position(
-                                    result.symbol, "signal", result.filled_price or 0
-                                )
-                                state_manager.record_trade(result, 0)
-                        else:
-                            logger.error(f"Order failed: {result.symbol} - {result.error_message}")
-
-                decisions_json = json.dumps(
-                    [
-                        {
-                            "symbol": d.symbol,
-                            "action": d.action.value,
-                            "confidence": d.confidence,
-                        }
-                        for d in decisions
-                    ]
-                )
-
-        elif mode == "eod":
-            # EOD: daily snapshot保存
-            state_manager.save_daily_snapshot(portfolio, macro_regime.value, vix)
-            logger.info("EOD snapshot saved")
-
-        # === 10. 完了記録 ===
-        _finalize_execution(
-            state_manager,
-            execution_id,
-            mode,
-            "success",
-            start_time,
-            decisions_json=decisions_json,
-        )
-        conn.close()
+                    _record_order_results(state_manager, filtered, results)
+
+                if decisions:
+                    decisions_json = orjson.dumps(
+                        [
+                            {
+                                "symbol": d.symbol,
+                                "action": d.action.value,
+                                "confidence": d.confidence,
+                            }
+                            for d in decisions
+                        ]
+                    ).decode()
+                else:
+                    # LLMは実行したが判断なし（未実行の None と区別する）
+                    decisions_json = "[]"
+
+        with state_manager.transaction():
+            if decisions:
+                state_manager.record_decisions(execution_id, decisions)
+
+            if mode == "eod":
+                # EOD: daily snapshot保存
+                state_manager.save_daily_snapshot(portfolio, macro_regime.value, vix)
+                logger.info("EOD snapshot saved")
+
+            # === 10. 完了記録 ===
+            _finalize_execution(
+                state_manager,
+                execution_id,
+                mode,
+                "success",
+                start_time,
+                started_at,
+                decisions_json=decisions_json,
+            )
+
+        # 古い実行ログを月別アーカイブへ移し、ホットテーブルを小さく保つ
+        # （ATTACH はトランザクション外でしか実行できないためコミット後に行う）
+        if mode == "eod":
+            try:
+                archived = archive_execution_logs(conn, config.system.archive_dir)
+                if archived:
+                    logger.info(f"Archived {archived} execution_logs rows")
+            except sqlite3.Error as e:
+                logger.warning(f"execution_logs archive failed: {e}")
         return 0
 
     except Exception as e:
@@ -468,28 +600,179 @@ def run_pipeline(mode: str) -> int:
             mode,
             "error",
             start_time,
+            started_at,
             error_message=str(e),
         )
-        conn.close()
         return 1
 
 
+# ロック保持者がデーモンのイテレーションなら、1日1回のモードはこの秒数まで解放を待つ
+_LOCK_WAIT_SECONDS = 300.0
+_LOCK_POLL_SECONDS = 1.0
+_DAEMON_LOCK_TAG = "daemon=1"
+
+
+def _try_lock(lock_fd: int, wait_seconds: float) -> bool:
+    """排他ロックを取得する。保持者がデーモンなら wait_seconds まで解放を待つ。"""
+    deadline = time.monotonic() + wait_seconds
+    while True:
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            # 空なら保持者は取得直後で実行情報を書く前。デーモンか判別できるまで待つ
+            holder = os.pread(lock_fd, 4096, 0).decode(errors="replace")
+            if (holder and _DAEMON_LOCK_TAG not in holder) or time.monotonic() >= deadline:
+                return False
+            time.sleep(_LOCK_POLL_SECONDS)
+
+
+@contextlib.contextmanager
+def _pipeline_lock(lock_path: str, mode: str, daemon: bool = False) -> Iterator[bool]:
+    """1回のパイプライン実行の間だけファイルロックを保持する。取得できたかを yield する。
+
+    デーモンはイテレーションごとに取得・解放し、スリープ中は保持しない。
+    デーモン側は待たず（そのイテレーションを見送る）、1日1回のモードは
+    デーモンのイテレーション完了を _LOCK_WAIT_SECONDS まで待つ。
+    """
+    # ロックファイルのディレクトリを作成
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+
+    # 切り詰めずに開く（ロック取得に失敗した側が実行中の情報を消さないように）。
+    # O_CLOEXEC で Claude CLI 等の子プロセスにロックを継承させない。
+    lock_fd = os.open(lock_path, os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o644)
+    try:
+        # 排他ロック。解除は close に任せる
+        if not _try_lock(lock_fd, 0.0 if daemon else _LOCK_WAIT_SECONDS):
+            yield False
+            return
+
+        # 実行中の情報はDBではなくロックファイルに書く（execution_logs は完了時の1行のみ）。
+        # 正常終了時に空にするため、取得時に中身が残っていれば前回実行は異常終了している。
+        stale = os.pread(lock_fd, 4096, 0).decode(errors="replace").strip()
+        if stale:
+            print(f"Previous run did not finish cleanly: {stale}", file=sys.stderr)
+        os.ftruncate(lock_fd, 0)
+        sentinel = f"mode={mode} pid={os.getpid()} started_at={datetime.now().isoformat()}"
+        if daemon:
+            sentinel += f" {_DAEMON_LOCK_TAG}"
+        os.pwrite(lock_fd, f"{sentinel}\n".encode(), 0)
+        try:
+            yield True
+        finally:
+            os.ftruncate(lock_fd, 0)
+    finally:
+        os.close(lock_fd)
+
+
+def run_daemon(
+    mode: str,
+    interval_seconds: int,
+    max_iterations: int | None = None,
+) -> int:
+    """常駐モード: DB接続を保持したまま interval_seconds ごとにパイプラインを実行する。
+
+    cron/launchd の都度起動と異なり、SQLiteのページキャッシュが実行間で温存される。
+    NYSE の取引時間外は次の寄り付きまでスリープする。ファイルロックは各イテレーションの
+    実行中だけ保持するため、launchd から起動される morning/eod/health_check と共存できる。
+
+    Args:
+        mode: パイプラインの実行モード
+        interval_seconds: 実行間隔（秒）。実行時間を差し引いてスリープする。
+        max_iterations: 最大実行回数（Noneなら停止シグナルまで継続）
+
+    Returns:
+        最後に実行したパイプラインの終了コード
+    """
+    config = get_config()
+    lock_path = config.system.lock_file_path
+    conn = init_db(config.system.db_path)
+    read_conn = open_reader(config.system.db_path)
+    exit_code = 0
+    iterations = 0
+    try:
+        while max_iterations is None or iterations < max_iterations:
+            wait = _seconds_until_session(datetime.now(UTC))
+            if wait > 0:
+                logger.info(f"Daemon ({mode}) outside market hours, sleeping {wait:.0f}s")
+                time.sleep(wait)
+                continue
+
+            cycle_start = time.monotonic()
+            with _pipeline_lock(lock_path, mode, daemon=True) as acquired:
+                if acquired:
+                    exit_code = run_pipeline(mode, conn=conn, read_conn=read_conn)
+                else:
+                    logger.info(f"Daemon ({mode}) skipped: another run holds {lock_path}")
+            iterations += 1
+            if max_iterations is not None and iterations >= max_iterations:
+                break
+            time.sleep(max(0.0, interval_seconds - (time.monotonic() - cycle_start)))
+    except KeyboardInterrupt:
+        logger.info(f"Daemon ({mode}) interrupted after {iterations} iterations")
+    finally:
+        if read_conn is not None:
+            read_conn.close()
+        _close_conn(conn)
+    return exit_code
+
+
+def _close_conn(conn: sqlite3.Connection) -> None:
+    """PRAGMA optimize でプランナー統計を更新してから接続を閉じる。
+
+    cronで1日数回実行されるため、次回実行時のインデックス選択に反映される。
+    """
+    try:
+        conn.execute("PRAGMA optimize")
+    except sqlite3.Error as e:
+        logger.warning(f"PRAGMA optimize failed: {e}")
+    finally:
+        conn.close()
+
+
+def _record_order_results(
+    state_manager: AlpacaStateManager,
+    filtered: list[TradingDecision],
+    results: list[OrderResult],
+) -> None:
+    """約定結果を positions/trades に記録し、その場でコミットする。"""
+    with state_manager.transaction():
+        for result in results:
+            if result.success:
+                # BUY結果をDBに記録
+                buy_decision = next(
+                    (d for d in filtered if d.symbol == result.symbol),
+                    None,
+                )
+                if buy_decision and buy_decision.action == Action.BUY:
+                    pos_id = state_manager.open_position(buy_decision, result)
+                    state_manager.record_trade(result, pos_id)
+                elif buy_decision and buy_decision.action == Action.SELL:
+                    closed_id = state_manager.close_position(
+                        result.symbol, "signal", result.filled_price or 0
+                    )
+                    state_manager.record_trade(result, closed_id)
+            else:
+                logger.error(f"Order failed: {result.symbol} - {result.error_message}")
+
+
 def _finalize_execution(
     state_manager: AlpacaStateManager,
     execution_id: str,
     mode: str,
     status: str,
     start_time: float,
+    started_at: str,
     decisions_json: str | None = None,
     error_message: str | None = None,
 ) -> None:
-    """実行ログの最終更新。"""
+    """実行ログを最終状態で1行記録する（1回のINSERT。トランザクション内なら最外側でCOMMIT）。"""
     elapsed_ms = int((time.time() - start_time) * 1000)
     state_manager.record_execution_log(
         execution_id=execution_id,
         mode=mode,
         status=status,
-        started_at=datetime.now().isoformat(),
+        started_at=started_at,
         completed_at=datetime.now().isoformat(),
         decisions_json=decisions_json,
         error_message=error_message,
@@ -507,27 +790,17 @@ def main(argv: list[str] | None = None) -> int:
     args = parse_args(argv)
     mode = args.mode
 
-    # 設定を先読み（ロックファイルパス取得のため）
-    config = load_config()
-    lock_path = config.system.lock_file_path
+    if args.daemon:
+        # デーモンはイテレーションごとにロックを取得・解放する
+        return run_daemon(mode, interval_seconds=args.interval * 60)
 
-    # ロックファイルのディレクトリを作成
-    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
-
-    lock_fd = open(lock_path, "w")  # noqa: SIM115
-    try:
-        # 排他ロック（ノンブロッキング）
-        fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
-    except OSError:
-        print(f"Another instance is running (lock: {lock_path})", file=sys.stderr)
-        lock_fd.close()
-        return 1
-
-    try:
+    # 設定を先読み（ロックファイルパス取得のため）
+    lock_path = get_config().system.lock_file_path
+    with _pipeline_lock(lock_path, mode) as acquired:
+        if not acquired:
+            print(f"Another instance is running (lock: {lock_path})", file=sys.stderr)
+            return 1
         return run_pipeline(mode)
-    finally:
-        fcntl.flock(lock_fd, fcntl.LOCK_UN)
-        lock_fd.close()
 
 
 if __name__ == "__main__":
@@ -2,16 +2,37 @@
 
 PurgedTimeSeriesSplit によるウォークフォワード検証。
 コストモデル（スプレッド + スリッページ）適用済みのパフォーマンス評価を行う。
+指標の数値計算は modules/backtest_kernels.py（numba があれば JIT）に委譲する。
 """
 
 import logging
 import math
+from collections.abc import Iterator
 from dataclasses import dataclass, field
 
 import numpy as np
+import numpy.typing as npt
+
+from modules.backtest_kernels import (
+    downside_std,
+    excess_mean_std,
+    max_drawdown_pct,
+    pnl_sums,
+)
 
 logger = logging.getLogger("trading_agent")
 
+# 年率換算の定数（ブートストラップ等で繰り返し使うため事前計算）
+_ANNUALIZE = math.sqrt(252)
+_INV_252 = 1.0 / 252.0
+
+
+def _as_array(values: list[float] | npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    """float64 の連続配列に変換する。既に該当する ndarray ならコピーせずそのまま返す。"""
+    if isinstance(values, np.ndarray) and values.dtype == np.float64 and values.flags.c_contiguous:
+        return values
+    return np.ascontiguousarray(values, dtype=np.float64)
+
 
 # === PurgedTimeSeriesSplit ===
 
@@ -27,6 +48,42 @@ class TimeSeriesFold:
     test_end: int
 
 
+def iter_purged_time_series_split(
+    n_samples: int,
+    n_splits: int = 5,
+    train_size: int = 252,
+    test_size: int = 63,
+    purge_days: int = 10,
+    embargo_days: int = 5,
+) -> Iterator[TimeSeriesFold]:
+    """PurgedTimeSeriesSplit のフォールドを遅延生成する。
+
+    パラメータ探索で大量の (n_splits, train_size) を試す場合に、
+    リストを組み立てずに有効なフォールドだけを順に返す。
+    引数は purged_time_series_split と同じ。
+    """
+    gap = purge_days + embargo_days
+
+    for i in range(n_splits):
+        test_end = n_samples - (n_splits - 1 - i) * test_size
+        test_start = test_end - test_size
+        if test_start < 0:
+            continue
+
+        train_end = test_start - gap
+        train_start = max(0, train_end - train_size - i * test_size)
+        if train_end <= train_start:
+            continue
+
+        yield TimeSeriesFold(
+            fold_number=i + 1,
+            train_start=train_start,
+            train_end=train_end,
+            test_start=test_start,
+            test_end=test_end,
+        )
+
+
 def purged_time_series_split(
     n_samples: int,
     n_splits: int = 5,
@@ -51,33 +108,11 @@ def purged_time_series_split(
     Returns:
         フォールドのリスト
     """
-    folds = []
-    gap = purge_days + embargo_days
-
-    for i in range(n_splits):
-        test_end = n_samples - (n_splits - 1 - i) * test_size
-        test_start = test_end - test_size
-
-        if test_start < 0:
-            continue
-
-        train_end = test_start - gap
-        train_start = max(0, train_end - train_size - i * test_size)
-
-        if train_end <= train_start:
-            continue
-
-        folds.append(
-            TimeSeriesFold(
-                fold_number=i + 1,
-                train_start=train_start,
-                train_end=train_end,
-                test_start=test_start,
-                test_end=test_end,
-            )
+    return list(
+        iter_purged_time_series_split(
+            n_samples, n_splits, train_size, test_size, purge_days, embargo_days
         )
-
-    return folds
+    )
 
 
 # === コストモデル ===
@@ -119,7 +154,7 @@ class PerformanceMetrics:
 
 
 def calculate_sharpe_ratio(
-    returns: list[float],
+    returns: list[float] | npt.NDArray[np.float64],
     risk_free_rate: float = 0.0,
     annualize: bool = True,
 ) -> float:
@@ -133,66 +168,56 @@ def calculate_sharpe_ratio(
     if len(returns) < 2:
         return 0.0
 
-    arr = np.array(returns, dtype=np.float64)
-    daily_rf = risk_free_rate / 252
-
-    excess = arr - daily_rf
-    mean_excess = float(np.mean(excess))
-    std = float(np.std(excess, ddof=1))
+    arr = _as_array(returns)
+    mean_excess, std = excess_mean_std(arr, risk_free_rate * _INV_252)
 
     if std == 0:
         return 0.0
 
     sr = mean_excess / std
     if annualize:
-        sr *= math.sqrt(252)
-    return sr
+        sr *= _ANNUALIZE
+    return float(sr)
 
 
 def calculate_sortino_ratio(
-    returns: list[float],
+    returns: list[float] | npt.NDArray[np.float64],
     risk_free_rate: float = 0.0,
 ) -> float:
     """ソルティノレシオを計算する。"""
     if len(returns) < 2:
         return 0.0
 
-    arr = np.array(returns, dtype=np.float64)
-    daily_rf = risk_free_rate / 252
-
-    excess = arr - daily_rf
-    mean_excess = float(np.mean(excess))
+    arr = _as_array(returns)
+    mean_excess, _ = excess_mean_std(arr, risk_free_rate * _INV_252)
 
-    downside = arr[arr < 0]
-    if len(downside) == 0:
+    downside_count, dstd = downside_std(arr)
+    if downside_count == 0:
         return float("inf") if mean_excess > 0 else 0.0
 
-    downside_std = float(np.std(downside, ddof=1))
-    if downside_std == 0:
+    if dstd == 0:
         return 0.0
 
-    return mean_excess / downside_std * math.sqrt(252)
+    return float(mean_excess / dstd * _ANNUALIZE)
 
 
-def calculate_max_drawdown(equity_curve: list[float]) -> float:
+def calculate_max_drawdown(equity_curve: list[float] | npt.NDArray[np.float64]) -> float:
     """最大ドローダウン%を計算する。"""
     if len(equity_curve) < 2:
         return 0.0
 
-    hwm = equity_curve[0]
-    max_dd = 0.0
-    for eq in equity_curve:
-        hwm = max(hwm, eq)
-        if hwm > 0:
-            dd = (hwm - eq) / hwm * 100
-            max_dd = max(max_dd, dd)
-    return max_dd
+    return float(max_drawdown_pct(_as_array(equity_curve)))
 
 
-def calculate_profit_factor(trade_pnls: list[float]) -> float:
+def calculate_profit_factor(trade_pnls: list[float] | npt.NDArray[np.float64]) -> float:
     """プロフィットファクター = 総利益 / 総損失。"""
-    gains = sum(p for p in trade_pnls if p > 0)
-    losses = abs(sum(p for p in trade_pnls if p < 0))
+    if len(trade_pnls) == 0:
+        return 0.0
+    gains, losses, _ = pnl_sums(_as_array(trade_pnls))
+    return _profit_factor(gains, losses)
+
+
+def _profit_factor(gains: float, losses: float) -> float:
     if losses == 0:
         return float("inf") if gains > 0 else 0.0
     return gains / losses
@@ -217,19 +242,23 @@ def bootstrap_sharpe_ci(
         return sr, sr, sr
 
     rng = np.random.default_rng(seed)
-    arr = np.array(returns, dtype=np.float64)
+    arr = _as_array(returns)
     n = len(arr)
 
-    bootstrap_srs = []
-    for _ in range(n_bootstrap):
-        sample = rng.choice(arr, size=n, replace=True)
-        sr = calculate_sharpe_ratio(sample.tolist())
-        bootstrap_srs.append(sr)
+    # (n_bootstrap, n) のインデックス行列で全リサンプルを一括生成し、行方向に集計する
+    # 日次リターン系列は int32 で十分表現できるため、インデックス行列のメモリを半減させる
+    idx = rng.integers(0, n, size=(n_bootstrap, n), dtype=np.int32)
+    samples = arr[idx]
+    means = samples.mean(axis=1)
+    stds = samples.std(axis=1, ddof=1)
+    # std == 0 のサンプルは calculate_sharpe_ratio と同じく 0.0 とする
+    safe_stds = np.where(stds == 0, 1.0, stds)
+    bootstrap_srs = np.where(stds == 0, 0.0, means / safe_stds) * _ANNUALIZE
 
     alpha = (1 - confidence) / 2
-    lower = float(np.percentile(bootstrap_srs, alpha * 100))
-    upper = float(np.percentile(bootstrap_srs, (1 - alpha) * 100))
-    point = calculate_sharpe_ratio(returns)
+    # 上下限を1回の partition で求める
+    lower, upper = (float(q) for q in np.quantile(bootstrap_srs, [alpha, 1 - alpha]))
+    point = calculate_sharpe_ratio(arr)
 
     return point, lower, upper
 
@@ -282,24 +311,23 @@ def evaluate_returns(
     if not daily_returns:
         return PerformanceMetrics()
 
-    total_return = 1.0
-    for r in daily_returns:
-        total_return *= 1 + r
+    arr = _as_array(daily_returns)
+    # 損益はプロフィットファクターと勝率を1パスで集計する
+    gains, losses, wins = pnl_sums(_as_array(trade_pnls)) if trade_pnls else (0.0, 0.0, 0)
+    total_return = float(np.prod(1.0 + arr))
     total_return_pct = (total_return - 1) * 100
 
-    years = trading_days / 252 if trading_days > 0 else 1.0
+    years = trading_days * _INV_252 if trading_days > 0 else 1.0
     annualized = (total_return ** (1 / years) - 1) * 100 if years > 0 else 0.0
 
     return PerformanceMetrics(
         total_return_pct=total_return_pct,
         annualized_return_pct=annualized,
-        sharpe_ratio=calculate_sharpe_ratio(daily_returns),
-        sortino_ratio=calculate_sortino_ratio(daily_returns),
+        sharpe_ratio=calculate_sharpe_ratio(arr),
+        sortino_ratio=calculate_sortino_ratio(arr),
         max_drawdown_pct=calculate_max_drawdown(equity_curve) if equity_curve else 0.0,
-        profit_factor=calculate_profit_factor(trade_pnls) if trade_pnls else 0.0,
-        win_rate_pct=(sum(1 for p in trade_pnls if p > 0) / len(trade_pnls) * 100)
-        if trade_pnls
-        else 0.0,
+        profit_factor=_profit_factor(gains, losses) if trade_pnls else 0.0,
+        win_rate_pct=(wins / len(trade_pnls) * 100) if trade_pnls else 0.0,
         total_trades=len(trade_pnls),
         trading_days=trading_days,
     )
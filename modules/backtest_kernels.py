@@ -0,0 +1,124 @@
+"""バックテスト指標の数値カーネル。
+
+フォールド長（60営業日前後）では NumPy の呼び出しオーバーヘッドが支配的になるため、
+numba がインストールされていればループ版を JIT コンパイルして使う。
+未インストール時は同じインターフェースの NumPy 実装にフォールバックする。
+"""
+
+import math
+
+import numpy as np
+import numpy.typing as npt
+
+try:
+    from numba import njit
+
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+
+# === ループ実装（numba で JIT 化する対象。単体テストでは素の Python として検証する） ===
+
+
+def _loop_excess_mean_std(arr: npt.NDArray[np.float64], daily_rf: float) -> tuple[float, float]:
+    n = arr.shape[0]
+    total = 0.0
+    for i in range(n):
+        total += arr[i] - daily_rf
+    mean = total / n
+    sq = 0.0
+    for i in range(n):
+        d = arr[i] - daily_rf - mean
+        sq += d * d
+    return mean, math.sqrt(sq / (n - 1))
+
+
+def _loop_downside_std(arr: npt.NDArray[np.float64]) -> tuple[int, float]:
+    count = 0
+    total = 0.0
+    for i in range(arr.shape[0]):
+        if arr[i] < 0:
+            count += 1
+            total += arr[i]
+    if count < 2:
+        return count, math.nan
+    mean = total / count
+    sq = 0.0
+    for i in range(arr.shape[0]):
+        if arr[i] < 0:
+            d = arr[i] - mean
+            sq += d * d
+    return count, math.sqrt(sq / (count - 1))
+
+
+def _loop_max_drawdown_pct(eq: npt.NDArray[np.float64]) -> float:
+    hwm = eq[0]
+    max_dd = 0.0
+    for i in range(eq.shape[0]):
+        if eq[i] > hwm:
+            hwm = eq[i]
+        if hwm > 0:
+            dd = (hwm - eq[i]) / hwm * 100
+            if dd > max_dd:
+                max_dd = dd
+    return max_dd
+
+
+def _loop_pnl_sums(pnls: npt.NDArray[np.float64]) -> tuple[float, float, int]:
+    gains = 0.0
+    losses = 0.0
+    wins = 0
+    for i in range(pnls.shape[0]):
+        p = pnls[i]
+        if p > 0:
+            gains += p
+            wins += 1
+        elif p < 0:
+            losses -= p
+    return gains, losses, wins
+
+
+# === NumPy 実装（numba 未インストール時のフォールバック） ===
+
+
+def _np_excess_mean_std(arr: npt.NDArray[np.float64], daily_rf: float) -> tuple[float, float]:
+    excess = arr - daily_rf
+    return float(np.mean(excess)), float(np.std(excess, ddof=1))
+
+
+def _np_downside_std(arr: npt.NDArray[np.float64]) -> tuple[int, float]:
+    downside = arr[arr < 0]
+    count = len(downside)
+    if count < 2:
+        return count, math.nan
+    return count, float(np.std(downside, ddof=1))
+
+
+def _np_max_drawdown_pct(eq: npt.NDArray[np.float64]) -> float:
+    hwm = np.maximum.accumulate(eq)
+    # 高値が0以下の区間はドローダウンを定義できないため0として扱う
+    positive = hwm > 0
+    dd = np.where(positive, (hwm - eq) / np.where(positive, hwm, 1.0) * 100, 0.0)
+    return max(0.0, float(dd.max()))
+
+
+def _np_pnl_sums(pnls: npt.NDArray[np.float64]) -> tuple[float, float, int]:
+    win_mask = pnls > 0
+    return (
+        float(pnls[win_mask].sum()),
+        float(-pnls[pnls < 0].sum()),
+        int(win_mask.sum()),
+    )
+
+
+if HAS_NUMBA:
+    excess_mean_std = njit(cache=True)(_loop_excess_mean_std)
+    downside_std = njit(cache=True)(_loop_downside_std)
+    max_drawdown_pct = njit(cache=True)(_loop_max_drawdown_pct)
+    pnl_sums = njit(cache=True)(_loop_pnl_sums)
+else:
+    excess_mean_std = _np_excess_mean_std
+    downside_std = _np_downside_std
+    max_drawdown_pct = _np_max_drawdown_pct
+    pnl_sums = _np_pnl_sums
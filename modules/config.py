@@ -4,6 +4,7 @@ config.toml を読み込み、型・値域・必須キーをバリデーショ
 環境変数 TRADING_* で個別オーバーライド可能。
 """
 
+import functools
 from pathlib import Path
 from typing import Any, ClassVar
 
@@ -44,15 +45,13 @@ class RiskConfig(BaseSettings):
 
     @model_validator(mode="after")
     def validate_circuit_breaker_order(self) -> "RiskConfig":
-        levels = [
-            self.circuit_breaker_level1_pct,
-            self.circuit_breaker_level2_pct,
-            self.circuit_breaker_level3_pct,
-            self.circuit_breaker_level4_pct,
-        ]
-        for i in range(len(levels) - 1):
-            if levels[i] >= levels[i + 1]:
-                raise ValueError(f"Circuit breaker levels must be strictly increasing: {levels}")
+        l1 = self.circuit_breaker_level1_pct
+        l2 = self.circuit_breaker_level2_pct
+        l3 = self.circuit_breaker_level3_pct
+        l4 = self.circuit_breaker_level4_pct
+        if not (l1 < l2 < l3 < l4):
+            levels = [l1, l2, l3, l4]
+            raise ValueError(f"Circuit breaker levels must be strictly increasing: {levels}")
         return self
 
 
@@ -67,7 +66,12 @@ class SystemConfig(BaseSettings):
     db_path: str = "data/state/trading.db"
     log_dir: str = "logs"
     claude_timeout_seconds: int = Field(default=120, ge=30, le=300)
+    claude_parallel_sessions: int = Field(default=1, ge=1, le=8)
     lock_file_path: str = "data/state/agent.lock"
+    archive_dir: str = "data/state/archive"
+    cache_dir: str = "data/cache"
+    vix_cache_ttl_seconds: int = Field(default=14400, ge=0, le=86400)
+    health_check_fail_fast: bool = False
 
 
 class AlpacaConfig(BaseSettings):
@@ -129,3 +133,14 @@ def load_config(toml_path: str | Path | None = None) -> AppConfig:
     if toml_path is not None:
         return AppConfig(_toml_file=str(toml_path))
     return AppConfig()
+
+
+@functools.lru_cache(maxsize=4)
+def get_config(toml_path: str | Path | None = None) -> AppConfig:
+    """プロセス内で共有する設定を返す（パスごとに1回だけロード）。
+
+    TOML解析とpydanticバリデーションを呼び出しごとに繰り返さないためのキャッシュ。
+    設定ファイルの変更を反映するには load_config() を使うか get_config.cache_clear() を呼ぶ。
+    常駐モードでは再起動まで同じ設定が使われる。
+    """
+    return load_config(toml_path)
@@ -4,34 +4,87 @@ Alpaca Market Data API + yfinance でOHLCVを取得し、
 テクニカル指標を計算してBarDataを返す。
 """
 
+import functools
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from operator import attrgetter, itemgetter
+from typing import TYPE_CHECKING, Any
 
-import pandas as pd
-from alpaca.data.historical import StockHistoricalDataClient
-from alpaca.data.requests import StockBarsRequest, StockLatestBarRequest
-from alpaca.data.timeframe import TimeFrame
-
-from modules.config import AppConfig
-from modules.technical import build_bar_data
+from modules.config import AppConfig, get_config
 from modules.types import BarData
 
+# pandas / alpaca.data は import だけで数百ms かかるため、実際にデータを取得する関数内で読み込む
+# （health_check や DB メンテナンスだけのプロセスでは読み込まない）
+if TYPE_CHECKING:
+    import pandas as pd
+    from alpaca.data.historical import StockHistoricalDataClient
+
 logger = logging.getLogger("trading_agent")
 
+# 1リクエストあたりの銘柄数と並行リクエスト数の上限
+_BARS_CHUNK_SIZE = 50
+_MAX_FETCH_WORKERS = 4
+
+_BAR_FIELDS = attrgetter("timestamp", "open", "high", "low", "close", "volume")
+# raw_data=True のクライアントが返す API の JSON キー（t は RFC 3339 の UTC 時刻文字列）
+_RAW_BAR_FIELDS = itemgetter("t", "o", "h", "l", "c", "v")
+
+
+@functools.lru_cache(maxsize=1)
+def _cached_data_client(api_key: str, secret_key: str) -> "StockHistoricalDataClient":
+    """認証情報ごとにクライアントを1つだけ生成し、HTTPセッション（接続プール）を再利用する。
+
+    raw_data=True でレスポンスを JSON の dict のまま受け取り、
+    pydantic の Bar モデル構築（1バーごとの検証）を省く。
+    """
+    from alpaca.data.historical import StockHistoricalDataClient
+
+    return StockHistoricalDataClient(api_key=api_key, secret_key=secret_key, raw_data=True)
+
 
-def _get_data_client() -> StockHistoricalDataClient:
-    """Alpaca Market Data クライアントを取得する。"""
+def _get_data_client() -> "StockHistoricalDataClient":
+    """Alpaca Market Data クライアントを取得する。
+
+    環境変数をキャッシュキーにするため、認証情報が変われば新しいクライアントを生成する。
+    """
     api_key = os.environ.get("ALPACA_API_KEY", "")
     secret_key = os.environ.get("ALPACA_SECRET_KEY", "")
-    return StockHistoricalDataClient(api_key=api_key, secret_key=secret_key)
+    return _cached_data_client(api_key, secret_key)
+
+
+def _bars_to_frame(symbol_bars: list[Any]) -> "pd.DataFrame":
+    """Alpaca Bar のリストを列指向の配列に詰めてから DataFrame を1回で構築する。
+
+    行ごとの dict を経由しないため、型推論とPythonオブジェクトの生成を避けられる。
+    Bar モデルと raw_data の dict のどちらも受け付ける。
+    Alpaca は時系列順に返すため、順序が崩れている場合のみソートする。
+    """
+    import numpy as np
+    import pandas as pd
+
+    # 値の取得とタプルの転置を C レベル（getter と zip）で行い、行ごとの Python ループを避ける
+    getter = _RAW_BAR_FIELDS if isinstance(symbol_bars[0], dict) else _BAR_FIELDS
+    rows = map(getter, symbol_bars)
+    timestamps, opens, highs, lows, closes, volumes = zip(*rows, strict=True)
+    ohlc = np.array((opens, highs, lows, closes), dtype=np.float64)
+    volume = np.array(volumes, dtype=np.int64)
+
+    df = pd.DataFrame(
+        {"open": ohlc[0], "high": ohlc[1], "low": ohlc[2], "close": ohlc[3], "volume": volume},
+        index=pd.DatetimeIndex(timestamps, name="timestamp"),
+    )
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+    return df
 
 
 def fetch_bars_alpaca(
     symbols: list[str],
     days: int = 100,
-    client: StockHistoricalDataClient | None = None,
-) -> dict[str, pd.DataFrame]:
+    client: "StockHistoricalDataClient | None" = None,
+) -> "dict[str, pd.DataFrame]":
     """Alpaca APIからバーデータを取得する。
 
     Args:
@@ -42,6 +95,9 @@ def fetch_bars_alpaca(
     Returns:
         {symbol: DataFrame(open, high, low, close, volume)}
     """
+    from alpaca.data.requests import StockBarsRequest
+    from alpaca.data.timeframe import TimeFrame
+
     if client is None:
         client = _get_data_client()
 
@@ -49,44 +105,36 @@ def fetch_bars_alpaca(
     calendar_days = int(days * 7 / 5) + 10
     start = datetime.now() - timedelta(days=calendar_days)
 
-    request = StockBarsRequest(
-        symbol_or_symbols=symbols,
-        timeframe=TimeFrame.Day,
-        start=start,
-    )
+    def _fetch(chunk: list[str]) -> tuple[list[str], Any]:
+        request = StockBarsRequest(
+            symbol_or_symbols=chunk,
+            timeframe=TimeFrame.Day,
+            start=start,
+        )
+        return chunk, client.get_stock_bars(request)
 
-    bars = client.get_stock_bars(request)
-    result: dict[str, pd.DataFrame] = {}
+    # 銘柄数が多い場合はチャンクに分割し、HTTP待ちをスレッドで並行させる
+    chunks = [symbols[i : i + _BARS_CHUNK_SIZE] for i in range(0, len(symbols), _BARS_CHUNK_SIZE)]
+    if len(chunks) <= 1:
+        responses = [_fetch(chunk) for chunk in chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=min(_MAX_FETCH_WORKERS, len(chunks))) as pool:
+            responses = list(pool.map(_fetch, chunks))
 
-    for symbol in symbols:
-        try:
-            if hasattr(bars, "data"):
-                symbol_bars = bars.data.get(symbol, [])
-            else:
-                symbol_bars = bars.get(symbol, [])
-            if not symbol_bars:
-                logger.warning(f"No bar data for {symbol}")
-                continue
-
-            records = []
-            for bar in symbol_bars:
-                records.append(
-                    {
-                        "timestamp": bar.timestamp,
-                        "open": float(bar.open),
-                        "high": float(bar.high),
-                        "low": float(bar.low),
-                        "close": float(bar.close),
-                        "volume": int(bar.volume),
-                    }
-                )
-
-            df = pd.DataFrame(records)
-            df["timestamp"] = pd.to_datetime(df["timestamp"])
-            df = df.set_index("timestamp").sort_index()
-            result[symbol] = df
-        except Exception:
-            logger.exception(f"Error processing bars for {symbol}")
+    result: dict[str, pd.DataFrame] = {}
+    for chunk, bars in responses:
+        # BarSet は .data に dict を持つ。レスポンスごとに1回だけ判定する
+        bars_by_symbol = bars.data if hasattr(bars, "data") else bars
+        for symbol in chunk:
+            try:
+                symbol_bars = bars_by_symbol.get(symbol, ())
+                if not symbol_bars:
+                    logger.warning(f"No bar data for {symbol}")
+                    continue
+
+                result[symbol] = _bars_to_frame(symbol_bars)
+            except Exception:
+                logger.exception(f"Error processing bars for {symbol}")
 
     return result
 
@@ -94,7 +142,7 @@ def fetch_bars_alpaca(
 def collect_market_data(
     symbols: list[str],
     config: AppConfig | None = None,
-    client: StockHistoricalDataClient | None = None,
+    client: "StockHistoricalDataClient | None" = None,
 ) -> dict[str, BarData]:
     """銘柄リストの市場データを収集し、テクニカル指標付きBarDataを返す。
 
@@ -106,8 +154,10 @@ def collect_market_data(
     Returns:
         {symbol: BarData}
     """
+    from modules.technical import build_bar_data
+
     if config is None:
-        config = AppConfig()
+        config = get_config()
 
     ma_period = config.strategy.ma_period
     rsi_period = config.strategy.rsi_period
@@ -139,9 +189,11 @@ def collect_market_data(
 
 def fetch_latest_price(
     symbol: str,
-    client: StockHistoricalDataClient | None = None,
+    client: "StockHistoricalDataClient | None" = None,
 ) -> float | None:
     """最新の終値を取得する。"""
+    from alpaca.data.requests import StockLatestBarRequest
+
     if client is None:
         client = _get_data_client()
     try:
@@ -149,7 +201,7 @@ def fetch_latest_price(
         bars = client.get_stock_latest_bar(request)
         bar = bars.get(symbol)
         if bar:
-            return float(bar.close)
+            return float(bar["c"] if isinstance(bar, dict) else bar.close)
     except Exception:
         logger.exception(f"Error fetching latest price for {symbol}")
     return None
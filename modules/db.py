@@ -3,12 +3,18 @@
 - WALモードでの初期化
 - スキーママイグレーション（バージョンベース）
 - Online Backup API によるバックアップ
+- execution_logs の月別アーカイブ（ATTACH DATABASE）
 """
 
+import contextlib
+import logging
 import sqlite3
-from datetime import datetime
+import threading
+from datetime import date, datetime
 from pathlib import Path
 
+logger = logging.getLogger("trading_agent")
+
 # === DDL: Phase 1 初期スキーマ ===
 
 _SCHEMA_V1 = """
@@ -175,18 +181,96 @@ CREATE TABLE IF NOT EXISTS schema_version (
 );
 """
 
+# === DDL: v2 LLM判断の行単位保存 ===
+# 主キー (execution_id, symbol) がそのままデータなので WITHOUT ROWID で詰めて格納する
+
+_SCHEMA_V2 = """
+CREATE TABLE IF NOT EXISTS decisions (
+    execution_id  TEXT    NOT NULL,
+    symbol        TEXT    NOT NULL,
+    action        TEXT    NOT NULL CHECK(action IN ('buy', 'sell', 'hold', 'no_action')),
+    confidence    INTEGER NOT NULL CHECK(confidence >= 0 AND confidence <= 100),
+    PRIMARY KEY (execution_id, symbol)
+) WITHOUT ROWID;
+"""
+
+# === DDL: v3 NYSE取引日テーブル ===
+# is_market_open() が exchange_calendars を読み込まずに1クエリで判定するためのキャッシュ
+
+_SCHEMA_V3 = """
+CREATE TABLE IF NOT EXISTS trading_days (
+    date TEXT PRIMARY KEY CHECK(date GLOB '????-??-??')
+) WITHOUT ROWID;
+"""
+
+# === DDL: v4 HWM 索引 ===
+# sync() 毎の MAX(high_water_mark) を全件走査ではなく索引の末尾1件の参照で済ませる
+
+_SCHEMA_V4 = """
+CREATE INDEX IF NOT EXISTS idx_daily_snapshots_hwm ON daily_snapshots(high_water_mark);
+"""
+
+# === DDL: v5 複合索引 ===
+# (symbol, status) / (status, entry_date) は先頭列だけの単一列索引を包含するため置き換える。
+# execution_id は UNIQUE 制約の自動索引があり、明示索引は書き込みコストが増えるだけなので削除する
+
+_SCHEMA_V5 = """
+CREATE INDEX IF NOT EXISTS idx_positions_symbol_status ON positions(symbol, status);
+CREATE INDEX IF NOT EXISTS idx_positions_status_entry  ON positions(status, entry_date);
+DROP INDEX IF EXISTS idx_positions_symbol;
+DROP INDEX IF EXISTS idx_positions_status;
+DROP INDEX IF EXISTS idx_execution_logs_execution_id;
+CREATE INDEX IF NOT EXISTS idx_circuit_breaker_resolved
+    ON circuit_breaker(resolved_at, triggered_at DESC);
+"""
+
 # マイグレーション定義: {バージョン: (SQL, 説明)}
 MIGRATIONS: dict[int, tuple[str, str]] = {
     1: (_SCHEMA_V1, "Initial schema: Phase 1 foundation"),
+    2: (_SCHEMA_V2, "Per-symbol LLM decisions table"),
+    3: (_SCHEMA_V3, "NYSE trading days cache"),
+    4: (_SCHEMA_V4, "Index daily_snapshots.high_water_mark"),
+    5: (_SCHEMA_V5, "Compound indexes for positions and circuit_breaker lookups"),
 }
 
+# executescript は実行前に暗黙 COMMIT するため1トランザクションにまとめられない。
+# 文単位に分割しておき、明示トランザクション内で execute する（DDLに ';' を含む文字列はない）
+_MIGRATION_STATEMENTS: dict[int, tuple[str, ...]] = {
+    version: tuple(stmt.strip() for stmt in sql.split(";") if stmt.strip())
+    for version, (sql, _description) in MIGRATIONS.items()
+}
+
+
+# INSERT ... RETURNING を使うため 3.35 以上が必要
+_MIN_SQLITE_VERSION = (3, 35, 0)
+
+# 接続ごとの文キャッシュ上限（sqlite3 のデフォルトは128）。
+# state_manager / risk_manager / health の SQL 定数がすべて載る大きさにしておく
+_CACHED_STATEMENTS = 256
+
+# 読み取り経路のキャッシュ設定（接続単位）。
+# DB全体（通常100MB未満）をmmapし、ページキャッシュも64MBまで広げて
+# reconcile/sync の参照をメモリ上で完結させる。
+_CACHE_PRAGMAS = (
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA temp_store = MEMORY",
+)
+
 
 def _set_pragmas(conn: sqlite3.Connection) -> None:
     """PRAGMA設定を適用する。"""
-    conn.execute("PRAGMA journal_mode = WAL")
+    mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+    # in-memory DB は常に "memory" を返すため対象外
+    if mode not in ("wal", "memory"):
+        logger.warning(f"WAL mode not enabled (journal_mode={mode})")
+    # WAL では NORMAL でもコミット単位の整合性は保たれ、fsync はチェックポイント時のみになる
+    conn.execute("PRAGMA synchronous = NORMAL")
     conn.execute("PRAGMA foreign_keys = ON")
     conn.execute("PRAGMA wal_autocheckpoint = 500")
     conn.execute("PRAGMA busy_timeout = 5000")
+    for pragma in _CACHE_PRAGMAS:
+        conn.execute(pragma)
 
 
 def _get_current_version(conn: sqlite3.Connection) -> int:
@@ -210,34 +294,183 @@ def init_db(db_path: str) -> sqlite3.Connection:
     Returns:
         設定済みのConnection
     """
+    if sqlite3.sqlite_version_info < _MIN_SQLITE_VERSION:
+        required = ".".join(map(str, _MIN_SQLITE_VERSION))
+        raise RuntimeError(f"SQLite {required}+ is required (found {sqlite3.sqlite_version})")
+
     if db_path != ":memory:":
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
 
-    conn = sqlite3.connect(db_path)
+    # ホットパスのSQLは各モジュールで定数化して再利用する
+    conn = sqlite3.connect(db_path, cached_statements=_CACHED_STATEMENTS)
     conn.row_factory = sqlite3.Row
     _set_pragmas(conn)
     migrate(conn)
     return conn
 
 
+def open_reader(db_path: str) -> sqlite3.Connection | None:
+    """読み取り専用接続を開く。
+
+    WALモードでは読み取りが単一ライターをブロックしないため、
+    純粋な参照クエリをライター接続から分離して SQLITE_BUSY を避ける。
+    init_db でスキーマ作成済みであることが前提。
+
+    Args:
+        db_path: SQLiteファイルパス
+
+    Returns:
+        mode=ro のConnection。":memory:" は接続間でDBを共有できないためNone。
+    """
+    if db_path == ":memory:":
+        return None
+
+    uri = f"{Path(db_path).resolve().as_uri()}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, cached_statements=_CACHED_STATEMENTS)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA busy_timeout = 5000")
+    conn.execute("PRAGMA query_only = ON")
+    for pragma in _CACHE_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
 def migrate(conn: sqlite3.Connection) -> None:
     """未適用のマイグレーションを順次実行する。
 
     schema_versionテーブルの最大バージョン番号を確認し、
     それより新しいマイグレーションを昇順で適用する。
+    適用後は PRAGMA user_version に最新バージョンを記録する。
+    未適用分はまとめて1つの BEGIN IMMEDIATE トランザクションで適用し、
+    途中で失敗した場合はすべてロールバックする。
+    """
+    latest = max(MIGRATIONS)
+    # 最新スキーマ適用済みのDBは PRAGMA user_version（ヘッダ内の整数）だけで判定し、
+    # sqlite_master / schema_version の参照をスキップする
+    if conn.execute("PRAGMA user_version").fetchone()[0] == latest:
+        return
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        current = _get_current_version(conn)
+        for version in sorted(MIGRATIONS.keys()):
+            if version <= current:
+                continue
+            for stmt in _MIGRATION_STATEMENTS[version]:
+                conn.execute(stmt)
+            conn.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (version, MIGRATIONS[version][1]),
+            )
+        conn.execute(f"PRAGMA user_version = {latest}")
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+# アーカイブ側の execution_logs。メインと同じ列・制約を明示し、
+# メイン側に列が追加されても INSERT の列ずれが起きないよう列名を固定する
+_ARCHIVE_EXECUTION_LOG_COLUMNS = (
+    "id, execution_id, mode, started_at, completed_at, status, "
+    "llm_input_tokens, llm_output_tokens, llm_cost_usd, llm_model_version, "
+    "decisions_json, error_message, execution_time_ms, created_at"
+)
+
+_SQL_CREATE_ARCHIVE_EXECUTION_LOGS = """
+CREATE TABLE IF NOT EXISTS archive.execution_logs (
+    id                INTEGER PRIMARY KEY,
+    execution_id      TEXT    NOT NULL UNIQUE,
+    mode              TEXT    NOT NULL
+                              CHECK(mode IN ('pre_market', 'morning',
+                                             'midday', 'eod',
+                                             'health_check', 'daily_report')),
+    started_at        TEXT    NOT NULL,
+    completed_at      TEXT,
+    status            TEXT    NOT NULL
+                              CHECK(status IN ('running', 'success',
+                                               'error', 'skipped')),
+    llm_input_tokens  INTEGER,
+    llm_output_tokens INTEGER,
+    llm_cost_usd      REAL,
+    llm_model_version TEXT,
+    decisions_json    TEXT,
+    error_message     TEXT,
+    execution_time_ms INTEGER,
+    created_at        TEXT
+)
+"""
+
+_SQL_ARCHIVE_EXECUTION_LOGS = (
+    f"INSERT OR IGNORE INTO archive.execution_logs ({_ARCHIVE_EXECUTION_LOG_COLUMNS}) "
+    f"SELECT {_ARCHIVE_EXECUTION_LOG_COLUMNS} FROM main.execution_logs "
+    "WHERE substr(started_at, 1, 7) = ?"
+)
+
+
+def archive_execution_logs(
+    conn: sqlite3.Connection,
+    archive_dir: str,
+    keep_months: int = 2,
+    today: date | None = None,
+) -> int:
+    """古い execution_logs を月別のアーカイブDBへ移動する。
+
+    当月を含む直近 keep_months ヶ月分はメインDBに残し、それより古い行を
+    ATTACH した execution_logs_YYYY_MM.db へ移してから削除する。
+    ホットな execution_logs とそのインデックスを小さく保つのが目的。
+    アーカイブ側は execution_id でユニークなため、途中で失敗しても再実行で重複しない。
+
+    Returns:
+        アーカイブした行数
     """
-    current = _get_current_version(conn)
+    today = today or date.today()
+    month_index = today.year * 12 + today.month - 1 - (keep_months - 1)
+    cutoff = date(month_index // 12, month_index % 12 + 1, 1).isoformat()
+
+    months = [
+        row[0]
+        for row in conn.execute(
+            "SELECT DISTINCT substr(started_at, 1, 7) FROM execution_logs WHERE started_at < ?",
+            (cutoff,),
+        ).fetchall()
+    ]
+    if not months:
+        return 0
 
-    for version in sorted(MIGRATIONS.keys()):
-        if version <= current:
-            continue
-        sql, description = MIGRATIONS[version]
-        conn.executescript(sql)
-        conn.execute(
-            "INSERT INTO schema_version (version, description) VALUES (?, ?)",
-            (version, description),
-        )
-        conn.commit()
+    # ATTACH はトランザクション外でしか実行できない
+    conn.commit()
+    archive_path = Path(archive_dir)
+    archive_path.mkdir(parents=True, exist_ok=True)
+
+    moved = 0
+    for month in months:
+        dest = archive_path / f"execution_logs_{month.replace('-', '_')}.db"
+        conn.execute("ATTACH DATABASE ? AS archive", (str(dest),))
+        try:
+            conn.execute(_SQL_CREATE_ARCHIVE_EXECUTION_LOGS)
+            # 旧版（CTAS）で作られたアーカイブには UNIQUE 制約がないため索引で補う
+            conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS archive.idx_archive_execution_id "
+                "ON execution_logs(execution_id)"
+            )
+            cursor = conn.execute(_SQL_ARCHIVE_EXECUTION_LOGS, (month,))
+            conn.execute(
+                "DELETE FROM main.execution_logs WHERE substr(started_at, 1, 7) = ?",
+                (month,),
+            )
+            conn.commit()
+            moved += cursor.rowcount
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.execute("DETACH DATABASE archive")
+
+    return moved
+
+
+_BACKUP_GENERATIONS = 7
 
 
 def backup_db(source_path: str, backup_dir: str) -> str:
@@ -254,7 +487,9 @@ def backup_db(source_path: str, backup_dir: str) -> str:
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     dest_file = backup_path / f"trading_backup_{timestamp}.db"
 
-    source_conn = sqlite3.connect(source_path)
+    # 読み取り専用で開き、取引側の書き込みと不要なロック競合を起こさない
+    source_uri = f"{Path(source_path).resolve().as_uri()}?mode=ro"
+    source_conn = sqlite3.connect(source_uri, uri=True)
     dest_conn = sqlite3.connect(str(dest_file))
     try:
         source_conn.backup(dest_conn)
@@ -264,12 +499,48 @@ def backup_db(source_path: str, backup_dir: str) -> str:
 
     # 7世代保持: 古いバックアップを削除
     backups = sorted(backup_path.glob("trading_backup_*.db"))
-    while len(backups) > 7:
-        backups.pop(0).unlink()
+    for old in backups[:-_BACKUP_GENERATIONS]:
+        old.unlink(missing_ok=True)
 
     return str(dest_file)
 
 
+# (スレッドID, db_path) → 初期化済み接続。sqlite3 の接続はスレッド間で共有しない
+_CONN_CACHE: dict[tuple[int, str], sqlite3.Connection] = {}
+_CONN_CACHE_LOCK = threading.Lock()
+
+
+def _is_open(conn: sqlite3.Connection) -> bool:
+    try:
+        conn.total_changes  # noqa: B018 - クローズ済みなら ProgrammingError
+    except sqlite3.ProgrammingError:
+        return False
+    return True
+
+
 def get_connection(db_path: str) -> sqlite3.Connection:
-    """接続取得のショートカット。init_db + migrate を実行。"""
-    return init_db(db_path)
+    """スレッドごとにキャッシュした接続を返す。
+
+    初回のみ init_db（PRAGMA設定 + migrate）を実行し、以降は同じ接続を返す。
+    呼び出し側でクローズされた接続は次回呼び出し時に開き直す。
+    全接続の後始末は close_all() で行う。
+    """
+    key = (threading.get_ident(), db_path)
+    with _CONN_CACHE_LOCK:
+        conn = _CONN_CACHE.get(key)
+        if conn is None or not _is_open(conn):
+            conn = _CONN_CACHE[key] = init_db(db_path)
+        return conn
+
+
+def close_all() -> None:
+    """get_connection でキャッシュした接続をすべて閉じ、キャッシュを空にする。
+
+    別スレッドで作られた接続は sqlite3 の制約で閉じられないため、参照を外して GC に任せる。
+    """
+    with _CONN_CACHE_LOCK:
+        conns = list(_CONN_CACHE.values())
+        _CONN_CACHE.clear()
+    for conn in conns:
+        with contextlib.suppress(sqlite3.ProgrammingError):
+            conn.close()
@@ -4,10 +4,14 @@ DB整合性、API疎通、実行ログの鮮度、回路ブレーカー状態、
 ディスク容量を包括的に検査する。
 """
 
+import functools
 import logging
 import os
 import shutil
 import sqlite3
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 
@@ -15,6 +19,63 @@ from modules.config import AppConfig
 
 logger = logging.getLogger("trading_agent")
 
+# SQLは定数化して同一文字列を再利用し、接続の文キャッシュに載せる
+# quick_check は索引と表の内容一致の検証を省くため integrity_check より大幅に速い。
+# (1) は最初のエラーで打ち切る
+_SQL_QUICK_CHECK = "PRAGMA quick_check(1)"
+
+_SQL_INTEGRITY_CHECK = "PRAGMA integrity_check(1)"
+
+_SQL_TABLE_NAMES = "SELECT name FROM sqlite_master WHERE type='table'"
+
+_SQL_LAST_SUCCESS = (
+    "SELECT MAX(started_at) as last_run FROM execution_logs WHERE status = 'success'"
+)
+
+_SQL_ACTIVE_CIRCUIT_BREAKER = """SELECT level, triggered_at, drawdown_pct
+FROM circuit_breaker
+WHERE resolved_at IS NULL
+ORDER BY level DESC LIMIT 1"""
+
+_SQL_RECENT_ERROR_COUNT = (
+    "SELECT COUNT(*) FROM execution_logs WHERE status = 'error' AND started_at > ?"
+)
+
+# レポートに並べるチェック名（実行順）
+_CHECK_NAMES = (
+    "paper_trading",
+    "api_connectivity",
+    "db_integrity",
+    "execution_staleness",
+    "circuit_breaker",
+    "recent_errors",
+    "disk_space",
+)
+
+# 失敗したら残りのチェックを打ち切る対象（run_full_health_check の fail_fast_on 用）
+CRITICAL_CHECKS = frozenset({"paper_trading"})
+
+_SKIPPED_MESSAGE = "skipped due to upstream failure"
+
+# ディスク空き容量のキャッシュ有効期間（秒）。ヘルスチェック用途では十分な鮮度
+_DISK_CACHE_SECONDS = 10
+
+_EXPECTED_TABLES = frozenset(
+    {
+        "positions",
+        "trades",
+        "daily_snapshots",
+        "execution_logs",
+        "circuit_breaker",
+        "strategy_params",
+        "reconciliation_logs",
+        "metrics",
+        "schema_version",
+        "decisions",
+        "trading_days",
+    }
+)
+
 
 @dataclass(frozen=True)
 class HealthCheckResult:
@@ -81,33 +142,29 @@ def check_api_connectivity(config: AppConfig) -> HealthCheckResult:
         return HealthCheckResult("api_connectivity", False, f"API error: {e}")
 
 
-def check_db_integrity(conn: sqlite3.Connection) -> HealthCheckResult:
-    """DB整合性チェック (PRAGMA integrity_check + テーブル存在確認)。"""
+def check_db_integrity(conn: sqlite3.Connection, full: bool = False) -> HealthCheckResult:
+    """DB整合性チェック (PRAGMA quick_check + テーブル存在確認)。
+
+    通常は quick_check で破損ページ・レコード形式の異常のみ検出する。
+    索引と表の不整合も検出したい場合（夜間メンテナンス等）は full=True で
+    integrity_check を使う。DBサイズに比例して大幅に遅くなる点に注意。
+    """
     try:
-        row = conn.execute("PRAGMA integrity_check").fetchone()
+        pragma = "integrity_check" if full else "quick_check"
+        row = conn.execute(_SQL_INTEGRITY_CHECK if full else _SQL_QUICK_CHECK).fetchone()
         integrity = row[0] if row else "unknown"
         if integrity != "ok":
-            return HealthCheckResult("db_integrity", False, f"integrity_check: {integrity}")
+            return HealthCheckResult("db_integrity", False, f"{pragma}: {integrity}")
 
-        expected_tables = {
-            "positions",
-            "trades",
-            "daily_snapshots",
-            "execution_logs",
-            "circuit_breaker",
-            "strategy_params",
-            "reconciliation_logs",
-            "metrics",
-            "schema_version",
-        }
-        rows = conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
-        actual_tables = {row[0] for row in rows}
-        missing = expected_tables - actual_tables
+        # カーソルを直接走査し、中間の set / list を作らずに差集合を取る
+        missing = _EXPECTED_TABLES.difference(row[0] for row in conn.execute(_SQL_TABLE_NAMES))
         if missing:
             return HealthCheckResult(
                 "db_integrity", False, f"Missing tables: {', '.join(sorted(missing))}"
             )
-        return HealthCheckResult("db_integrity", True, "All 9 tables present, integrity OK")
+        return HealthCheckResult(
+            "db_integrity", True, f"All {len(_EXPECTED_TABLES)} tables present, integrity OK"
+        )
     except Exception as e:
         return HealthCheckResult("db_integrity", False, f"DB error: {e}")
 
@@ -115,22 +172,22 @@ def check_db_integrity(conn: sqlite3.Connection) -> HealthCheckResult:
 def check_execution_staleness(
     conn: sqlite3.Connection,
     max_staleness_hours: int = 26,
+    now: datetime | None = None,
 ) -> HealthCheckResult:
     """最終実行からの経過時間を検査。
 
     max_staleness_hours のデフォルトは26h（1営業日+バッファ）。
+    now を渡すとその時刻を基準に判定する（省略時は現在時刻）。
     """
     try:
-        row = conn.execute(
-            "SELECT MAX(started_at) as last_run FROM execution_logs WHERE status = 'success'"
-        ).fetchone()
+        row = conn.execute(_SQL_LAST_SUCCESS).fetchone()
         if row is None or row["last_run"] is None:
             return HealthCheckResult(
                 "execution_staleness", True, "No previous executions (first run)"
             )
 
         last_run = datetime.fromisoformat(row["last_run"])
-        elapsed = datetime.now() - last_run
+        elapsed = (now or datetime.now()) - last_run
         hours = elapsed.total_seconds() / 3600
 
         if hours > max_staleness_hours:
@@ -151,12 +208,7 @@ def check_execution_staleness(
 def check_circuit_breaker_status(conn: sqlite3.Connection) -> HealthCheckResult:
     """回路ブレーカーの現在の状態を確認。"""
     try:
-        row = conn.execute(
-            """SELECT level, triggered_at, drawdown_pct
-               FROM circuit_breaker
-               WHERE resolved_at IS NULL
-               ORDER BY level DESC LIMIT 1"""
-        ).fetchone()
+        row = conn.execute(_SQL_ACTIVE_CIRCUIT_BREAKER).fetchone()
         if row is None:
             return HealthCheckResult("circuit_breaker", True, "No active circuit breaker")
 
@@ -172,14 +224,15 @@ def check_circuit_breaker_status(conn: sqlite3.Connection) -> HealthCheckResult:
         return HealthCheckResult("circuit_breaker", False, f"Error: {e}")
 
 
-def check_recent_errors(conn: sqlite3.Connection, hours: int = 24) -> HealthCheckResult:
-    """直近のエラー実行回数を確認。"""
+def check_recent_errors(
+    conn: sqlite3.Connection,
+    hours: int = 24,
+    now: datetime | None = None,
+) -> HealthCheckResult:
+    """直近のエラー実行回数を確認。now を渡すとその時刻を基準に集計する。"""
     try:
-        cutoff = (datetime.now() - timedelta(hours=hours)).isoformat()
-        row = conn.execute(
-            "SELECT COUNT(*) FROM execution_logs WHERE status = 'error' AND started_at > ?",
-            (cutoff,),
-        ).fetchone()
+        cutoff = ((now or datetime.now()) - timedelta(hours=hours)).isoformat()
+        row = conn.execute(_SQL_RECENT_ERROR_COUNT, (cutoff,)).fetchone()
         error_count = row[0] if row else 0
         if error_count >= 3:
             return HealthCheckResult(
@@ -192,12 +245,22 @@ def check_recent_errors(conn: sqlite3.Connection, hours: int = 24) -> HealthChec
         return HealthCheckResult("recent_errors", False, f"Error: {e}")
 
 
+@functools.lru_cache(maxsize=4)
+def _cached_disk_free(dir_path: str, bucket: int) -> int:
+    """空き容量（バイト）を返す。bucket が同じ間は statvfs を再実行しない。"""
+    return shutil.disk_usage(dir_path).free
+
+
 def check_disk_space(db_path: str, min_mb: int = 100) -> HealthCheckResult:
-    """DBディレクトリのディスク空き容量を確認。"""
+    """DBディレクトリのディスク空き容量を確認。
+
+    監視ループで繰り返し呼ばれる場合に備え、同一ディレクトリの結果を
+    _DISK_CACHE_SECONDS 秒単位でキャッシュする。
+    """
     try:
         dir_path = os.path.dirname(os.path.abspath(db_path))
-        usage = shutil.disk_usage(dir_path)
-        free_mb = usage.free / (1024 * 1024)
+        bucket = int(time.monotonic() // _DISK_CACHE_SECONDS)
+        free_mb = _cached_disk_free(dir_path, bucket) / (1024 * 1024)
         if free_mb < min_mb:
             return HealthCheckResult(
                 "disk_space",
@@ -209,20 +272,54 @@ def check_disk_space(db_path: str, min_mb: int = 100) -> HealthCheckResult:
         return HealthCheckResult("disk_space", False, f"Error: {e}")
 
 
+def _is_fatal(result: HealthCheckResult, fail_fast_on: frozenset[str]) -> bool:
+    return not result.ok and result.name in fail_fast_on
+
+
 def run_full_health_check(
     config: AppConfig,
     conn: sqlite3.Connection,
+    fail_fast_on: frozenset[str] = frozenset(),
 ) -> HealthReport:
-    """全ヘルスチェックを実行してレポートを返す。"""
-    report = HealthReport(timestamp=datetime.now().isoformat())
-
-    report.checks.append(check_paper_trading())
-    report.checks.append(check_api_connectivity(config))
-    report.checks.append(check_db_integrity(conn))
-    report.checks.append(check_execution_staleness(conn))
-    report.checks.append(check_circuit_breaker_status(conn))
-    report.checks.append(check_recent_errors(conn))
-    report.checks.append(check_disk_space(config.system.db_path))
+    """全ヘルスチェックを実行してレポートを返す。
+
+    API疎通確認（ネットワーク往復）は別スレッドで先行させ、その間に DB/ローカルの
+    チェックを実行する。sqlite3 接続はスレッド間で共有できないため、DB チェックは
+    呼び出し元スレッドで順に実行する。結果の並び順は従来どおり。
+
+    fail_fast_on に含まれるチェックが失敗した場合、以降のチェックは実行せず
+    "skipped" の失敗結果として記録する。paper_trading が失敗した場合は API 呼び出しも
+    行わない。API疎通確認は並行実行のため、その失敗でローカルチェックは止めない。
+    """
+    # 全チェックで同じ基準時刻を使い、レポートのタイムスタンプと判定を一致させる
+    now = datetime.now()
+    report = HealthReport(timestamp=now.isoformat())
+
+    results: dict[str, HealthCheckResult] = {}
+    paper = check_paper_trading()
+    results[paper.name] = paper
+    if not _is_fatal(paper, fail_fast_on):
+        local_checks: tuple[Callable[[], HealthCheckResult], ...] = (
+            lambda: check_db_integrity(conn),
+            lambda: check_execution_staleness(conn, now=now),
+            lambda: check_circuit_breaker_status(conn),
+            lambda: check_recent_errors(conn, now=now),
+            lambda: check_disk_space(config.system.db_path),
+        )
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            api_future = executor.submit(check_api_connectivity, config)
+            for run_check in local_checks:
+                result = run_check()
+                results[result.name] = result
+                if _is_fatal(result, fail_fast_on):
+                    break
+            api_result = api_future.result()
+        results[api_result.name] = api_result
+
+    report.checks.extend(
+        results.get(name) or HealthCheckResult(name, False, _SKIPPED_MESSAGE)
+        for name in _CHECK_NAMES
+    )
 
     status = "ALL OK" if report.all_ok else f"{len(report.failed)} FAILED"
     logger.info(f"Health check completed: {status}")
@@ -4,12 +4,33 @@ Claude CLIを呼び出し、JSON Schema Validationとフォールバック戦略
 堅牢にトレーディング判断を取得する。
 """
 
-import json
+import atexit
+import contextlib
+import functools
 import logging
+import math
+import operator
+import os
+import re
+import select
+import selectors
 import subprocess
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Any
 
-from jsonschema import ValidationError, validate
+import orjson
+from jsonschema import Draft202012Validator, ValidationError
+
+try:
+    import fastjsonschema
+
+    HAS_FASTJSONSCHEMA = True
+except ImportError:
+    HAS_FASTJSONSCHEMA = False
 
 from modules.types import Action, BarData, PortfolioState, TradingDecision
 
@@ -75,84 +96,103 @@ DECISION_SCHEMA: dict = {
     },
 }
 
+# validate() は呼び出しごとにメタスキーマ検査とバリデータ生成を行うため、import 時に1回だけ作る。
+# $schema 未指定時の validate() と同じ Draft 2020-12 を使う
+Draft202012Validator.check_schema(DECISION_SCHEMA)
+_DECISION_VALIDATOR = Draft202012Validator(DECISION_SCHEMA)
 
-def _unwrap_cli_json(raw: str) -> str:
-    """Claude CLI の --output-format json ラッパーを解除する。
 
-    Claude CLI は {"type":"result","result":"..."} 形式で出力する。
-    result フィールドに実際のLLMレスポンスが格納されている。
+def _build_decision_validator(
+    fast: bool,
+) -> tuple[Callable[[Any], Any], tuple[type[Exception], ...]]:
+    """DECISION_SCHEMA の検証関数と、検証失敗時に送出される例外型を返す。
+
+    fast=True なら fastjsonschema でスキーマ専用の検証関数を生成する（汎用の再帰検証より1桁速い）。
     """
-    try:
-        outer = json.loads(raw)
-        if isinstance(outer, dict) and "result" in outer:
-            return str(outer["result"])
-    except (json.JSONDecodeError, TypeError):
-        pass
-    return raw
+    if fast:
+        return fastjsonschema.compile(DECISION_SCHEMA), (fastjsonschema.JsonSchemaValueException,)
+    return _DECISION_VALIDATOR.validate, (ValidationError,)
+
+
+# fastjsonschema があれば使い、未インストール時は jsonschema のバリデータにフォールバックする
+_validate_decisions, _SCHEMA_ERRORS = _build_decision_validator(HAS_FASTJSONSCHEMA)
 
 
 def _extract_json(raw: str) -> dict | None:
-    """生の出力からJSON部分を抽出する。"""
-    # Claude CLI ラッパー解除
-    text = _unwrap_cli_json(raw)
+    """生の出力からJSON部分を抽出する。
 
-    # まず全体をパース
+    Claude CLI の --output-format json では {"type":"result","result":"..."} 形式で出力され、
+    result フィールドに実際のLLMレスポンスが格納されている。
+    ラッパー解除と全体パースは1回の loads で兼ね、ラッパーでなければその結果を返す。
+    result がオブジェクトで始まらない場合（```json フェンスや前置きの文章付き）は
+    全体パースが必ず失敗するため、試さずに部分抽出へ進む。
+    """
     try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        pass
-
-    # 最初の '{' から最後の '}' を抽出
+        outer = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        text = raw
+    else:
+        if not (isinstance(outer, dict) and "result" in outer):
+            return outer
+        text = str(outer["result"])
+        if text.lstrip().startswith("{"):
+            try:
+                return orjson.loads(text)
+            except orjson.JSONDecodeError:
+                pass
+
+    # 最初の '{' から最後の '}' を抽出（str.find は1文字検索に memchr 相当の高速経路を使う）
     start = text.find("{")
     end = text.rfind("}")
     if start != -1 and end != -1 and end > start:
         try:
-            return json.loads(text[start : end + 1])
-        except json.JSONDecodeError:
+            return orjson.loads(text[start : end + 1])
+        except orjson.JSONDecodeError:
             pass
     return None
 
 
+# _sanitize_partial で許容する action 値（Action enum の値と一致）
+_VALID_ACTIONS = frozenset(a.value for a in Action)
+
+
 def _sanitize_partial(parsed: dict) -> dict:
     """部分的に有効なJSONをサニタイズする。"""
     valid_decisions = []
     for d in parsed.get("decisions", []):
-        if all(k in d for k in ["symbol", "action"]):
-            action = str(d["action"]).lower().strip()
-            if action not in ("buy", "sell", "hold", "no_action"):
-                action = "no_action"
-            d["action"] = action
-            valid_decisions.append(d)
+        if "symbol" not in d or "action" not in d:
+            continue
+        action = str(d["action"]).lower().strip()
+        if action not in _VALID_ACTIONS:
+            action = "no_action"
+        d["action"] = action
+        valid_decisions.append(d)
     parsed["decisions"] = valid_decisions
     return parsed
 
 
+# LLM に渡す項目。attrgetter で1オブジェクトあたり1回の呼び出しにまとめて取得する
+_INPUT_BAR_FIELDS = ("close", "volume", "ma_50", "rsi_14", "atr_14", "volume_ratio_20d")
+_get_bar_fields = operator.attrgetter(*_INPUT_BAR_FIELDS)
+
+_INPUT_POSITION_FIELDS = ("qty", "avg_entry_price", "current_price", "unrealized_pnl", "sector")
+_get_position_fields = operator.attrgetter(*_INPUT_POSITION_FIELDS)
+
+
 def _build_input_data(
     market_data: dict[str, BarData],
     portfolio: PortfolioState,
     mode: str,
 ) -> dict:
     """Claude CLIに渡す入力データを構築する。"""
-    symbols_data = {}
-    for symbol, bar in market_data.items():
-        symbols_data[symbol] = {
-            "close": bar.close,
-            "volume": bar.volume,
-            "ma_50": bar.ma_50,
-            "rsi_14": bar.rsi_14,
-            "atr_14": bar.atr_14,
-            "volume_ratio_20d": bar.volume_ratio_20d,
-        }
-
-    positions_data = {}
-    for symbol, pos in portfolio.positions.items():
-        positions_data[symbol] = {
-            "qty": pos.qty,
-            "avg_entry_price": pos.avg_entry_price,
-            "current_price": pos.current_price,
-            "unrealized_pnl": pos.unrealized_pnl,
-            "sector": pos.sector,
-        }
+    symbols_data = {
+        symbol: dict(zip(_INPUT_BAR_FIELDS, _get_bar_fields(bar), strict=True))
+        for symbol, bar in market_data.items()
+    }
+    positions_data = {
+        symbol: dict(zip(_INPUT_POSITION_FIELDS, _get_position_fields(pos), strict=True))
+        for symbol, pos in portfolio.positions.items()
+    }
 
     return {
         "mode": mode,
@@ -168,6 +208,207 @@ def _build_input_data(
     }
 
 
+_CLAUDE_CMD = ("claude", "-p")
+
+_READ_CHUNK_BYTES = 64 * 1024
+
+# select が書き込み可能と報告したパイプにブロックせず書ける最小保証サイズ
+_PIPE_BUF = getattr(select, "PIPE_BUF", 512)
+
+# JSON の構造判定に必要な記号だけを C レベル（正規表現）で拾う
+_JSON_STRUCT_TOKENS = re.compile(rb'[{}"\\]')
+
+
+class _JsonObjectScanner:
+    """バイトストリームから最初のトップレベル JSON オブジェクトの終端を検出する。
+
+    文字列リテラル内の波括弧とエスケープされた引用符は数えない。
+    チャンク境界をまたぐ場合に備え、位置はストリーム先頭からの絶対位置で扱う。
+    offset にはこのスキャナに最初に渡すバイト列のストリーム上の位置を指定する。
+    """
+
+    def __init__(self, offset: int = 0) -> None:
+        self.start = -1
+        self._depth = 0
+        self._in_string = False
+        self._escaped_pos = -1
+        self._offset = offset
+
+    def feed(self, chunk: bytes) -> int | None:
+        """chunk を走査する。オブジェクトが閉じたら終端の次の絶対位置を返す。"""
+        base = self._offset
+        self._offset += len(chunk)
+        for m in _JSON_STRUCT_TOKENS.finditer(chunk):
+            pos = base + m.start()
+            if pos == self._escaped_pos:
+                continue
+            token = m.group()
+            if self.start < 0:
+                if token == b"{":
+                    self.start = pos
+                    self._depth = 1
+            elif self._in_string:
+                if token == b"\\":
+                    self._escaped_pos = pos + 1
+                elif token == b'"':
+                    self._in_string = False
+            elif token == b'"':
+                self._in_string = True
+            elif token == b"{":
+                self._depth += 1
+            elif token == b"}":
+                self._depth -= 1
+                if self._depth == 0:
+                    return pos + 1
+        return None
+
+
+def _load_scanned_object(data: bytes) -> dict[str, Any] | None:
+    """検出したオブジェクトをパースする。CLI ラッパーなら中身を取り出す。
+
+    判断結果（decisions キーを持つ）か CLI の result ラッパーのときだけ返す。
+    説明文中の例示 JSON などそれ以外のオブジェクトは None。
+    """
+    try:
+        obj = orjson.loads(data)
+    except orjson.JSONDecodeError:
+        return None
+    if not isinstance(obj, dict):
+        return None
+    if "result" in obj:
+        return _extract_json(str(obj["result"]))
+    return obj if "decisions" in obj else None
+
+
+def _spawn_claude() -> subprocess.Popen[bytes]:
+    return subprocess.Popen(
+        _CLAUDE_CMD,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+
+def _close_process(proc: subprocess.Popen[bytes]) -> None:
+    """プロセスを終了させ、パイプを閉じる。"""
+    if proc.poll() is None:
+        proc.kill()
+        proc.wait()
+    for pipe in (proc.stdin, proc.stdout, proc.stderr):
+        if pipe is not None:
+            with contextlib.suppress(OSError):
+                pipe.close()
+
+
+# 事前起動済みで stdin（プロンプト）待ちの Claude CLI プロセス
+_warm_procs: list[subprocess.Popen[bytes]] = []
+_warm_lock = threading.Lock()
+
+
+def prewarm_claude(count: int = 1) -> None:
+    """Claude CLI を事前に起動し、起動コストを市場データ取得などと重ねる。
+
+    `claude -p` は stdin の EOF までプロンプトを読むため、起動だけ先に済ませて
+    待機させておける。待機中の生存プロセスが count 個になるまで補充する。
+    使われなかったプロセスはインタプリタ終了時に破棄する。
+    """
+    with _warm_lock:
+        alive = [proc for proc in _warm_procs if proc.poll() is None]
+        for proc in _warm_procs:
+            if proc.poll() is not None:
+                _close_process(proc)
+        _warm_procs[:] = alive
+        try:
+            for _ in range(count - len(alive)):
+                _warm_procs.append(_spawn_claude())
+        except OSError as e:
+            logger.warning(f"Claude CLI prewarm failed: {e}")
+
+
+def _take_claude_process() -> subprocess.Popen[bytes]:
+    """待機中のプロセスがあれば使い、なければ新たに起動する。"""
+    with _warm_lock:
+        while _warm_procs:
+            proc = _warm_procs.pop()
+            if proc.poll() is None:
+                return proc
+            _close_process(proc)
+    return _spawn_claude()
+
+
+@atexit.register
+def _discard_warm_processes() -> None:
+    with _warm_lock:
+        for proc in _warm_procs:
+            _close_process(proc)
+        _warm_procs.clear()
+
+
+def _stream_claude(
+    full_prompt: str, timeout: int
+) -> tuple[int | None, bytes, bytes, dict[str, Any] | None]:
+    """Claude CLI を実行し、stdin への書き込みと stdout の読み込みを逐次行う。
+
+    判断結果（decisions キーを持つオブジェクトか CLI の result ラッパー）が閉じて
+    パースできた時点で読み込みを打ち切り、プロセスを終了させる（後続の説明文などは
+    待たない）。それ以外のオブジェクトは読み飛ばして次を探し、検出できなければ
+    従来どおり EOF まで読む。プロンプトの書き込みも同じ selector で行い、timeout に含める。
+
+    Returns:
+        (終了コード, stdout, stderr, 検出したオブジェクト)。
+        オブジェクトを検出して打ち切った場合、終了コードは None。
+
+    Raises:
+        subprocess.TimeoutExpired: timeout 秒以内に完了しなかった場合
+    """
+    deadline = time.monotonic() + timeout
+    proc = _take_claude_process()
+    try:
+        prompt = memoryview(full_prompt.encode())
+        written = 0
+        stdout = bytearray()
+        stderr = bytearray()
+        scanner = _JsonObjectScanner()
+        with selectors.DefaultSelector() as sel:
+            sel.register(proc.stdin, selectors.EVENT_WRITE)  # type: ignore[arg-type]
+            sel.register(proc.stdout, selectors.EVENT_READ, stdout)  # type: ignore[arg-type]
+            sel.register(proc.stderr, selectors.EVENT_READ, stderr)  # type: ignore[arg-type]
+            while sel.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(_CLAUDE_CMD, timeout)
+                for key, _events in sel.select(remaining):
+                    if key.fileobj is proc.stdin:
+                        try:
+                            written += os.write(key.fd, prompt[written : written + _PIPE_BUF])
+                        except BrokenPipeError:
+                            written = len(prompt)
+                        if written >= len(prompt):
+                            sel.unregister(key.fileobj)
+                            proc.stdin.close()
+                        continue
+                    chunk = os.read(key.fd, _READ_CHUNK_BYTES)
+                    if not chunk:
+                        sel.unregister(key.fileobj)
+                        continue
+                    key.data.extend(chunk)
+                    if key.data is not stdout:
+                        continue
+                    end = scanner.feed(chunk)
+                    while end is not None:
+                        parsed = _load_scanned_object(stdout[scanner.start : end])
+                        if parsed is not None:
+                            return None, bytes(stdout), bytes(stderr), parsed
+                        # 判断結果ではない: 直後から次のトップレベルオブジェクトを探す
+                        scanner = _JsonObjectScanner(end)
+                        end = scanner.feed(bytes(stdout[end:]))
+
+        returncode = proc.wait(timeout=max(deadline - time.monotonic(), 0))
+        return returncode, bytes(stdout), bytes(stderr), None
+    finally:
+        _close_process(proc)
+
+
 def call_claude_with_validation(
     prompt_text: str,
     input_data: str,
@@ -190,41 +431,38 @@ def call_claude_with_validation(
     for attempt in range(max_retries):
         parsed = None
         try:
-            result = subprocess.run(
-                ["claude", "-p"],
-                input=full_prompt,
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-            )
-
-            if result.returncode != 0:
-                logger.error(
-                    f"Claude CLI exited with {result.returncode} "
-                    f"(attempt {attempt + 1}): {result.stderr[:500]}"
-                )
-                continue
-
-            raw_output = result.stdout.strip()
-            parsed = _extract_json(raw_output)
+            returncode, stdout, stderr, parsed = _stream_claude(full_prompt, timeout)
 
             if parsed is None:
-                logger.error(f"Failed to extract JSON (attempt {attempt + 1}): {raw_output[:200]}")
-                continue
+                if returncode != 0:
+                    logger.error(
+                        f"Claude CLI exited with {returncode} "
+                        f"(attempt {attempt + 1}): {stderr.decode(errors='replace')[:500]}"
+                    )
+                    continue
+
+                raw_output = stdout.decode(errors="replace").strip()
+                parsed = _extract_json(raw_output)
+
+                if parsed is None:
+                    logger.error(
+                        f"Failed to extract JSON (attempt {attempt + 1}): {raw_output[:200]}"
+                    )
+                    continue
 
             # JSON Schemaバリデーション
-            validate(instance=parsed, schema=DECISION_SCHEMA)
+            _validate_decisions(parsed)
             return parsed
 
         except subprocess.TimeoutExpired:
             logger.error(f"Claude CLI timeout (attempt {attempt + 1})")
             continue
-        except ValidationError as e:
-            logger.error(f"Schema validation failed (attempt {attempt + 1}): {e.message}")
+        except _SCHEMA_ERRORS as e:
+            logger.error(f"Schema validation failed (attempt {attempt + 1}): {e}")
             if parsed and "decisions" in parsed:
                 return _sanitize_partial(parsed)
             continue
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             logger.error(f"JSON decode failed (attempt {attempt + 1}): {e}")
             continue
 
@@ -233,26 +471,47 @@ def call_claude_with_validation(
     return None
 
 
+# action 文字列 -> Action。未知の値は例外処理を経ずに dict.get の既定値で NO_ACTION にする
+_ACTION_BY_VALUE: dict[object, Action] = {a.value: a for a in Action}
+
+# 欠損フィールド用の共有の空 dict（読み取り専用に使い、呼び出しごとの生成を省く）
+_EMPTY: dict[str, Any] = {}
+
+
+def _coerce_confidence(value: object) -> int:
+    """confidence を 0〜100 の int に丸める。欠損・数値化できない値は 0。
+
+    _sanitize_partial を通った部分出力は範囲外の値を含み得るため、
+    decisions テーブルの CHECK 制約に違反しないようここで正規化する。
+    """
+    try:
+        confidence = float(value)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return 0
+    if math.isnan(confidence):
+        return 0
+    return int(min(max(confidence, 0.0), 100.0))
+
+
 def _parse_decisions(
     raw_decisions: list[dict], market_data: dict[str, BarData]
 ) -> list[TradingDecision]:
     """LLM出力の生decisionsリストをTradingDecisionに変換する。"""
     decisions: list[TradingDecision] = []
+    get_action = _ACTION_BY_VALUE.get
+    get_bar = market_data.get
+    no_action = Action.NO_ACTION
     for d in raw_decisions:
         symbol = d.get("symbol", "")
-        action_str = d.get("action", "no_action")
-        try:
-            action = Action(action_str)
-        except ValueError:
-            action = Action.NO_ACTION
+        action = get_action(d.get("action"), no_action)
 
-        sentiment = d.get("sentiment_analysis") or {}
-        confidence = sentiment.get("confidence", 0)
-        trade_params = d.get("trade_parameters") or {}
-        reasoning = d.get("reasoning_structured") or {}
+        sentiment = d.get("sentiment_analysis") or _EMPTY
+        confidence = _coerce_confidence(sentiment.get("confidence", 0))
+        trade_params = d.get("trade_parameters") or _EMPTY
+        reasoning = d.get("reasoning_structured") or _EMPTY
 
         # 市場データからデフォルト値を取得
-        bar = market_data.get(symbol)
+        bar = get_bar(symbol)
         entry_price = trade_params.get("suggested_entry_price", bar.close if bar else 0)
         stop_loss = trade_params.get("calculated_stop_loss", 0)
         take_profit = trade_params.get("calculated_take_profit", 0)
@@ -274,21 +533,59 @@ def _parse_decisions(
     return decisions
 
 
+@functools.lru_cache(maxsize=8)
+def _read_prompt(path: str, mtime_ns: int) -> str:
+    """プロンプトファイルを読み込む。mtime をキーに含め、編集されたら読み直す。"""
+    return Path(path).read_text(encoding="utf-8")
+
+
+def _serialize_input_data(
+    market_data: dict[str, BarData],
+    portfolio: PortfolioState,
+    mode: str,
+) -> str:
+    # orjson は UTF-8 のまま出力する（json.dumps の ensure_ascii=False 相当）。
+    # インデントは付けない（空白はモデルの判断に寄与せず、入力トークンを増やすだけ）。
+    # 指標値が numpy スカラーの場合もそのまま直列化し、NaN は null になる
+    return orjson.dumps(
+        _build_input_data(market_data, portfolio, mode),
+        option=orjson.OPT_SERIALIZE_NUMPY,
+    ).decode()
+
+
+def _shard_market_data(market_data: dict[str, BarData], shards: int) -> list[dict[str, BarData]]:
+    """銘柄を最大 shards 個のほぼ均等なグループに分ける（順序は維持）。"""
+    symbols = list(market_data)
+    if shards <= 1 or len(symbols) <= 1:
+        return [market_data]
+    size = -(-len(symbols) // min(shards, len(symbols)))
+    return [
+        {symbol: market_data[symbol] for symbol in symbols[i : i + size]}
+        for i in range(0, len(symbols), size)
+    ]
+
+
 def get_trading_decisions(
     market_data: dict[str, BarData],
     portfolio: PortfolioState,
     mode: str,
     prompt_path: str | None = None,
     timeout: int = 120,
+    shards: int = 1,
 ) -> list[TradingDecision]:
     """LLM分析を実行し、トレーディング判断を取得する。
 
+    shards > 1 の場合は銘柄を分割し、Claude CLI を並行に起動して結果を結合する。
+    CLI の待ち時間はモデル側の推論が支配的なため、スレッドで重ねるだけで短縮できる。
+    ポートフォリオ情報は全シャードに同じものを渡す。
+
     Args:
         market_data: 銘柄ごとのBarData
         portfolio: ポートフォリオ状態
         mode: 実行モード（morning, midday, eod等）
         prompt_path: プロンプトファイルパス
         timeout: Claude CLIタイムアウト
+        shards: 並行実行する Claude CLI セッション数の上限
 
     Returns:
         TradingDecisionのリスト
@@ -296,22 +593,32 @@ def get_trading_decisions(
     if prompt_path is None:
         prompt_path = str(Path(__file__).parent.parent / "prompts" / "trading_decision.md")
 
-    prompt_text = Path(prompt_path).read_text(encoding="utf-8")
-    input_data = json.dumps(
-        _build_input_data(market_data, portfolio, mode),
-        ensure_ascii=False,
-        indent=2,
-    )
+    prompt_text = _read_prompt(prompt_path, os.stat(prompt_path).st_mtime_ns)
 
-    result = call_claude_with_validation(
-        prompt_text=prompt_text,
-        input_data=input_data,
-        timeout=timeout,
-    )
+    def _analyze(shard: dict[str, BarData]) -> dict[str, Any] | None:
+        return call_claude_with_validation(
+            prompt_text=prompt_text,
+            input_data=_serialize_input_data(shard, portfolio, mode),
+            timeout=timeout,
+        )
+
+    shard_list = _shard_market_data(market_data, shards)
+    if len(shard_list) == 1:
+        results = [_analyze(shard_list[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=len(shard_list)) as pool:
+            results = list(pool.map(_analyze, shard_list))
+
+    raw_decisions: list[dict[str, Any]] = []
+    for i, result in enumerate(results):
+        if result is None:
+            if len(results) > 1:
+                logger.error(f"No valid decisions from LLM shard {i + 1}/{len(results)}")
+            continue
+        raw_decisions.extend(result.get("decisions", []))
 
-    if result is None:
+    if all(result is None for result in results):
         logger.error("No valid decisions from LLM analysis")
         return []
 
-    raw_decisions = result.get("decisions", [])
     return _parse_decisions(raw_decisions, market_data)
@@ -4,19 +4,32 @@ JSON Lines形式でログを出力し、RotatingFileHandlerで10MB x 5世代管
 コンソールにはWARNING以上のみ出力する。
 """
 
-import json
 import logging
-from datetime import UTC, datetime
+import time
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
 
+import orjson
+
 
 class JsonFormatter(logging.Formatter):
     """JSON Lines形式のログフォーマッター。"""
 
+    # (エポック秒, 整形済み文字列)。同じ秒のレコードは strftime を再実行しない。
+    # タプルの差し替えは1回の代入なので、複数スレッドから呼ばれても組が崩れない
+    _ts_cache: tuple[int, str] = (-1, "")
+
+    def _format_ts(self, created: float) -> str:
+        second = int(created)
+        cached_second, cached = self._ts_cache
+        if second != cached_second:
+            cached = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+            self._ts_cache = (second, cached)
+        return cached
+
     def format(self, record: logging.LogRecord) -> str:
         log_entry = {
-            "ts": datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%S"),
+            "ts": self._format_ts(record.created),
             "level": record.levelname,
             "module": record.module,
             "func": record.funcName,
@@ -25,7 +38,8 @@ class JsonFormatter(logging.Formatter):
         }
         if record.exc_info and record.exc_info[1] is not None:
             log_entry["exception"] = self.formatException(record.exc_info)
-        return json.dumps(log_entry, ensure_ascii=False)
+        # orjson は非ASCII文字をエスケープせず UTF-8 のまま出力する（ensure_ascii=False 相当）
+        return orjson.dumps(log_entry).decode()
 
 
 def setup_logger(
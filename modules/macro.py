@@ -4,10 +4,21 @@ S&P500 vs 200日MA + VIX の2変数でブル/ベア/レンジを判定する。
 ヒステリシス: 確定には3営業日連続で同一判定を要求。
 """
 
-from collections import deque
-
 from modules.types import MacroRegime, VixRegime
 
+# 比較結果（bool の差 -1/0/1）をそのまま添字にする分岐なしのテーブル。
+# 添字 -1 は末尾要素を指すため、(上回り) - (下回り) で BULL / RANGE / BEAR を引ける
+_REGIME_BY_SIGN = (MacroRegime.RANGE, MacroRegime.BULL, MacroRegime.BEAR)
+
+# 添字 0/1/2 = 閾値未満 / 警戒以上 / 極端以上
+_VIX_REGIME_BY_LEVEL = (VixRegime.LOW, VixRegime.ELEVATED, VixRegime.EXTREME)
+
+_VIX_MAX_POSITIONS = {
+    VixRegime.LOW: 5,
+    VixRegime.ELEVATED: 3,
+    VixRegime.EXTREME: 0,  # 新規エントリー禁止
+}
+
 
 def classify_spy_regime(spy_close: float, spy_ma200: float) -> MacroRegime:
     """SPY vs 200日MAでレジームを判定する。
@@ -23,12 +34,8 @@ def classify_spy_regime(spy_close: float, spy_ma200: float) -> MacroRegime:
         return MacroRegime.RANGE
 
     ratio = spy_close / spy_ma200
-    if ratio > 1.02:  # 200日MAを2%以上上回る
-        return MacroRegime.BULL
-    elif ratio < 0.98:  # 200日MAを2%以上下回る
-        return MacroRegime.BEAR
-    else:
-        return MacroRegime.RANGE
+    # 200日MAを2%以上上回る -> BULL、2%以上下回る -> BEAR、それ以外 -> RANGE
+    return _REGIME_BY_SIGN[(ratio > 1.02) - (ratio < 0.98)]
 
 
 def classify_vix_regime(
@@ -46,12 +53,8 @@ def classify_vix_regime(
     Returns:
         VixRegime
     """
-    if vix >= threshold_extreme:
-        return VixRegime.EXTREME
-    elif vix >= threshold_elevated:
-        return VixRegime.ELEVATED
-    else:
-        return VixRegime.LOW
+    # 閾値の大小が逆に設定されても極端判定を優先するため、加算ではなく max を取る
+    return _VIX_REGIME_BY_LEVEL[max(vix >= threshold_elevated, 2 * (vix >= threshold_extreme))]
 
 
 def determine_macro_regime(spy_close: float, spy_ma200: float, vix: float) -> MacroRegime:
@@ -71,13 +74,8 @@ def determine_macro_regime(spy_close: float, spy_ma200: float, vix: float) -> Ma
     """
     spy_regime = classify_spy_regime(spy_close, spy_ma200)
 
-    # VIXが極端 -> ベア寄り
-    if vix >= 30:
-        vix_signal = MacroRegime.BEAR
-    elif vix <= 15:
-        vix_signal = MacroRegime.BULL
-    else:
-        vix_signal = MacroRegime.RANGE
+    # VIXが極端(>=30) -> ベア寄り、低水準(<=15) -> ブル寄り
+    vix_signal = _REGIME_BY_SIGN[(vix <= 15) - (vix >= 30)]
 
     # 2変数が一致 -> その判定
     if spy_regime == vix_signal:
@@ -96,24 +94,20 @@ def max_positions_for_vix(vix_regime: VixRegime) -> int:
     Returns:
         最大ポジション数
     """
-    match vix_regime:
-        case VixRegime.LOW:
-            return 5
-        case VixRegime.ELEVATED:
-            return 3
-        case VixRegime.EXTREME:
-            return 0  # 新規エントリー禁止
+    return _VIX_MAX_POSITIONS[vix_regime]
 
 
 class RegimeTracker:
     """ヒステリシス付きレジームトラッカー。
 
     確定には3営業日連続で同一判定を要求する。
+    履歴は保持せず、直前の判定とその連続日数だけを持つ。
     """
 
     def __init__(self, consecutive_days: int = 3) -> None:
         self._consecutive_days = consecutive_days
-        self._history: deque[MacroRegime] = deque(maxlen=consecutive_days)
+        self._last_regime: MacroRegime | None = None
+        self._streak = 0
         self._confirmed: MacroRegime = MacroRegime.RANGE
 
     @property
@@ -130,10 +124,13 @@ class RegimeTracker:
         Returns:
             確定済みレジーム
         """
-        self._history.append(regime)
+        if regime == self._last_regime:
+            self._streak += 1
+        else:
+            self._last_regime, self._streak = regime, 1
 
         # 3日連続で同一判定なら確定
-        if len(self._history) >= self._consecutive_days and len(set(self._history)) == 1:
+        if self._streak >= self._consecutive_days:
             self._confirmed = regime
 
         return self._confirmed
@@ -6,6 +6,8 @@
 
 import logging
 import os
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 
 from modules.config import AppConfig
 from modules.types import (
@@ -17,6 +19,9 @@ from modules.types import (
 
 logger = logging.getLogger("trading_agent")
 
+# 同一フェーズ内で同時に送信する注文数の上限（Alpaca のレート制限に配慮）
+_MAX_ORDER_WORKERS = 4
+
 
 def _get_trading_client():  # type: ignore[no-untyped-def]
     """Alpaca Trading クライアントを取得する。"""
@@ -51,25 +56,40 @@ class AlpacaOrderExecutor:
         portfolio: PortfolioState,
         execution_id: str,
     ) -> list[OrderResult]:
-        """SELL先→BUY後の順で処理。"""
-        self._verify_paper_trading()
+        """SELL先→BUY後の順で処理。
 
-        results: list[OrderResult] = []
+        フェーズ内の注文は互いに独立しているため、submit_order（REST往復）を
+        スレッドで並行させる。BUYフェーズはSELLフェーズの全注文が返ってから開始する。
+        結果の並びはフェーズ内で decisions の順序を保つ。
+        """
+        self._verify_paper_trading()
 
         # SELL注文を先に処理（資金を開放）
         sell_decisions = [d for d in decisions if d.action == Action.SELL]
         buy_decisions = [d for d in decisions if d.action == Action.BUY]
 
-        for decision in sell_decisions:
-            result = self._execute_sell(decision, portfolio, execution_id)
-            results.append(result)
-
-        for decision in buy_decisions:
-            result = self._execute_buy(decision, portfolio, execution_id)
-            results.append(result)
-
+        results = self._submit_phase(self._execute_sell, sell_decisions, portfolio, execution_id)
+        results.extend(
+            self._submit_phase(self._execute_buy, buy_decisions, portfolio, execution_id)
+        )
         return results
 
+    def _submit_phase(
+        self,
+        submit: Callable[[TradingDecision, PortfolioState, str], OrderResult],
+        decisions: list[TradingDecision],
+        portfolio: PortfolioState,
+        execution_id: str,
+    ) -> list[OrderResult]:
+        """1フェーズ分の注文を並行送信する。リトライは注文ごとに submit 内で行う。"""
+        if len(decisions) <= 1:
+            return [submit(d, portfolio, execution_id) for d in decisions]
+
+        # クライアント生成をスレッド間で競合させないよう、先に確定させておく
+        self._get_client()
+        with ThreadPoolExecutor(max_workers=min(_MAX_ORDER_WORKERS, len(decisions))) as pool:
+            return list(pool.map(lambda d: submit(d, portfolio, execution_id), decisions))
+
     def _execute_buy(
         self,
         decision: TradingDecision,
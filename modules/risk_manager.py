@@ -4,6 +4,7 @@
 セクター集中チェック、日次エントリー制限を担う。
 """
 
+import bisect
 import logging
 import math
 import sqlite3
@@ -23,6 +24,21 @@ _COOLDOWN_HOURS: dict[int, int | None] = {
     4: None,  # L4: 無期限（手動解除のみ）
 }
 
+# === SQL定数 ===
+# sqlite3 の文キャッシュは SQL 文字列で引かれるため、モジュール定数に固定して再利用する
+
+_SQL_TODAY_ENTRY_COUNT = "SELECT COUNT(*) FROM positions WHERE entry_date = ?"
+
+_SQL_ACTIVE_CB = """SELECT id, level, triggered_at, drawdown_pct
+    FROM circuit_breaker
+    WHERE resolved_at IS NULL
+    ORDER BY triggered_at DESC LIMIT 1"""
+
+_SQL_RESOLVE_CB = "UPDATE circuit_breaker SET resolved_at = datetime('now') WHERE id = ?"
+
+_SQL_INSERT_CB = """INSERT INTO circuit_breaker (level, triggered_at, drawdown_pct, reason)
+    VALUES (?, datetime('now'), ?, ?)"""
+
 
 class AlpacaRiskManager:
     """RiskChecker Protocol の実装。"""
@@ -30,25 +46,22 @@ class AlpacaRiskManager:
     def __init__(self, config: AppConfig, conn: sqlite3.Connection) -> None:
         self._config = config
         self._conn = conn
+        # L1〜L4 の閾値（config のバリデーションで狭義単調増加が保証されている）
+        risk = config.risk
+        self._cb_thresholds = (
+            risk.circuit_breaker_level1_pct,
+            risk.circuit_breaker_level2_pct,
+            risk.circuit_breaker_level3_pct,
+            risk.circuit_breaker_level4_pct,
+        )
 
     def check_circuit_breaker(self, portfolio: PortfolioState) -> CircuitBreakerState:
         """4段階CB (4%/7%/10%/15%)、クールダウン期間管理。"""
         dd = portfolio.drawdown_pct
-        risk = self._config.risk
 
-        thresholds = [
-            (4, risk.circuit_breaker_level4_pct),
-            (3, risk.circuit_breaker_level3_pct),
-            (2, risk.circuit_breaker_level2_pct),
-            (1, risk.circuit_breaker_level1_pct),
-        ]
-
-        # 現在のドローダウンに基づくレベル判定
-        current_level = 0
-        for level, threshold in thresholds:
-            if dd >= threshold:
-                current_level = level
-                break
+        # 現在のドローダウンに基づくレベル判定: dd 以下の閾値の個数がそのままレベルになる。
+        # NaN は bisect では全閾値以上として扱われるため、比較不能な値として L0 にする
+        current_level = 0 if math.isnan(dd) else bisect.bisect_right(self._cb_thresholds, dd)
 
         # 既存のアクティブCBをチェック
         active_cb = self._get_active_cb()
@@ -113,31 +126,11 @@ class AlpacaRiskManager:
         self, portfolio: PortfolioState, new_symbol: str, new_sector: str
     ) -> bool:
         """セクター集中チェック（上限2、Tech=3）。"""
-        max_per_sector = 2
-        if new_sector == "Technology":
-            max_per_sector = 3
-
-        sector_count = 0
-        for pos in portfolio.positions.values():
-            if pos.sector == new_sector:
-                sector_count += 1
-
-        if sector_count >= max_per_sector:
-            logger.info(
-                f"Sector exposure limit reached: {new_sector} has "
-                f"{sector_count}/{max_per_sector} positions"
-            )
-            return False
-        return True
+        return self._sector_has_room(new_sector, portfolio.sector_counts[new_sector])
 
     def check_daily_entry_limit(self, conn: sqlite3.Connection) -> bool:
         """当日エントリー数 < max_daily_entries。"""
-        today = date.today().isoformat()
-        row = conn.execute(
-            "SELECT COUNT(*) FROM positions WHERE entry_date = ?",
-            (today,),
-        ).fetchone()
-        count = row[0] if row else 0
+        count = self._get_today_entry_count(conn)
         limit = self._config.strategy.max_daily_entries
         if count >= limit:
             logger.info(f"Daily entry limit reached: {count}/{limit}")
@@ -152,48 +145,89 @@ class AlpacaRiskManager:
         vix_regime: VixRegime,
     ) -> tuple[bool, str]:
         """全リスクチェック統合。"""
+        return self.can_open_new_positions(portfolio, {symbol: sector}, vix_regime)[symbol]
+
+    def can_open_new_positions(
+        self,
+        portfolio: PortfolioState,
+        symbol_sectors: dict[str, str],
+        vix_regime: VixRegime,
+    ) -> dict[str, tuple[bool, str]]:
+        """複数銘柄の全リスクチェックを一括で行う。
+
+        CB判定・ポジション数・当日エントリー数（DB 1クエリ）は銘柄に依存しないため1回だけ評価し、
+        銘柄ごとには重複ポジションとセクター集中のみを判定する。
+
+        Returns:
+            symbol → (許可可否, 理由)
+        """
         # 1. サーキットブレーカー
         cb = self.check_circuit_breaker(portfolio)
         if cb.active:
-            return False, f"Circuit breaker L{cb.level} active (DD={cb.drawdown_pct:.1f}%)"
+            reason = f"Circuit breaker L{cb.level} active (DD={cb.drawdown_pct:.1f}%)"
+            return dict.fromkeys(symbol_sectors, (False, reason))
 
         # 2. VIXレジームによるポジション数制限
         max_pos = max_positions_for_vix(vix_regime)
         current_pos = len(portfolio.positions)
         if current_pos >= max_pos:
-            return False, (
+            reason = (
                 f"VIX regime {vix_regime.value}: max {max_pos} positions, current {current_pos}"
             )
+            return dict.fromkeys(symbol_sectors, (False, reason))
 
         # 3. 最大同時ポジション数
         config_max = self._config.strategy.max_concurrent_positions
         if current_pos >= config_max:
-            return False, f"Max concurrent positions reached: {current_pos}/{config_max}"
+            reason = f"Max concurrent positions reached: {current_pos}/{config_max}"
+            return dict.fromkeys(symbol_sectors, (False, reason))
+
+        sector_counts = portfolio.sector_counts
+        daily_limit_ok: bool | None = None  # 必要になった時点で1回だけ問い合わせる
+
+        results: dict[str, tuple[bool, str]] = {}
+        for symbol, sector in symbol_sectors.items():
+            # 4. 重複ポジション
+            if symbol in portfolio.positions:
+                results[symbol] = (False, f"Already have open position in {symbol}")
+                continue
+
+            # 5. セクター集中
+            if not self._sector_has_room(sector, sector_counts[sector]):
+                results[symbol] = (False, f"Sector exposure limit for {sector}")
+                continue
+
+            # 6. 日次エントリー制限
+            if daily_limit_ok is None:
+                daily_limit_ok = self.check_daily_entry_limit(self._conn)
+            if not daily_limit_ok:
+                results[symbol] = (False, "Daily entry limit reached")
+                continue
+
+            results[symbol] = (True, "OK")
+        return results
 
-        # 4. 重複ポジション
-        if symbol in portfolio.positions:
-            return False, f"Already have open position in {symbol}"
-
-        # 5. セクター集中
-        if not self.validate_sector_exposure(portfolio, symbol, sector):
-            return False, f"Sector exposure limit for {sector}"
-
-        # 6. 日次エントリー制限
-        if not self.check_daily_entry_limit(self._conn):
-            return False, "Daily entry limit reached"
+    # === Internal Helpers ===
 
-        return True, "OK"
+    def _sector_has_room(self, sector: str, sector_count: int) -> bool:
+        """セクター上限（2、Tech=3）に空きがあるか。"""
+        max_per_sector = 3 if sector == "Technology" else 2
+        if sector_count >= max_per_sector:
+            logger.info(
+                f"Sector exposure limit reached: {sector} has "
+                f"{sector_count}/{max_per_sector} positions"
+            )
+            return False
+        return True
 
-    # === Internal Helpers ===
+    def _get_today_entry_count(self, conn: sqlite3.Connection) -> int:
+        """当日エントリー数を取得する。"""
+        row = conn.execute(_SQL_TODAY_ENTRY_COUNT, (date.today().isoformat(),)).fetchone()
+        return row[0] if row else 0
 
     def _get_active_cb(self) -> dict | None:
         """未解除のサーキットブレーカーを取得。"""
-        row = self._conn.execute(
-            """SELECT id, level, triggered_at, drawdown_pct
-               FROM circuit_breaker
-               WHERE resolved_at IS NULL
-               ORDER BY triggered_at DESC LIMIT 1"""
-        ).fetchone()
+        row = self._conn.execute(_SQL_ACTIVE_CB).fetchone()
         if row is None:
             return None
 
@@ -214,10 +248,7 @@ class AlpacaRiskManager:
 
     def _resolve_cb(self, cb_id: int) -> None:
         """サーキットブレーカーを解除する。"""
-        self._conn.execute(
-            "UPDATE circuit_breaker SET resolved_at = datetime('now') WHERE id = ?",
-            (cb_id,),
-        )
+        self._conn.execute(_SQL_RESOLVE_CB, (cb_id,))
         self._conn.commit()
         logger.info(f"Circuit breaker {cb_id} resolved")
 
@@ -231,9 +262,5 @@ class AlpacaRiskManager:
     def _record_cb(self, level: int, drawdown_pct: float, cooldown_until: date | None) -> None:
         """サーキットブレーカーをDBに記録する。"""
         reason = f"Drawdown {drawdown_pct:.1f}% exceeded L{level} threshold"
-        self._conn.execute(
-            """INSERT INTO circuit_breaker (level, triggered_at, drawdown_pct, reason)
-               VALUES (?, datetime('now'), ?, ?)""",
-            (level, drawdown_pct, reason),
-        )
+        self._conn.execute(_SQL_INSERT_CB, (level, drawdown_pct, reason))
         self._conn.commit()
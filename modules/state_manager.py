@@ -8,6 +8,8 @@ import contextlib
 import logging
 import os
 import sqlite3
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime
 
 from modules.config import AppConfig
@@ -21,6 +23,95 @@ from modules.universe import get_sector
 
 logger = logging.getLogger("trading_agent")
 
+# === SQL定数 ===
+# sqlite3 の文キャッシュは SQL 文字列で引かれるため、ホットパスの文は
+# モジュール定数に固定して毎回同一の文字列を渡す（sqlite3_prepare_v2 の再実行を避ける）
+
+_SQL_INSERT_RECONCILIATION_LOG = """INSERT INTO reconciliation_logs
+    (execution_id, issue_type, symbol, details, auto_fixed)
+    VALUES (?, ?, ?, ?, ?)"""
+
+_SQL_INSERT_POSITION = """INSERT INTO positions
+    (symbol, side, qty, entry_price, entry_date, stop_loss, take_profit,
+     strategy_reason, sentiment_score, status, alpaca_order_id, sector)
+    VALUES (?, 'long', ?, ?, ?, ?, ?, ?, ?, 'open', ?, ?)
+    RETURNING id"""
+
+_SQL_SELECT_OPEN_POSITION = """SELECT id, entry_price, qty
+    FROM positions WHERE symbol = ? AND status = 'open'"""
+
+_SQL_CLOSE_POSITION = """UPDATE positions
+    SET status = 'closed', close_price = ?, close_date = ?,
+        close_reason = ?, pnl = ?, updated_at = datetime('now')
+    WHERE id = ?"""
+
+_SQL_UPSERT_DAILY_SNAPSHOT = """INSERT INTO daily_snapshots
+    (date, total_equity, cash, positions_value, daily_pnl_pct,
+     drawdown_pct, high_water_mark, open_positions, macro_regime, vix_close)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(date) DO UPDATE SET
+        total_equity = excluded.total_equity,
+        cash = excluded.cash,
+        positions_value = excluded.positions_value,
+        daily_pnl_pct = excluded.daily_pnl_pct,
+        drawdown_pct = excluded.drawdown_pct,
+        high_water_mark = excluded.high_water_mark,
+        open_positions = excluded.open_positions,
+        macro_regime = excluded.macro_regime,
+        vix_close = excluded.vix_close"""
+
+_SQL_INSERT_TRADE = """INSERT INTO trades
+    (position_id, symbol, side, qty, price, order_type,
+     alpaca_order_id, client_order_id, fill_status, executed_at)
+    VALUES (?, ?, ?, ?, ?, 'limit', ?, ?, 'filled', datetime('now'))"""
+
+_SQL_INSERT_DECISION = """INSERT OR REPLACE INTO decisions
+    (execution_id, symbol, action, confidence)
+    VALUES (?, ?, ?, ?)"""
+
+_SQL_EXECUTION_ID_EXISTS = "SELECT 1 FROM execution_logs WHERE execution_id = ?"
+
+# 既存行は mode / started_at を保持し、完了情報だけを更新する
+_SQL_UPSERT_EXECUTION_LOG = """INSERT INTO execution_logs
+    (execution_id, mode, started_at, completed_at, status,
+     decisions_json, error_message, execution_time_ms)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(execution_id) DO UPDATE SET
+        completed_at = excluded.completed_at,
+        status = excluded.status,
+        decisions_json = excluded.decisions_json,
+        error_message = excluded.error_message,
+        execution_time_ms = excluded.execution_time_ms"""
+
+_SQL_SELECT_OPEN_POSITIONS = """SELECT symbol, qty, entry_price, stop_loss, sector, entry_date
+    FROM positions WHERE status = 'open'"""
+
+_SQL_TODAY_ENTRY_COUNT = (
+    "SELECT COUNT(*) FROM positions WHERE entry_date = ? AND status IN ('open', 'closed')"
+)
+
+_SQL_PIPELINE_CONTEXT = """SELECT
+    (SELECT MAX(high_water_mark) FROM daily_snapshots) AS prev_hwm,
+    (SELECT total_equity FROM daily_snapshots
+     ORDER BY date DESC LIMIT 1) AS prev_equity"""
+
+_SQL_FIX_CLOSE_MISSING = """UPDATE positions SET status = 'closed', close_date = ?,
+    close_reason = 'reconciliation', updated_at = datetime('now')
+    WHERE symbol = ? AND status = 'open'"""
+
+_SQL_FIX_ADD_MISSING = """INSERT INTO positions
+    (symbol, side, qty, entry_price, entry_date, status, source, sector)
+    VALUES (?, 'long', ?, 0.01, ?, 'open', 'reconciliation', ?)"""
+
+_SQL_FIX_QTY_MISMATCH = """UPDATE positions SET qty = ?, updated_at = datetime('now')
+    WHERE symbol = ? AND status = 'open'"""
+
+
+# リコンシリエーションの整合性判定: ポジション評価額の合計と口座の long_market_value の
+# 許容差（%）。2つのAPI呼び出しの間の価格変動を吸収できる幅にする
+_MARKET_VALUE_TOLERANCE_PCT = 1.0
+_MARKET_VALUE_TOLERANCE_MIN = 1.0  # ドル。ポジションなし・少額時の下限
+
 
 def _get_trading_client():  # type: ignore[no-untyped-def]
     """Alpaca Trading クライアントを取得する。"""
@@ -40,10 +131,38 @@ class AlpacaStateManager:
         config: AppConfig,
         conn: sqlite3.Connection,
         trading_client: object | None = None,
+        read_conn: sqlite3.Connection | None = None,
     ) -> None:
         self._config = config
         self._conn = conn
+        # 参照専用クエリは読み取り接続へ。未指定時はライター接続を共用する
+        self._read_conn = read_conn if read_conn is not None else conn
         self._client = trading_client
+        self._tx_depth = 0
+
+    def _commit(self) -> None:
+        """transaction() の外なら即コミット。内側では transaction() 終了時にまとめてコミット。"""
+        if self._tx_depth == 0:
+            self._conn.commit()
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[None]:
+        """複数の書き込みを1トランザクション（1回のCOMMIT）にまとめる。
+
+        ブロック内の各メソッドは個別にコミットしない。例外時はブロック全体をロールバックする。
+        ネストした場合は最外側でのみコミット/ロールバックする。
+        """
+        self._tx_depth += 1
+        try:
+            yield
+        except BaseException:
+            self._tx_depth -= 1
+            if self._tx_depth == 0:
+                self._conn.rollback()
+            raise
+        self._tx_depth -= 1
+        if self._tx_depth == 0:
+            self._conn.commit()
 
     def _get_client(self) -> object:
         if self._client is None:
@@ -74,14 +193,19 @@ class AlpacaStateManager:
                 sector=get_sector(symbol),
             )
 
-        # HWMとドローダウンをdaily_snapshotsから算出
-        high_water_mark = self._get_high_water_mark(equity)
+        # HWM・前日equityを1クエリで取得し、ドローダウンと日次PnL%を算出
+        context = self.load_pipeline_context()
+        high_water_mark = max(context["prev_high_water_mark"] or 0.0, equity)
         drawdown_pct = (
             ((high_water_mark - equity) / high_water_mark * 100) if high_water_mark > 0 else 0.0
         )
 
-        # 日次PnL%を算出
-        daily_pnl_pct = self._get_daily_pnl_pct(equity)
+        prev_equity = context["prev_equity"]
+        daily_pnl_pct = (
+            (equity - prev_equity) / prev_equity * 100
+            if prev_equity is not None and prev_equity > 0
+            else 0.0
+        )
 
         return PortfolioState(
             equity=equity,
@@ -94,93 +218,84 @@ class AlpacaStateManager:
         )
 
     def reconcile(self) -> list[str]:
-        """2回API呼び出し→DB比較→3件未満なら自動修正→reconciliation_logsに記録。"""
-        client = self._get_client()
+        """ポジション+口座の整合性確認→DB比較→3件未満なら自動修正→reconciliation_logsに記録。"""
         issues: list[str] = []
 
-        # 2回API呼び出しで確認
-        alpaca_positions_1 = {
-            p.symbol: float(p.qty)
-            for p in client.get_all_positions()  # type: ignore[union-attr]
-        }
-        alpaca_positions_2 = {
-            p.symbol: float(p.qty)
-            for p in client.get_all_positions()  # type: ignore[union-attr]
-        }
-
-        # 2回の結果が一致しなければ中断
-        if alpaca_positions_1 != alpaca_positions_2:
-            issues.append("API_INCONSISTENT: Two API calls returned different results")
+        # ポジションと口座を同時に取得し、評価額の合計が一致すれば整合とみなす。
+        # 不一致（約定の反映途中など）なら1回だけ取り直す
+        for _attempt in range(2):
+            alpaca_positions, consistent = self._fetch_position_snapshot()
+            if consistent:
+                break
+        else:
+            issues.append(
+                "API_INCONSISTENT: Positions market value does not match account long_market_value"
+            )
             logger.warning("Reconciliation aborted: API results inconsistent")
             return issues
 
-        alpaca_positions = alpaca_positions_1
         db_positions = self.get_open_positions()
 
-        discrepancies: list[dict[str, str]] = []
+        # 差分は dict のキービューの集合演算で求める。集合は順序を持たないため、
+        # ログと自動修正の順序が実行ごとに変わらないよう銘柄順に並べる
+        alpaca_symbols = alpaca_positions.keys()
+        db_symbols = db_positions.keys()
 
         # Alpacaにあるが、DBにない
-        for symbol, qty in alpaca_positions.items():
-            if symbol not in db_positions:
-                discrepancies.append(
-                    {
-                        "issue_type": "ADDED_MISSING",
-                        "symbol": symbol,
-                        "details": f"In Alpaca (qty={qty}) but missing from DB",
-                    }
-                )
+        discrepancies: list[dict[str, str]] = [
+            {
+                "issue_type": "ADDED_MISSING",
+                "symbol": symbol,
+                "details": f"In Alpaca (qty={alpaca_positions[symbol]}) but missing from DB",
+            }
+            for symbol in sorted(alpaca_symbols - db_symbols)
+        ]
 
         # DBにあるが、Alpacaにない
-        for symbol in db_positions:
-            if symbol not in alpaca_positions:
-                discrepancies.append(
-                    {
-                        "issue_type": "CLOSED_MISSING",
-                        "symbol": symbol,
-                        "details": "In DB but missing from Alpaca",
-                    }
-                )
+        discrepancies.extend(
+            {
+                "issue_type": "CLOSED_MISSING",
+                "symbol": symbol,
+                "details": "In DB but missing from Alpaca",
+            }
+            for symbol in sorted(db_symbols - alpaca_symbols)
+        )
 
         # 数量不一致
-        for symbol in set(alpaca_positions) & set(db_positions):
-            alpaca_qty = alpaca_positions[symbol]
-            db_qty = db_positions[symbol].qty
-            if abs(alpaca_qty - db_qty) > 0.001:
-                discrepancies.append(
-                    {
-                        "issue_type": "QTY_MISMATCH",
-                        "symbol": symbol,
-                        "details": f"Alpaca qty={alpaca_qty}, DB qty={db_qty}",
-                    }
-                )
+        qty_pairs = (
+            (symbol, alpaca_positions[symbol], db_positions[symbol].qty)
+            for symbol in sorted(alpaca_symbols & db_symbols)
+        )
+        discrepancies.extend(
+            {
+                "issue_type": "QTY_MISMATCH",
+                "symbol": symbol,
+                "details": f"Alpaca qty={alpaca_qty}, DB qty={db_qty}",
+            }
+            for symbol, alpaca_qty, db_qty in qty_pairs
+            if abs(alpaca_qty - db_qty) > 0.001
+        )
 
         # 3件未満なら自動修正
         auto_fix = len(discrepancies) < 3
 
         execution_id = f"reconcile_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
 
-        for d in discrepancies:
-            issue_msg = f"{d['issue_type']}: {d['symbol']} - {d['details']}"
-            issues.append(issue_msg)
-            logger.warning(f"Reconciliation issue: {issue_msg}")
-
-            if auto_fix:
-                self._auto_fix(d, alpaca_positions)
+        # ログ行はまとめて executemany し、自動修正と合わせて1トランザクションで確定する
+        log_rows: list[tuple[str, str, str, str, int]] = []
+        with self.transaction():
+            for d in discrepancies:
+                issue_msg = f"{d['issue_type']}: {d['symbol']} - {d['details']}"
+                issues.append(issue_msg)
+                logger.warning(f"Reconciliation issue: {issue_msg}")
 
-            self._conn.execute(
-                """INSERT INTO reconciliation_logs
-                   (execution_id, issue_type, symbol, details, auto_fixed)
-                   VALUES (?, ?, ?, ?, ?)""",
-                (
-                    execution_id,
-                    d["issue_type"],
-                    d["symbol"],
-                    d["details"],
-                    1 if auto_fix else 0,
-                ),
-            )
+                if auto_fix:
+                    self._auto_fix(d, alpaca_positions)
 
-        self._conn.commit()
+                log_rows.append(
+                    (execution_id, d["issue_type"], d["symbol"], d["details"], int(auto_fix))
+                )
+            self._conn.executemany(_SQL_INSERT_RECONCILIATION_LOG, log_rows)
 
         if discrepancies and not auto_fix:
             logger.error(
@@ -194,11 +309,8 @@ class AlpacaStateManager:
 
     def open_position(self, decision: TradingDecision, order_result: OrderResult) -> int:
         """positionsテーブルにINSERT。"""
-        cursor = self._conn.execute(
-            """INSERT INTO positions
-               (symbol, side, qty, entry_price, entry_date, stop_loss, take_profit,
-                strategy_reason, sentiment_score, status, alpaca_order_id, sector)
-               VALUES (?, 'long', ?, ?, ?, ?, ?, ?, ?, 'open', ?, ?)""",
+        position_id: int = self._conn.execute(
+            _SQL_INSERT_POSITION,
             (
                 decision.symbol,
                 order_result.filled_qty,
@@ -211,46 +323,59 @@ class AlpacaStateManager:
                 order_result.alpaca_order_id,
                 get_sector(decision.symbol),
             ),
-        )
-        self._conn.commit()
-        position_id = cursor.lastrowid
+        ).fetchone()[0]
+        self._commit()
         logger.info(
             f"Opened position {position_id}: {decision.symbol} "
             f"qty={order_result.filled_qty} @ {order_result.filled_price}"
         )
-        return position_id if position_id is not None else 0
+        return position_id
 
-    def close_position(self, symbol: str, reason: str, close_price: float) -> None:
-        """positions UPDATE (status=closed, pnl計算)。"""
+    def close_position(self, symbol: str, reason: str, close_price: float) -> int | None:
+        """positions UPDATE (status=closed, pnl計算)。クローズしたposition_idを返す。"""
         row = self._conn.execute(
-            "SELECT id, entry_price, qty FROM positions WHERE symbol = ? AND status = 'open'",
+            _SQL_SELECT_OPEN_POSITION,
             (symbol,),
         ).fetchone()
         if row is None:
             logger.warning(f"No open position found for {symbol}")
-            return
+            return None
 
-        position_id = row["id"]
+        position_id: int = row["id"]
         entry_price = row["entry_price"]
         qty = row["qty"]
         pnl = (close_price - entry_price) * qty
 
         self._conn.execute(
-            """UPDATE positions
-               SET status = 'closed', close_price = ?, close_date = ?,
-                   close_reason = ?, pnl = ?, updated_at = datetime('now')
-               WHERE id = ?""",
+            _SQL_CLOSE_POSITION,
             (close_price, date.today().isoformat(), reason, pnl, position_id),
         )
-        self._conn.commit()
+        self._commit()
         logger.info(f"Closed position {position_id}: {symbol} reason={reason} pnl={pnl:.2f}")
+        return position_id
+
+    def _fetch_position_snapshot(self) -> tuple[dict[str, float], bool]:
+        """Alpacaのポジション数量と、口座の評価額との整合性を返す。
+
+        get_account と get_all_positions は並行して呼び、往復1回分の待ち時間で済ませる。
+        """
+        client = self._get_client()
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            account_future = pool.submit(client.get_account)  # type: ignore[attr-defined]
+            positions = client.get_all_positions()  # type: ignore[attr-defined]
+            account = account_future.result()
+
+        quantities = {p.symbol: float(p.qty) for p in positions}
+        positions_value = sum(float(p.market_value or 0) for p in positions)
+        account_value = float(account.long_market_value or 0)
+        tolerance = max(
+            abs(account_value) * _MARKET_VALUE_TOLERANCE_PCT / 100, _MARKET_VALUE_TOLERANCE_MIN
+        )
+        return quantities, abs(positions_value - account_value) <= tolerance
 
     def get_open_positions(self) -> dict[str, PositionInfo]:
         """positions WHERE status='open'。"""
-        rows = self._conn.execute(
-            """SELECT symbol, qty, entry_price, stop_loss, sector, entry_date
-               FROM positions WHERE status = 'open'"""
-        ).fetchall()
+        rows = self._read_conn.execute(_SQL_SELECT_OPEN_POSITIONS).fetchall()
 
         positions: dict[str, PositionInfo] = {}
         for row in rows:
@@ -281,20 +406,7 @@ class AlpacaStateManager:
         """daily_snapshots INSERT/UPSERT。"""
         today = date.today().isoformat()
         self._conn.execute(
-            """INSERT INTO daily_snapshots
-               (date, total_equity, cash, positions_value, daily_pnl_pct,
-                drawdown_pct, high_water_mark, open_positions, macro_regime, vix_close)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-               ON CONFLICT(date) DO UPDATE SET
-                   total_equity = excluded.total_equity,
-                   cash = excluded.cash,
-                   positions_value = excluded.positions_value,
-                   daily_pnl_pct = excluded.daily_pnl_pct,
-                   drawdown_pct = excluded.drawdown_pct,
-                   high_water_mark = excluded.high_water_mark,
-                   open_positions = excluded.open_positions,
-                   macro_regime = excluded.macro_regime,
-                   vix_close = excluded.vix_close""",
+            _SQL_UPSERT_DAILY_SNAPSHOT,
             (
                 today,
                 portfolio.equity,
@@ -308,17 +420,14 @@ class AlpacaStateManager:
                 vix,
             ),
         )
-        self._conn.commit()
+        self._commit()
         logger.info(f"Saved daily snapshot for {today}")
 
-    def record_trade(self, order_result: OrderResult, position_id: int) -> None:
+    def record_trade(self, order_result: OrderResult, position_id: int | None) -> None:
         """trades INSERT。"""
         side = "buy" if order_result.filled_qty > 0 else "sell"
         self._conn.execute(
-            """INSERT INTO trades
-               (position_id, symbol, side, qty, price, order_type,
-                alpaca_order_id, client_order_id, fill_status, executed_at)
-               VALUES (?, ?, ?, ?, ?, 'limit', ?, ?, 'filled', datetime('now'))""",
+            _SQL_INSERT_TRADE,
             (
                 position_id,
                 order_result.symbol,
@@ -329,14 +438,22 @@ class AlpacaStateManager:
                 order_result.client_order_id,
             ),
         )
-        self._conn.commit()
+        self._commit()
+
+    def record_decisions(self, execution_id: str, decisions: list[TradingDecision]) -> None:
+        """LLM判断を銘柄ごとに decisions へ一括INSERT（1トランザクション）。"""
+        self._conn.executemany(
+            _SQL_INSERT_DECISION,
+            [(execution_id, d.symbol, d.action.value, d.confidence) for d in decisions],
+        )
+        self._commit()
 
     # === Execution Log ===
 
     def check_execution_id(self, execution_id: str) -> bool:
         """execution_logs重複チェック。Trueなら既に存在する。"""
-        row = self._conn.execute(
-            "SELECT 1 FROM execution_logs WHERE execution_id = ?",
+        row = self._read_conn.execute(
+            _SQL_EXECUTION_ID_EXISTS,
             (execution_id,),
         ).fetchone()
         return row is not None
@@ -352,75 +469,42 @@ class AlpacaStateManager:
         error_message: str | None = None,
         execution_time_ms: int | None = None,
     ) -> None:
-        """execution_logs INSERT/UPDATE。"""
-        existing = self._conn.execute(
-            "SELECT 1 FROM execution_logs WHERE execution_id = ?",
-            (execution_id,),
-        ).fetchone()
-
-        if existing:
-            self._conn.execute(
-                """UPDATE execution_logs
-                   SET completed_at = ?, status = ?, decisions_json = ?,
-                       error_message = ?, execution_time_ms = ?
-                   WHERE execution_id = ?""",
-                (
-                    completed_at,
-                    status,
-                    decisions_json,
-                    error_message,
-                    execution_time_ms,
-                    execution_id,
-                ),
-            )
-        else:
-            self._conn.execute(
-                """INSERT INTO execution_logs
-                   (execution_id, mode, started_at, status, decisions_json,
-                    error_message, execution_time_ms)
-                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    execution_id,
-                    mode,
-                    started_at,
-                    status,
-                    decisions_json,
-                    error_message,
-                    execution_time_ms,
-                ),
-            )
-        self._conn.commit()
+        """execution_logs UPSERT（1文で INSERT / 既存行の UPDATE を行う）。"""
+        self._conn.execute(
+            _SQL_UPSERT_EXECUTION_LOG,
+            (
+                execution_id,
+                mode,
+                started_at,
+                completed_at,
+                status,
+                decisions_json,
+                error_message,
+                execution_time_ms,
+            ),
+        )
+        self._commit()
 
     def get_today_entry_count(self) -> int:
         """当日エントリー数カウント。"""
         today = date.today().isoformat()
-        row = self._conn.execute(
-            "SELECT COUNT(*) FROM positions WHERE entry_date = ? AND status IN ('open', 'closed')",
-            (today,),
-        ).fetchone()
+        row = self._read_conn.execute(_SQL_TODAY_ENTRY_COUNT, (today,)).fetchone()
         return row[0] if row else 0
 
     # === Internal Helpers ===
 
-    def _get_high_water_mark(self, current_equity: float) -> float:
-        """daily_snapshotsからHWMを算出。"""
-        row = self._conn.execute(
-            "SELECT MAX(high_water_mark) as hwm FROM daily_snapshots"
-        ).fetchone()
-        prev_hwm = float(row["hwm"]) if row and row["hwm"] is not None else 0.0
-        return max(prev_hwm, current_equity)
-
-    def _get_daily_pnl_pct(self, current_equity: float) -> float:
-        """前日のequityと比較して日次PnL%を算出。"""
-        row = self._conn.execute(
-            "SELECT total_equity FROM daily_snapshots ORDER BY date DESC LIMIT 1"
-        ).fetchone()
-        if row is None:
-            return 0.0
-        prev_equity = float(row["total_equity"])
-        if prev_equity <= 0:
-            return 0.0
-        return (current_equity - prev_equity) / prev_equity * 100
+    def load_pipeline_context(self) -> dict[str, float | None]:
+        """daily_snapshotsの過去HWMと直近equityを1回のSELECTで取得する。
+
+        Returns:
+            prev_high_water_mark: 過去スナップショットの最大HWM（なければNone）
+            prev_equity: 直近スナップショットのequity（なければNone）
+        """
+        row = self._read_conn.execute(_SQL_PIPELINE_CONTEXT).fetchone()
+        return {
+            "prev_high_water_mark": float(row["prev_hwm"]) if row["prev_hwm"] is not None else None,
+            "prev_equity": float(row["prev_equity"]) if row["prev_equity"] is not None else None,
+        }
 
     def _auto_fix(self, discrepancy: dict[str, str], alpaca_positions: dict[str, float]) -> None:
         """差異を自動修正する。"""
@@ -429,21 +513,14 @@ class AlpacaStateManager:
 
         if issue_type == "CLOSED_MISSING":
             # DBにあるがAlpacaにない → DB側をclosedに
-            self._conn.execute(
-                """UPDATE positions SET status = 'closed', close_date = ?,
-                   close_reason = 'reconciliation', updated_at = datetime('now')
-                   WHERE symbol = ? AND status = 'open'""",
-                (date.today().isoformat(), symbol),
-            )
+            self._conn.execute(_SQL_FIX_CLOSE_MISSING, (date.today().isoformat(), symbol))
             logger.info(f"Auto-fixed: closed {symbol} in DB (not in Alpaca)")
 
         elif issue_type == "ADDED_MISSING":
             # Alpacaにあるが、DBにない → DBにINSERT（entry_price=0.01は推定不可のため暫定値）
             qty = alpaca_positions.get(symbol, 0)
             self._conn.execute(
-                """INSERT INTO positions
-                   (symbol, side, qty, entry_price, entry_date, status, source, sector)
-                   VALUES (?, 'long', ?, 0.01, ?, 'open', 'reconciliation', ?)""",
+                _SQL_FIX_ADD_MISSING,
                 (symbol, qty, date.today().isoformat(), get_sector(symbol)),
             )
             logger.info(f"Auto-fixed: added {symbol} to DB (from Alpaca)")
@@ -451,9 +528,5 @@ class AlpacaStateManager:
         elif issue_type == "QTY_MISMATCH":
             # 数量をAlpaca側に合わせる
             qty = alpaca_positions.get(symbol, 0)
-            self._conn.execute(
-                """UPDATE positions SET qty = ?, updated_at = datetime('now')
-                   WHERE symbol = ? AND status = 'open'""",
-                (qty, symbol),
-            )
+            self._conn.execute(_SQL_FIX_QTY_MISMATCH, (qty, symbol))
             logger.info(f"Auto-fixed: updated {symbol} qty to {qty}")
@@ -5,9 +5,13 @@
 回路ブレーカー発動を記録する。
 """
 
+import functools
 import logging
 from dataclasses import dataclass, field
 
+import numpy as np
+import numpy.typing as npt
+
 logger = logging.getLogger("trading_agent")
 
 
@@ -28,6 +32,11 @@ class Scenario:
     description: str
     days: list[ScenarioDay]
 
+    @functools.cached_property
+    def returns_pct(self) -> npt.NDArray[np.float64]:
+        """日次リターン(%)の配列。シナリオごとに1回だけ構築する。"""
+        return np.array([d.spy_return_pct for d in self.days], dtype=np.float64)
+
 
 @dataclass
 class ScenarioResult:
@@ -175,6 +184,22 @@ def _simulate_cb_levels(drawdown_pct: float, thresholds: dict[int, float]) -> in
     return 0
 
 
+def _simulate_segment(
+    equity0: float, hwm0: float, returns_pct: npt.NDArray[np.float64], exposure: float
+) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """エクスポージャー一定の区間の資産推移・HWM・ドローダウン(%)を一括計算する。
+
+    先頭に equity0 を置いて累積積を取るため、日ごとに掛け合わせるループと
+    同じ順序で乗算され、結果はビット単位で一致する。
+    """
+    factors = 1.0 + (returns_pct / 100.0) * exposure
+    equity = np.multiply.accumulate(np.concatenate(([equity0], factors)))[1:]
+    hwm = np.maximum.accumulate(np.concatenate(([hwm0], equity)))[1:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdown_pct = np.where(hwm > 0, (hwm - equity) / hwm * 100, 0.0)
+    return equity, hwm, drawdown_pct
+
+
 def run_scenario(
     scenario: Scenario,
     initial_equity: float = 100_000.0,
@@ -186,6 +211,9 @@ def run_scenario(
     ポートフォリオがposition_exposure_pctの市場エクスポージャーを持つと仮定し、
     日次リターンを適用。CBがトリガーされたらエクスポージャーを削減する。
 
+    CBは最初の発動以降エクスポージャーを固定するだけなので、シミュレーションは
+    「発動まで」と「発動翌日以降」の2区間に分かれ、各区間を NumPy で一括計算する。
+
     Args:
         scenario: シナリオ定義
         initial_equity: 初期資金
@@ -199,51 +227,47 @@ def run_scenario(
         scenario_name=scenario.name,
         initial_equity=initial_equity,
     )
+    if not scenario.days:
+        result.final_equity = initial_equity
+        return result
 
-    equity = initial_equity
-    hwm = initial_equity
+    returns_pct = scenario.returns_pct
     exposure = position_exposure_pct / 100.0
-    cb_active = False
-
-    for day in scenario.days:
-        # CB発動中はエクスポージャーを段階的に削減
-        if cb_active:
-            exposure = min(exposure, 0.3)  # 最大30%に制限
-
-        # 日次リターン適用
-        market_return = day.spy_return_pct / 100.0
-        portfolio_return = market_return * exposure
-        equity *= 1 + portfolio_return
-
-        result.daily_equity.append(equity)
-
-        # HWM更新 + ドローダウン計算
-        hwm = max(hwm, equity)
-        drawdown_pct = (hwm - equity) / hwm * 100 if hwm > 0 else 0.0
-        result.max_drawdown_pct = max(result.max_drawdown_pct, drawdown_pct)
-
-        # CBレベル判定
-        cb_level = _simulate_cb_levels(drawdown_pct, cb_thresholds)
-        if cb_level > 0 and not cb_active:
-            cb_active = True
-            result.circuit_breaker_triggers.append(
-                {
-                    "day": day.day,
-                    "level": cb_level,
-                    "drawdown_pct": round(drawdown_pct, 2),
-                    "vix": day.vix,
-                }
-            )
-            logger.info(
-                f"[{scenario.name}] Day {day.day}: CB L{cb_level} triggered "
-                f"(DD={drawdown_pct:.1f}%, VIX={day.vix})"
-            )
-
-            # L3以上: 全ポジションクローズ
-            if cb_level >= 3:
-                exposure = 0.0
-
-    result.final_equity = equity
+    equity, hwm, drawdown_pct = _simulate_segment(
+        initial_equity, initial_equity, returns_pct, exposure
+    )
+
+    # いずれかのレベルの閾値に最初に達した日にCB発動
+    hits = np.flatnonzero(drawdown_pct >= min(cb_thresholds.values()))
+    if hits.size:
+        t = int(hits[0])
+        day = scenario.days[t]
+        dd = float(drawdown_pct[t])
+        cb_level = _simulate_cb_levels(dd, cb_thresholds)
+        result.circuit_breaker_triggers.append(
+            {
+                "day": day.day,
+                "level": cb_level,
+                "drawdown_pct": round(dd, 2),
+                "vix": day.vix,
+            }
+        )
+        logger.info(
+            f"[{scenario.name}] Day {day.day}: CB L{cb_level} triggered "
+            f"(DD={dd:.1f}%, VIX={day.vix})"
+        )
+
+        # 発動翌日から: L3以上は全ポジションクローズ、それ以外は最大30%に制限
+        exposure = 0.0 if cb_level >= 3 else min(exposure, 0.3)
+        rest_equity, _, rest_dd = _simulate_segment(
+            float(equity[t]), float(hwm[t]), returns_pct[t + 1 :], exposure
+        )
+        equity = np.concatenate((equity[: t + 1], rest_equity))
+        drawdown_pct = np.concatenate((drawdown_pct[: t + 1], rest_dd))
+
+    result.daily_equity = equity.tolist()
+    result.max_drawdown_pct = float(drawdown_pct.max())
+    result.final_equity = float(equity[-1])
     return result
 
 
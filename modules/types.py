@@ -4,6 +4,8 @@ frozen=True により不変オブジェクトを保証。
 モジュール間の暗黙的なdict受け渡しを排除する。
 """
 
+import functools
+from collections import Counter
 from dataclasses import dataclass
 from datetime import date, datetime
 from enum import Enum
@@ -73,10 +75,21 @@ class PortfolioState:
     drawdown_pct: float
     high_water_mark: float = 0.0
 
+    @functools.cached_property
+    def sector_counts(self) -> Counter[str]:
+        """セクター別の保有ポジション数（読み取り専用）。
 
-@dataclass(frozen=True)
+        positions から初回参照時に1回だけ集計するため、常に positions と一致する。
+        """
+        return Counter(pos.sector for pos in self.positions.values())
+
+
+@dataclass(frozen=True, slots=True)
 class TradingDecision:
-    """LLM分析による売買判断。"""
+    """LLM分析による売買判断。
+
+    LLM出力の件数分だけ生成されるため、__slots__ でインスタンスの生成・属性参照を軽くする。
+    """
 
     symbol: str
     action: Action
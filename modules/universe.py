@@ -76,6 +76,12 @@ def get_sectors_map() -> dict[str, str]:
     return {s["symbol"]: s["sector"] for s in DEFAULT_UNIVERSE}
 
 
+def get_sectors(symbols: list[str]) -> dict[str, str]:
+    """複数シンボルのセクターを一括で返す。不明な場合は'Unknown'。"""
+    sectors = get_sectors_map()
+    return {symbol: sectors.get(symbol, "Unknown") for symbol in symbols}
+
+
 def get_symbols_by_sector(sector: str) -> list[str]:
     """指定セクターのシンボル一覧を返す。"""
     return [s["symbol"] for s in DEFAULT_UNIVERSE if s["sector"] == sector]
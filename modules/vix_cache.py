@@ -0,0 +1,89 @@
+"""VIX指数取得のファイルキャッシュ。
+
+cron で1日に複数回起動されるため、yfinance への同一リクエストを
+`<cache_dir>/vix_YYYYMMDD.json` に TTL 付きで保存して使い回す。
+"""
+
+import json
+import logging
+import time
+from datetime import date
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger("trading_agent")
+
+
+def _cache_path(cache_dir: str, today: date) -> Path:
+    return Path(cache_dir) / f"vix_{today.strftime('%Y%m%d')}.json"
+
+
+def _read_cache(path: Path, ttl_seconds: int) -> float | None:
+    """TTL内のキャッシュ値を返す。欠損・破損・期限切れは None。"""
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+        if time.time() - float(payload["ts"]) < ttl_seconds:
+            return float(payload["value"])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def _write_cache(path: Path, value: float) -> None:
+    """キャッシュを書き込み、前日以前のファイルを削除する。"""
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"ts": time.time(), "value": value}), encoding="utf-8")
+        tmp_path.replace(path)
+        for old in path.parent.glob("vix_*.json"):
+            if old != path:
+                old.unlink(missing_ok=True)
+    except OSError as e:
+        logger.warning(f"VIX cache write failed: {e}")
+
+
+# yf.Ticker はセッション/クッキー初期化を伴うため、プロセス内で使い回す（デーモン実行向け）
+_ticker_cache: dict[str, Any] = {}
+
+
+def _yf_ticker(symbol: str) -> Any:
+    """シンボルごとに yf.Ticker を1つだけ生成して返す。"""
+    ticker = _ticker_cache.get(symbol)
+    if ticker is None:
+        import yfinance as yf
+
+        ticker = _ticker_cache[symbol] = yf.Ticker(symbol)
+    return ticker
+
+
+def _download_vix() -> float | None:
+    """yfinanceからVIX指数の直近終値を取得する。"""
+    vix_data = _yf_ticker("^VIX").history(period="1d")
+    if vix_data.empty:
+        return None
+    return float(vix_data["Close"].iloc[-1])
+
+
+def get_vix(cache_dir: str, ttl_seconds: int, today: date | None = None) -> float | None:
+    """VIX指数を取得する。TTL内のキャッシュがあればネットワークに出ない。
+
+    Args:
+        cache_dir: キャッシュディレクトリ
+        ttl_seconds: キャッシュ有効期間（秒）。0 以下でキャッシュを使わない
+        today: キャッシュキーの日付（テスト用、省略時は今日）
+
+    Returns:
+        VIX値。取得できなかった場合は None（失敗はキャッシュしない）
+    """
+    path = _cache_path(cache_dir, today or date.today())
+    if ttl_seconds > 0:
+        cached = _read_cache(path, ttl_seconds)
+        if cached is not None:
+            logger.debug(f"VIX cache hit: {cached:.2f}")
+            return cached
+
+    value = _download_vix()
+    if value is not None and ttl_seconds > 0:
+        _write_cache(path, value)
+    return value
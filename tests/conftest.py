@@ -9,6 +9,16 @@ from modules.config import AppConfig
 from modules.db import init_db
 
 
+@pytest.fixture(autouse=True)
+def _no_real_claude_cli(monkeypatch: pytest.MonkeyPatch) -> None:
+    """テストでは実際の Claude CLI を起動しない（事前起動を含む）。"""
+    import modules.llm_analyzer as llm
+
+    monkeypatch.setattr(llm, "_CLAUDE_CMD", ("true",))
+    yield
+    llm._discard_warm_processes()
+
+
 @pytest.fixture
 def in_memory_db() -> sqlite3.Connection:
     """テスト用のin-memory SQLiteデータベース。"""
@@ -22,7 +32,7 @@ def sample_config(tmp_path: Path) -> AppConfig:
     """テスト用のconfig.toml付き設定。"""
     config_file = tmp_path / "config.toml"
     config_file.write_text(
-        """
+        f"""
 [strategy]
 sentiment_confidence_threshold = 70
 ma_period = 50
@@ -57,6 +67,7 @@ db_path = ":memory:"
 log_dir = "logs"
 claude_timeout_seconds = 120
 lock_file_path = "data/state/agent.lock"
+cache_dir = "{tmp_path / "cache"}"
 
 [alpaca]
 paper = true
@@ -8,6 +8,7 @@ from modules.backtest import (
     FoldResult,
     PerformanceMetrics,
     TimeSeriesFold,
+    _as_array,
     bootstrap_sharpe_ci,
     calculate_max_drawdown,
     calculate_profit_factor,
@@ -15,10 +16,40 @@ from modules.backtest import (
     calculate_sortino_ratio,
     evaluate_returns,
     format_backtest_report,
+    iter_purged_time_series_split,
     purged_time_series_split,
 )
 
 
+class TestIterPurgedTimeSeriesSplit:
+    def test_matches_list_version(self):
+        folds = iter_purged_time_series_split(n_samples=600, n_splits=3)
+        assert not isinstance(folds, list)
+        assert list(folds) == purged_time_series_split(n_samples=600, n_splits=3)
+
+    def test_skips_invalid_folds(self):
+        # fold 1-2 は test_start < 0、fold 3 は purge 後に train 期間が残らない
+        folds = list(iter_purged_time_series_split(n_samples=200, n_splits=5, test_size=63))
+        assert [f.fold_number for f in folds] == [4, 5]
+
+
+class TestAsArray:
+    def test_float64_array_not_copied(self):
+        arr = np.array([0.01, 0.02])
+        assert _as_array(arr) is arr
+
+    def test_list_converted(self):
+        arr = _as_array([1, 2])
+        assert arr.dtype == np.float64
+        assert arr.tolist() == [1.0, 2.0]
+
+    def test_non_contiguous_copied(self):
+        base = np.arange(6, dtype=np.float64)
+        arr = _as_array(base[::2])
+        assert arr.flags.c_contiguous
+        assert arr.tolist() == [0.0, 2.0, 4.0]
+
+
 class TestPurgedTimeSeriesSplit:
     def test_basic_split(self):
         """基本的な分割。"""
@@ -122,6 +153,15 @@ class TestMaxDrawdown:
         dd = calculate_max_drawdown([100])
         assert dd == 0.0
 
+    def test_multiple_peaks(self):
+        # 1回目: 100→80 (20%)、2回目: 150→105 (30%)
+        dd = calculate_max_drawdown([100, 80, 120, 150, 105, 140])
+        assert abs(dd - 30.0) < 1e-9
+
+    def test_non_positive_equity_ignored(self):
+        dd = calculate_max_drawdown([0, -10, 0])
+        assert dd == 0.0
+
 
 class TestProfitFactor:
     def test_all_profits(self):
@@ -153,6 +193,15 @@ class TestBootstrapSharpeCi:
         point, lower, upper = bootstrap_sharpe_ci([0.01, 0.02])
         assert point == lower == upper
 
+    def test_deterministic_with_seed(self):
+        returns = list(np.random.default_rng(0).normal(0.001, 0.01, 100))
+        assert bootstrap_sharpe_ci(returns, seed=7) == bootstrap_sharpe_ci(returns, seed=7)
+
+    def test_constant_returns(self):
+        """全サンプルが定数（std=0）でもゼロ除算せず 0.0 を返す。"""
+        point, lower, upper = bootstrap_sharpe_ci([0.0] * 20)
+        assert point == lower == upper == 0.0
+
 
 class TestEvaluateReturns:
     def test_basic_evaluation(self):
@@ -166,6 +215,11 @@ class TestEvaluateReturns:
         assert metrics.total_trades == 5
         assert metrics.win_rate_pct == 60.0
 
+    def test_total_return_compounding(self):
+        metrics = evaluate_returns([0.1, -0.1, 0.05, -0.05], [], [], 4)
+        # 1.1 * 0.9 * 1.05 * 0.95 = 0.987525
+        assert abs(metrics.total_return_pct - (-1.2475)) < 1e-9
+
     def test_empty_returns(self):
         metrics = evaluate_returns([], [], [], 0)
         assert metrics.total_return_pct == 0.0
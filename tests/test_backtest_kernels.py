@@ -0,0 +1,56 @@
+"""modules/backtest_kernels.py のテスト。
+
+numba の有無に関わらず、ループ実装（JIT対象）と NumPy 実装が同じ結果を返すことを検証する。
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from modules.backtest_kernels import (
+    _loop_downside_std,
+    _loop_excess_mean_std,
+    _loop_max_drawdown_pct,
+    _loop_pnl_sums,
+    _np_downside_std,
+    _np_excess_mean_std,
+    _np_max_drawdown_pct,
+    _np_pnl_sums,
+)
+
+
+@pytest.fixture
+def returns() -> np.ndarray:
+    return np.random.default_rng(42).normal(0.0005, 0.01, 63)
+
+
+class TestKernelParity:
+    def test_excess_mean_std(self, returns: np.ndarray) -> None:
+        loop = _loop_excess_mean_std(returns, 0.0001)
+        ref = _np_excess_mean_std(returns, 0.0001)
+        assert loop == pytest.approx(ref, rel=1e-12)
+
+    def test_downside_std(self, returns: np.ndarray) -> None:
+        loop_count, loop_std = _loop_downside_std(returns)
+        np_count, np_std = _np_downside_std(returns)
+        assert loop_count == np_count
+        assert loop_std == pytest.approx(np_std, rel=1e-12)
+
+    def test_downside_std_single_loss_is_nan(self) -> None:
+        arr = np.array([0.01, -0.02, 0.03])
+        for count, std in (_loop_downside_std(arr), _np_downside_std(arr)):
+            assert count == 1
+            assert math.isnan(std)
+
+    def test_max_drawdown(self) -> None:
+        eq = np.cumprod(1 + np.random.default_rng(1).normal(0, 0.02, 252)) * 100_000
+        assert _loop_max_drawdown_pct(eq) == pytest.approx(_np_max_drawdown_pct(eq), rel=1e-12)
+
+    def test_max_drawdown_non_positive_hwm(self) -> None:
+        eq = np.array([0.0, -10.0, 0.0])
+        assert _loop_max_drawdown_pct(eq) == _np_max_drawdown_pct(eq) == 0.0
+
+    def test_pnl_sums(self) -> None:
+        pnls = np.array([100.0, -50.0, 0.0, 200.0, -30.0])
+        assert _loop_pnl_sums(pnls) == _np_pnl_sums(pnls) == (300.0, 80.0, 2)
@@ -13,6 +13,7 @@ from modules.config import (
     RiskConfig,
     StrategyConfig,
     SystemConfig,
+    get_config,
     load_config,
 )
 
@@ -92,6 +93,15 @@ class TestRiskConfig:
                 circuit_breaker_level4_pct=15.0,
             )
 
+    def test_non_increasing_last_level_raises(self) -> None:
+        with pytest.raises(ValidationError, match="strictly increasing"):
+            RiskConfig(
+                circuit_breaker_level1_pct=4.0,
+                circuit_breaker_level2_pct=7.0,
+                circuit_breaker_level3_pct=15.0,
+                circuit_breaker_level4_pct=15.0,
+            )
+
     def test_decreasing_circuit_breaker_raises(self) -> None:
         with pytest.raises(ValidationError, match="strictly increasing"):
             RiskConfig(
@@ -188,3 +198,29 @@ slack_enabled = false
     def test_load_default(self) -> None:
         config = load_config()
         assert isinstance(config, AppConfig)
+
+
+class TestGetConfig:
+    def test_cached_per_path(self, tmp_path: Path) -> None:
+        config_file = tmp_path / "config.toml"
+        config_file.write_text("[strategy]\nma_period = 100\n")
+        get_config.cache_clear()
+        try:
+            first = get_config(str(config_file))
+            # ファイルを書き換えてもキャッシュが返る
+            config_file.write_text("[strategy]\nma_period = 60\n")
+            assert get_config(str(config_file)) is first
+            assert first.strategy.ma_period == 100
+            # load_config は常に再読込する
+            assert load_config(config_file).strategy.ma_period == 60
+        finally:
+            get_config.cache_clear()
+
+    def test_cache_clear_reloads(self, tmp_path: Path) -> None:
+        config_file = tmp_path / "config.toml"
+        config_file.write_text("[strategy]\nma_period = 100\n")
+        get_config.cache_clear()
+        first = get_config(str(config_file))
+        get_config.cache_clear()
+        assert get_config(str(config_file)) is not first
+        get_config.cache_clear()
@@ -3,14 +3,18 @@
 Alpaca APIはモックし、データ変換ロジックをテストする。
 """
 
-from datetime import datetime
+import subprocess
+import sys
+from datetime import UTC, datetime
 from types import SimpleNamespace
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 import pandas as pd
 import pytest
 
 from modules.data_collector import (
+    _cached_data_client,
+    _get_data_client,
     collect_market_data,
     fetch_bars_alpaca,
     fetch_latest_price,
@@ -44,6 +48,75 @@ class TestFetchBarsAlpaca:
         assert len(df) == 5
         assert list(df.columns) == ["open", "high", "low", "close", "volume"]
 
+    def test_columns_typed_and_unsorted_input_sorted(self) -> None:
+        ts = [datetime(2026, 1, 3, tzinfo=UTC), datetime(2026, 1, 1, tzinfo=UTC)]
+        bars_list = [
+            _make_bar(ts[0], 101, 106, 96, 103, 2000),
+            _make_bar(ts[1], 100, 105, 95, 102, 1000),
+        ]
+        mock_client = MagicMock()
+        mock_client.get_stock_bars.return_value = _make_bars_response({"AAPL": bars_list})
+
+        df = fetch_bars_alpaca(["AAPL"], days=10, client=mock_client)["AAPL"]
+        assert df.index.name == "timestamp"
+        assert str(df.index.tz) == "UTC"
+        assert df.index.is_monotonic_increasing
+        assert df["close"].tolist() == [102.0, 103.0]
+        assert df["close"].dtype == "float64"
+        assert df["volume"].dtype == "int64"
+
+    def test_large_universe_fetched_in_chunks(self) -> None:
+        """50銘柄ごとにリクエストを分割し、結果をまとめて返す。"""
+        symbols = [f"S{i:03d}" for i in range(120)]
+        ts = datetime(2026, 1, 1)
+
+        def get_stock_bars(request):
+            return _make_bars_response(
+                {s: [_make_bar(ts, 100, 105, 95, 102, 1000)] for s in request.symbol_or_symbols}
+            )
+
+        mock_client = MagicMock()
+        mock_client.get_stock_bars.side_effect = get_stock_bars
+
+        result = fetch_bars_alpaca(symbols, days=10, client=mock_client)
+        assert mock_client.get_stock_bars.call_count == 3
+        sizes = sorted(
+            len(c.args[0].symbol_or_symbols) for c in mock_client.get_stock_bars.call_args_list
+        )
+        assert sizes == [20, 50, 50]
+        assert set(result) == set(symbols)
+
+    def test_raw_response_matches_model_response(self) -> None:
+        """raw_data の dict と Bar モデルで同じ DataFrame になる。"""
+        from alpaca.data.models import BarSet
+
+        raw = {
+            "AAPL": [
+                {
+                    "t": f"2026-01-0{d}T05:00:00Z",
+                    "o": 100.0 + d,
+                    "h": 106.0,
+                    "l": 95.0,
+                    "c": 102.5,
+                    "v": 1000 * d,
+                    "n": 10,
+                    "vw": 101.0,
+                }
+                for d in (2, 3, 5)
+            ]
+        }
+        raw_client = MagicMock()
+        raw_client.get_stock_bars.return_value = raw
+        model_client = MagicMock()
+        model_client.get_stock_bars.return_value = BarSet(raw)
+
+        from_raw = fetch_bars_alpaca(["AAPL"], days=10, client=raw_client)["AAPL"]
+        from_model = fetch_bars_alpaca(["AAPL"], days=10, client=model_client)["AAPL"]
+        # tz オブジェクトの実装（pydantic の TzInfo / UTC）だけが異なる
+        pd.testing.assert_frame_equal(from_raw, from_model, check_index_type=False)
+        assert str(from_raw.index.tz) == "UTC"
+        assert from_raw["volume"].tolist() == [2000, 3000, 5000]
+
     def test_missing_symbol_skipped(self) -> None:
         mock_client = MagicMock()
         mock_client.get_stock_bars.return_value = _make_bars_response({"AAPL": []})
@@ -126,6 +199,12 @@ class TestFetchLatestPrice:
         price = fetch_latest_price("AAPL", client=mock_client)
         assert price == pytest.approx(185.50)
 
+    def test_raw_response(self) -> None:
+        mock_client = MagicMock()
+        mock_client.get_stock_latest_bar.return_value = {"AAPL": {"t": "x", "c": 185.5}}
+
+        assert fetch_latest_price("AAPL", client=mock_client) == pytest.approx(185.50)
+
     def test_no_data_returns_none(self) -> None:
         mock_client = MagicMock()
         mock_client.get_stock_latest_bar.return_value = {}
@@ -139,3 +218,40 @@ class TestFetchLatestPrice:
 
         price = fetch_latest_price("AAPL", client=mock_client)
         assert price is None
+
+
+class TestGetDataClient:
+    @pytest.fixture(autouse=True)
+    def _clear_cache(self):
+        _cached_data_client.cache_clear()
+        yield
+        _cached_data_client.cache_clear()
+
+    def test_client_reused(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setenv("ALPACA_API_KEY", "key")
+        monkeypatch.setenv("ALPACA_SECRET_KEY", "secret")
+        with patch("alpaca.data.historical.StockHistoricalDataClient") as mock_cls:
+            assert _get_data_client() is _get_data_client()
+        mock_cls.assert_called_once_with(api_key="key", secret_key="secret", raw_data=True)
+
+    def test_new_client_when_credentials_change(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setenv("ALPACA_SECRET_KEY", "secret")
+        with patch("alpaca.data.historical.StockHistoricalDataClient") as mock_cls:
+            monkeypatch.setenv("ALPACA_API_KEY", "key1")
+            _get_data_client()
+            monkeypatch.setenv("ALPACA_API_KEY", "key2")
+            _get_data_client()
+        assert mock_cls.call_count == 2
+
+
+class TestLazyImports:
+    def test_import_does_not_load_pandas_or_alpaca_data(self) -> None:
+        """モジュール import だけでは pandas / alpaca.data を読み込まない。"""
+        code = (
+            "import sys, modules.data_collector; "
+            "print('pandas' in sys.modules, 'alpaca.data' in sys.modules)"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        ).stdout
+        assert out.strip() == "False False"
@@ -1,20 +1,26 @@
 """modules/db.py のテスト。"""
 
 import sqlite3
+import threading
+from datetime import date
 from pathlib import Path
+from unittest.mock import patch
 
 import pytest
 
 from modules.db import (
     MIGRATIONS,
     _get_current_version,
+    archive_execution_logs,
     backup_db,
+    close_all,
     get_connection,
     init_db,
     migrate,
+    open_reader,
 )
 
-# 期待する9テーブル
+# 期待する11テーブル
 EXPECTED_TABLES = [
     "positions",
     "trades",
@@ -25,6 +31,8 @@ EXPECTED_TABLES = [
     "reconciliation_logs",
     "metrics",
     "schema_version",
+    "decisions",
+    "trading_days",
 ]
 
 
@@ -43,10 +51,29 @@ class TestInitDb:
         # in-memory DBではWALが適用されない場合がある（memory）
         assert mode in ("wal", "memory")
 
+    def test_wal_and_synchronous_on_file_db(self, tmp_path: Path) -> None:
+        conn = init_db(str(tmp_path / "test.db"))
+        try:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            # 1 = NORMAL
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+        finally:
+            conn.close()
+
     def test_foreign_keys_enabled(self, in_memory_db: sqlite3.Connection) -> None:
         cursor = in_memory_db.execute("PRAGMA foreign_keys")
         assert cursor.fetchone()[0] == 1
 
+    def test_cache_pragmas(self, tmp_path: Path) -> None:
+        """mmap / ページキャッシュ / 一時領域の設定が適用される。"""
+        conn = init_db(str(tmp_path / "test.db"))
+        try:
+            assert conn.execute("PRAGMA mmap_size").fetchone()[0] == 268435456
+            assert conn.execute("PRAGMA cache_size").fetchone()[0] == -65536
+            assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2  # MEMORY
+        finally:
+            conn.close()
+
     def test_creates_file_db(self, tmp_path: Path) -> None:
         db_path = str(tmp_path / "test.db")
         conn = init_db(db_path)
@@ -70,6 +97,12 @@ class TestInitDb:
     def test_row_factory(self, in_memory_db: sqlite3.Connection) -> None:
         assert in_memory_db.row_factory == sqlite3.Row
 
+    def test_rejects_old_sqlite(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """RETURNING 非対応の古いSQLiteでは明示的にエラー。"""
+        monkeypatch.setattr(sqlite3, "sqlite_version_info", (3, 31, 1))
+        with pytest.raises(RuntimeError, match="3.35.0"):
+            init_db(":memory:")
+
 
 class TestMigrate:
     def test_schema_version_recorded(self, in_memory_db: sqlite3.Connection) -> None:
@@ -80,7 +113,7 @@ class TestMigrate:
 
     def test_get_current_version(self, in_memory_db: sqlite3.Connection) -> None:
         version = _get_current_version(in_memory_db)
-        assert version == 1
+        assert version == max(MIGRATIONS)
 
     def test_get_current_version_no_table(self) -> None:
         conn = sqlite3.connect(":memory:")
@@ -90,11 +123,45 @@ class TestMigrate:
         finally:
             conn.close()
 
+    def test_user_version_recorded(self, in_memory_db: sqlite3.Connection) -> None:
+        """適用後は user_version に最新バージョンが入る。"""
+        assert in_memory_db.execute("PRAGMA user_version").fetchone()[0] == max(MIGRATIONS)
+
+    def test_warm_db_skips_version_lookup(
+        self, in_memory_db: sqlite3.Connection, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """user_version が最新なら schema_version を参照しない。"""
+        import modules.db as db_module
+
+        def _fail(_conn: sqlite3.Connection) -> int:
+            raise AssertionError("schema_version should not be queried")
+
+        monkeypatch.setattr(db_module, "_get_current_version", _fail)
+        migrate(in_memory_db)
+
     def test_idempotent(self, in_memory_db: sqlite3.Connection) -> None:
         """2回migrateしてもエラーにならない。"""
         migrate(in_memory_db)
         version = _get_current_version(in_memory_db)
-        assert version == 1
+        assert version == max(MIGRATIONS)
+
+    def test_failed_migration_rolls_back_all(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """途中のマイグレーションが失敗したら、それ以前の分も含めて適用しない。"""
+        import modules.db as db_module
+
+        broken = dict(db_module._MIGRATION_STATEMENTS)
+        broken[max(MIGRATIONS)] = ("CREATE TABLE broken (",)
+        monkeypatch.setattr(db_module, "_MIGRATION_STATEMENTS", broken)
+
+        conn = sqlite3.connect(":memory:")
+        try:
+            with pytest.raises(sqlite3.OperationalError):
+                migrate(conn)
+            assert not conn.in_transaction
+            assert _get_current_version(conn) == 0
+            assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+        finally:
+            conn.close()
 
 
 class TestTableConstraints:
@@ -228,6 +295,31 @@ class TestBackupDb:
         assert row["qty"] == 10.0
         backup_conn.close()
 
+    def test_backup_while_writer_holds_lock(self, tmp_path: Path) -> None:
+        """書き込みトランザクション中でも読み取り専用接続でバックアップできる。"""
+        db_path = str(tmp_path / "source.db")
+        conn = init_db(db_path)
+        conn.execute(
+            "INSERT INTO positions (symbol, side, qty, entry_price, entry_date) "
+            "VALUES ('AAPL', 'long', 10, 150, '2026-01-15')"
+        )
+        conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "INSERT INTO positions (symbol, side, qty, entry_price, entry_date) "
+            "VALUES ('MSFT', 'long', 5, 400, '2026-01-15')"
+        )
+        try:
+            result = backup_db(db_path, str(tmp_path / "backups"))
+        finally:
+            conn.rollback()
+            conn.close()
+
+        backup_conn = sqlite3.connect(result)
+        symbols = [r[0] for r in backup_conn.execute("SELECT symbol FROM positions")]
+        backup_conn.close()
+        assert symbols == ["AAPL"]
+
     def test_backup_rotation(self, tmp_path: Path) -> None:
         db_path = str(tmp_path / "source.db")
         backup_dir = str(tmp_path / "backups")
@@ -242,6 +334,107 @@ class TestBackupDb:
         backups = list(Path(backup_dir).glob("trading_backup_*.db"))
         assert len(backups) <= 7
 
+    def test_backup_rotation_removes_oldest(self, tmp_path: Path) -> None:
+        db_path = str(tmp_path / "source.db")
+        backup_dir = tmp_path / "backups"
+        init_db(db_path).close()
+        backup_dir.mkdir()
+        old_names = [f"trading_backup_2020010{i}_000000.db" for i in range(1, 10)]
+        for name in old_names:
+            (backup_dir / name).touch()
+
+        result = backup_db(db_path, str(backup_dir))
+
+        remaining = sorted(p.name for p in backup_dir.glob("trading_backup_*.db"))
+        assert remaining == [*old_names[-6:], Path(result).name]
+
+
+class TestArchiveExecutionLogs:
+    @staticmethod
+    def _insert_log(conn: sqlite3.Connection, execution_id: str, started_at: str) -> None:
+        conn.execute(
+            "INSERT INTO execution_logs (execution_id, mode, started_at, status) "
+            "VALUES (?, 'morning', ?, 'success')",
+            (execution_id, started_at),
+        )
+        conn.commit()
+
+    def test_moves_old_months(self, tmp_path: Path) -> None:
+        """当月・前月は残し、それより古い月を月別DBへ移す。"""
+        conn = init_db(str(tmp_path / "test.db"))
+        archive_dir = tmp_path / "archive"
+        try:
+            self._insert_log(conn, "a", "2024-01-15T09:30:00")
+            self._insert_log(conn, "b", "2024-02-15T09:30:00")
+            self._insert_log(conn, "c", "2024-03-01T09:30:00")
+            self._insert_log(conn, "d", "2024-04-02T09:30:00")
+
+            moved = archive_execution_logs(conn, str(archive_dir), today=date(2024, 4, 10))
+
+            assert moved == 2
+            remaining = [
+                r[0]
+                for r in conn.execute(
+                    "SELECT execution_id FROM execution_logs ORDER BY execution_id"
+                ).fetchall()
+            ]
+            assert remaining == ["c", "d"]
+
+            archived = sqlite3.connect(str(archive_dir / "execution_logs_2024_01.db"))
+            try:
+                rows = archived.execute("SELECT execution_id FROM execution_logs").fetchall()
+                assert rows == [("a",)]
+            finally:
+                archived.close()
+            assert (archive_dir / "execution_logs_2024_02.db").exists()
+        finally:
+            conn.close()
+
+    def test_archive_keeps_constraints(self, tmp_path: Path) -> None:
+        """アーカイブ表はメインと同じ NOT NULL / CHECK 制約を持つ。"""
+        conn = init_db(str(tmp_path / "test.db"))
+        archive_dir = tmp_path / "archive"
+        try:
+            self._insert_log(conn, "a", "2024-01-15T09:30:00")
+            archive_execution_logs(conn, str(archive_dir), today=date(2024, 4, 10))
+        finally:
+            conn.close()
+
+        archived = sqlite3.connect(str(archive_dir / "execution_logs_2024_01.db"))
+        try:
+            with pytest.raises(sqlite3.IntegrityError):
+                archived.execute(
+                    "INSERT INTO execution_logs (execution_id, mode, started_at, status) "
+                    "VALUES ('x', 'bogus', '2024-01-01', 'success')"
+                )
+            with pytest.raises(sqlite3.IntegrityError):
+                archived.execute(
+                    "INSERT INTO execution_logs (execution_id, mode, started_at, status) "
+                    "VALUES ('a', 'morning', '2024-01-01', 'success')"
+                )
+        finally:
+            archived.close()
+
+    def test_archive_tolerates_extra_main_columns(self, tmp_path: Path) -> None:
+        """メイン側に列が増えても明示列リストでアーカイブできる。"""
+        conn = init_db(str(tmp_path / "test.db"))
+        archive_dir = tmp_path / "archive"
+        try:
+            self._insert_log(conn, "a", "2024-01-15T09:30:00")
+            archive_execution_logs(conn, str(archive_dir), today=date(2024, 4, 10))
+            conn.execute("ALTER TABLE execution_logs ADD COLUMN extra TEXT")
+            self._insert_log(conn, "b", "2024-01-20T09:30:00")
+
+            assert archive_execution_logs(conn, str(archive_dir), today=date(2024, 4, 10)) == 1
+        finally:
+            conn.close()
+
+    def test_nothing_to_archive(self, in_memory_db: sqlite3.Connection, tmp_path: Path) -> None:
+        """対象がなければアーカイブDBを作らない。"""
+        archive_dir = tmp_path / "archive"
+        assert archive_execution_logs(in_memory_db, str(archive_dir)) == 0
+        assert not archive_dir.exists()
+
 
 class TestGetConnection:
     def test_returns_connection(self) -> None:
@@ -252,7 +445,83 @@ class TestGetConnection:
             )
             assert cursor.fetchone() is not None
         finally:
-            conn.close()
+            close_all()
+
+    def test_cached_per_path(self, tmp_path: Path) -> None:
+        db_path = str(tmp_path / "test.db")
+        try:
+            with patch("modules.db.init_db", wraps=init_db) as mock_init:
+                first = get_connection(db_path)
+                assert get_connection(db_path) is first
+            mock_init.assert_called_once()
+        finally:
+            close_all()
+
+    def test_reopens_closed_connection(self, tmp_path: Path) -> None:
+        db_path = str(tmp_path / "test.db")
+        try:
+            first = get_connection(db_path)
+            first.close()
+            second = get_connection(db_path)
+            assert second is not first
+            assert second.execute("SELECT 1").fetchone()[0] == 1
+        finally:
+            close_all()
+
+    def test_per_thread(self, tmp_path: Path) -> None:
+        db_path = str(tmp_path / "test.db")
+        other: list[sqlite3.Connection] = []
+        try:
+            main_conn = get_connection(db_path)
+            t = threading.Thread(target=lambda: other.append(get_connection(db_path)))
+            t.start()
+            t.join()
+            assert other[0] is not main_conn
+        finally:
+            close_all()
+
+    def test_close_all(self, tmp_path: Path) -> None:
+        conn = get_connection(str(tmp_path / "test.db"))
+        close_all()
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+
+
+class TestOpenReader:
+    def test_memory_returns_none(self) -> None:
+        """ ":memory:" は接続間で共有できないためNone。"""
+        assert open_reader(":memory:") is None
+
+    def test_reader_sees_committed_writes(self, tmp_path: Path) -> None:
+        """ライターのコミット済みデータを読み取れる。"""
+        db_path = str(tmp_path / "test.db")
+        writer = init_db(db_path)
+        reader = open_reader(db_path)
+        assert reader is not None
+        try:
+            writer.execute(
+                "INSERT INTO positions (symbol, qty, entry_price, entry_date) "
+                "VALUES ('AAPL', 10, 150.0, '2024-01-01')"
+            )
+            writer.commit()
+            row = reader.execute("SELECT symbol FROM positions").fetchone()
+            assert row["symbol"] == "AAPL"
+        finally:
+            reader.close()
+            writer.close()
+
+    def test_reader_rejects_writes(self, tmp_path: Path) -> None:
+        """読み取り専用接続への書き込みはエラー。"""
+        db_path = str(tmp_path / "test.db")
+        writer = init_db(db_path)
+        reader = open_reader(db_path)
+        assert reader is not None
+        try:
+            with pytest.raises(sqlite3.OperationalError):
+                reader.execute("DELETE FROM positions")
+        finally:
+            reader.close()
+            writer.close()
 
 
 class TestMigrationsDict:
@@ -262,3 +531,54 @@ class TestMigrationsDict:
         assert "positions" in sql
         assert "trades" in sql
         assert desc == "Initial schema: Phase 1 foundation"
+
+    def test_migration_v2_decisions(self) -> None:
+        sql, desc = MIGRATIONS[2]
+        assert "decisions" in sql
+        assert "WITHOUT ROWID" in sql
+
+    def test_migration_v4_hwm_index_used(self, in_memory_db: sqlite3.Connection) -> None:
+        """MAX(high_water_mark) は全件走査せず索引で解決される。"""
+        plan = in_memory_db.execute(
+            "EXPLAIN QUERY PLAN SELECT MAX(high_water_mark) FROM daily_snapshots"
+        ).fetchall()
+        details = " ".join(row["detail"] for row in plan)
+        assert "idx_daily_snapshots_hwm" in details
+
+    @pytest.mark.parametrize(
+        ("sql", "index"),
+        [
+            (
+                "SELECT id FROM positions WHERE symbol = 'AAPL' AND status = 'open'",
+                "idx_positions_symbol_status",
+            ),
+            (
+                "SELECT COUNT(*) FROM positions "
+                "WHERE entry_date = '2026-01-02' AND status IN ('open', 'closed')",
+                "idx_positions_status_entry",
+            ),
+            (
+                "SELECT id FROM circuit_breaker WHERE resolved_at IS NULL "
+                "ORDER BY triggered_at DESC LIMIT 1",
+                "idx_circuit_breaker_resolved",
+            ),
+            (
+                "SELECT 1 FROM execution_logs WHERE execution_id = 'x'",
+                "sqlite_autoindex_execution_logs",
+            ),
+        ],
+    )
+    def test_migration_v5_compound_indexes_used(
+        self, in_memory_db: sqlite3.Connection, sql: str, index: str
+    ) -> None:
+        plan = in_memory_db.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        assert index in " ".join(row["detail"] for row in plan)
+
+    def test_migration_v5_drops_redundant_indexes(self, in_memory_db: sqlite3.Connection) -> None:
+        names = {
+            row[0]
+            for row in in_memory_db.execute("SELECT name FROM sqlite_master WHERE type='index'")
+        }
+        assert names.isdisjoint(
+            {"idx_positions_symbol", "idx_positions_status", "idx_execution_logs_execution_id"}
+        )
@@ -2,11 +2,16 @@
 
 import os
 import sqlite3
+import threading
 from datetime import datetime, timedelta
-from unittest.mock import patch
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
 
 from modules.config import AppConfig
 from modules.health import (
+    CRITICAL_CHECKS,
     HealthReport,
     check_circuit_breaker_status,
     check_db_integrity,
@@ -40,7 +45,15 @@ class TestCheckDbIntegrity:
     def test_all_tables_present(self, in_memory_db: sqlite3.Connection):
         result = check_db_integrity(in_memory_db)
         assert result.ok is True
-        assert "9 tables" in result.message
+        assert "11 tables" in result.message
+
+    @pytest.mark.parametrize("table", ["decisions", "trading_days"])
+    def test_missing_migrated_table(self, in_memory_db: sqlite3.Connection, table: str):
+        """マイグレーションで追加されたテーブルの欠落も検出する。"""
+        in_memory_db.execute(f"DROP TABLE {table}")
+        result = check_db_integrity(in_memory_db)
+        assert result.ok is False
+        assert table in result.message
 
     def test_missing_table(self, in_memory_db: sqlite3.Connection):
         in_memory_db.execute("DROP TABLE IF EXISTS metrics")
@@ -48,6 +61,18 @@ class TestCheckDbIntegrity:
         assert result.ok is False
         assert "metrics" in result.message
 
+    def test_full_integrity_check(self, in_memory_db: sqlite3.Connection):
+        result = check_db_integrity(in_memory_db, full=True)
+        assert result.ok is True
+
+    def test_corruption_reported(self):
+        conn = MagicMock()
+        conn.execute.return_value.fetchone.return_value = ("*** in database main ***",)
+        result = check_db_integrity(conn)
+        assert result.ok is False
+        assert result.message.startswith("quick_check:")
+        conn.execute.assert_called_once_with("PRAGMA quick_check(1)")
+
 
 class TestCheckExecutionStaleness:
     def test_no_previous_executions(self, in_memory_db: sqlite3.Connection):
@@ -77,6 +102,18 @@ class TestCheckExecutionStaleness:
         result = check_execution_staleness(in_memory_db, max_staleness_hours=26)
         assert result.ok is False
 
+    def test_explicit_now(self, in_memory_db: sqlite3.Connection):
+        """now を渡すとその時刻を基準に経過時間を判定する。"""
+        in_memory_db.execute(
+            "INSERT INTO execution_logs (execution_id, mode, started_at, status) "
+            "VALUES ('test_fixed', 'morning', '2026-01-15T09:00:00', 'success')"
+        )
+        in_memory_db.commit()
+        now = datetime(2026, 1, 16, 12, 0)
+        result = check_execution_staleness(in_memory_db, now=now)
+        assert result.ok is False
+        assert "27.0h ago" in result.message
+
 
 class TestCheckCircuitBreakerStatus:
     def test_no_active_breaker(self, in_memory_db: sqlite3.Connection):
@@ -126,6 +163,18 @@ class TestCheckRecentErrors:
         assert result.ok is False
         assert "5 errors" in result.message
 
+    def test_explicit_now(self, in_memory_db: sqlite3.Connection):
+        """now 基準で集計し、それより前の24h外のエラーは数えない。"""
+        for i in range(3):
+            in_memory_db.execute(
+                "INSERT INTO execution_logs (execution_id, mode, started_at, status) "
+                "VALUES (?, 'morning', '2026-01-15T09:00:00', 'error')",
+                (f"err_{i}",),
+            )
+        in_memory_db.commit()
+        assert check_recent_errors(in_memory_db, now=datetime(2026, 1, 15, 12, 0)).ok is False
+        assert check_recent_errors(in_memory_db, now=datetime(2026, 1, 17, 12, 0)).ok is True
+
 
 class TestCheckDiskSpace:
     def test_enough_space(self, tmp_path):
@@ -137,6 +186,21 @@ class TestCheckDiskSpace:
         result = check_disk_space(str(tmp_path / "test.db"), min_mb=999_999_999)
         assert result.ok is False
 
+    def test_usage_cached_within_window(self, tmp_path):
+        from modules.health import _cached_disk_free
+
+        _cached_disk_free.cache_clear()
+        usage = SimpleNamespace(free=500 * 1024 * 1024)
+        with (
+            patch("modules.health.shutil.disk_usage", return_value=usage) as mock_usage,
+            patch("modules.health.time.monotonic", side_effect=[100.0, 105.0, 115.0]),
+        ):
+            for _ in range(3):
+                assert check_disk_space(str(tmp_path / "test.db")).message == "Free: 500MB"
+        # 100s と 105s は同じ10秒枠、115s で再取得
+        assert mock_usage.call_count == 2
+        _cached_disk_free.cache_clear()
+
 
 class TestHealthReport:
     def test_all_ok(self):
@@ -195,3 +259,98 @@ class TestRunFullHealthCheck:
         assert "paper_trading" in names
         assert "api_connectivity" in names
         assert "db_integrity" in names
+
+    def test_api_check_overlaps_local_checks(
+        self, sample_config: AppConfig, in_memory_db: sqlite3.Connection
+    ):
+        """API疎通確認は DB チェックと並行に走り、結果の並び順は変わらない。"""
+        from modules.health import HealthCheckResult
+
+        local_done = threading.Event()
+
+        def slow_api(_config):
+            # ローカルチェックの完了を待てる = 別スレッドで並行実行されている
+            overlapped = local_done.wait(timeout=5)
+            return HealthCheckResult("api_connectivity", overlapped, "Connected")
+
+        def disk(_path):
+            local_done.set()
+            return HealthCheckResult("disk_space", True, "Free")
+
+        with (
+            patch("modules.health.check_api_connectivity", side_effect=slow_api),
+            patch("modules.health.check_disk_space", side_effect=disk),
+        ):
+            report = run_full_health_check(sample_config, in_memory_db)
+
+        names = [c.name for c in report.checks]
+        assert names == [
+            "paper_trading",
+            "api_connectivity",
+            "db_integrity",
+            "execution_staleness",
+            "circuit_breaker",
+            "recent_errors",
+            "disk_space",
+        ]
+        assert report.checks[1].ok is True
+
+    def test_fail_fast_skips_remaining_checks(
+        self, sample_config: AppConfig, in_memory_db: sqlite3.Connection
+    ):
+        """paper_trading が失敗したら API 呼び出しを含む残りを実行しない。"""
+        with (
+            patch.dict(os.environ, {"ALPACA_PAPER": "false"}),
+            patch("modules.health.check_api_connectivity") as mock_api,
+            patch("modules.health.check_db_integrity") as mock_db,
+        ):
+            report = run_full_health_check(
+                sample_config, in_memory_db, fail_fast_on=CRITICAL_CHECKS
+            )
+
+        mock_api.assert_not_called()
+        mock_db.assert_not_called()
+        assert len(report.checks) == 7
+        assert report.checks[0].name == "paper_trading"
+        assert all(not c.ok and "skipped" in c.message for c in report.checks[1:])
+
+    def test_fail_fast_on_local_check(
+        self, sample_config: AppConfig, in_memory_db: sqlite3.Connection
+    ):
+        """ローカルチェックの失敗で以降のローカルチェックを打ち切る。API結果は残す。"""
+        from modules.health import HealthCheckResult
+
+        with (
+            patch.dict(os.environ, {"ALPACA_PAPER": "true"}),
+            patch(
+                "modules.health.check_api_connectivity",
+                return_value=HealthCheckResult("api_connectivity", True, "Connected"),
+            ),
+            patch(
+                "modules.health.check_db_integrity",
+                return_value=HealthCheckResult("db_integrity", False, "corrupt"),
+            ),
+            patch("modules.health.check_disk_space") as mock_disk,
+        ):
+            report = run_full_health_check(
+                sample_config, in_memory_db, fail_fast_on=frozenset({"db_integrity"})
+            )
+
+        mock_disk.assert_not_called()
+        by_name = {c.name: c for c in report.checks}
+        assert by_name["api_connectivity"].ok is True
+        assert by_name["db_integrity"].message == "corrupt"
+        assert "skipped" in by_name["disk_space"].message
+
+    def test_fail_fast_not_triggered_by_default(
+        self, sample_config: AppConfig, in_memory_db: sqlite3.Connection
+    ):
+        with (
+            patch.dict(os.environ, {"ALPACA_PAPER": "false"}),
+            patch("modules.health.check_api_connectivity") as mock_api,
+        ):
+            mock_api.return_value.name = "api_connectivity"
+            report = run_full_health_check(sample_config, in_memory_db)
+
+        mock_api.assert_called_once()
+        assert not any("skipped" in c.message for c in report.checks)
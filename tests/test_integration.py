@@ -37,7 +37,7 @@ class TestMarketClosedEdgeCases:
 
     @patch("main.is_market_open", return_value=False)
     @patch("main.init_db")
-    @patch("main.load_config")
+    @patch("main.get_config")
     @patch("main.setup_logger")
     def test_pipeline_skips_on_closed(
         self,
@@ -161,7 +161,7 @@ class TestFullMorningPipeline:
     @patch("main.get_trading_decisions")
     @patch("main.collect_market_data")
     @patch("main.init_db")
-    @patch("main.load_config")
+    @patch("main.get_config")
     @patch("main.setup_logger")
     @patch("main.is_market_open", return_value=True)
     def test_sell_then_buy_order(
@@ -250,7 +250,9 @@ class TestFullMorningPipeline:
                 mock_rm.check_circuit_breaker.return_value = CircuitBreakerState(
                     active=False, level=0, drawdown_pct=0
                 )
-                mock_rm.can_open_new_position.return_value = (True, "OK")
+                mock_rm.can_open_new_positions.side_effect = lambda _p, sectors, _v: dict.fromkeys(
+                    sectors, (True, "OK")
+                )
                 mock_rm_cls.return_value = mock_rm
 
                 with patch.dict(os.environ, {"ALPACA_PAPER": "true"}):
@@ -16,6 +16,20 @@ from modules.llm_analyzer import (
 from modules.types import Action, BarData, PortfolioState, PositionInfo
 
 
+@pytest.fixture(params=["jsonschema", "fastjsonschema"])
+def schema_backend(request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch) -> str:
+    """スキーマ検証を各バックエンドに差し替える（未インストールのものはスキップ）。"""
+    import modules.llm_analyzer as llm
+
+    fast = request.param == "fastjsonschema"
+    if fast and not llm.HAS_FASTJSONSCHEMA:
+        pytest.skip("fastjsonschema is not installed")
+    validate, errors = llm._build_decision_validator(fast)
+    monkeypatch.setattr(llm, "_validate_decisions", validate)
+    monkeypatch.setattr(llm, "_SCHEMA_ERRORS", errors)
+    return request.param
+
+
 def _sample_market_data() -> dict[str, BarData]:
     return {
         "AAPL": BarData(
@@ -63,6 +77,35 @@ class TestExtractJson:
         result = _extract_json(raw)
         assert result is None
 
+    def test_cli_wrapper(self) -> None:
+        raw = '{"type": "result", "result": "{\\"decisions\\": []}"}'
+        assert _extract_json(raw) == {"decisions": []}
+
+    def test_cli_wrapper_with_prose(self) -> None:
+        raw = '{"type": "result", "result": "結果です:\\n{\\"decisions\\": []}\\n以上"}'
+        assert _extract_json(raw) == {"decisions": []}
+
+    def test_clean_json_parsed_once(self) -> None:
+        """ラッパーでない JSON は1回の loads で返す。"""
+        from unittest.mock import patch
+
+        import orjson
+
+        with patch("modules.llm_analyzer.orjson.loads", wraps=orjson.loads) as mock_loads:
+            assert _extract_json('{"decisions": []}') == {"decisions": []}
+        assert mock_loads.call_count == 1
+
+    def test_fenced_cli_result_skips_full_parse(self) -> None:
+        """フェンス付きの result は全体パースを試さず部分抽出する（外側1回 + 抽出1回）。"""
+        from unittest.mock import patch
+
+        import orjson
+
+        raw = orjson.dumps({"type": "result", "result": '```json\n{"decisions": []}\n```'}).decode()
+        with patch("modules.llm_analyzer.orjson.loads", wraps=orjson.loads) as mock_loads:
+            assert _extract_json(raw) == {"decisions": []}
+        assert mock_loads.call_count == 2
+
 
 class TestSanitizePartial:
     def test_valid_decisions(self) -> None:
@@ -91,12 +134,31 @@ class TestSanitizePartial:
         assert len(result["decisions"]) == 1
         assert result["decisions"][0]["symbol"] == "AAPL"
 
+    def test_action_normalized(self) -> None:
+        """大文字・前後空白は正規化し、文字列以外は no_action に置き換える。"""
+        parsed = {
+            "decisions": [
+                {"symbol": "AAPL", "action": " SELL "},
+                {"symbol": "MSFT", "action": None},
+                {"symbol": "NVDA"},  # missing action
+            ]
+        }
+        result = _sanitize_partial(parsed)
+        assert [d["action"] for d in result["decisions"]] == ["sell", "no_action"]
+
 
 class TestBuildInputData:
     def test_structure(self) -> None:
         data = _build_input_data(_sample_market_data(), _sample_portfolio(), "morning")
         assert data["mode"] == "morning"
-        assert "AAPL" in data["market_data"]
+        assert data["market_data"]["AAPL"] == {
+            "close": 185.0,
+            "volume": 1000000,
+            "ma_50": 180.0,
+            "rsi_14": 55.0,
+            "atr_14": 3.2,
+            "volume_ratio_20d": 1.5,
+        }
         assert data["portfolio"]["equity"] == 100000.0
 
     def test_with_positions(self) -> None:
@@ -117,7 +179,13 @@ class TestBuildInputData:
             drawdown_pct=1.0,
         )
         data = _build_input_data(_sample_market_data(), portfolio, "eod")
-        assert "GOOGL" in data["portfolio"]["positions"]
+        assert data["portfolio"]["positions"]["GOOGL"] == {
+            "qty": 10,
+            "avg_entry_price": 140.0,
+            "current_price": 145.0,
+            "unrealized_pnl": 50.0,
+            "sector": "Technology",
+        }
 
 
 class TestParseDecisions:
@@ -179,6 +247,24 @@ class TestParseDecisions:
         decisions = _parse_decisions(raw, _sample_market_data())
         assert decisions[0].entry_price == 185.0  # falls back to bar.close
 
+    def test_missing_optional_sections(self) -> None:
+        """action や各セクションが欠けていても既定値で組み立てる。"""
+        decisions = _parse_decisions([{"symbol": "ZZZZ"}], _sample_market_data())
+        d = decisions[0]
+        assert d.action == Action.NO_ACTION
+        assert (d.confidence, d.entry_price, d.stop_loss, d.take_profit) == (0, 0, 0, 0)
+        assert (d.reasoning_bull, d.catalyst, d.expected_holding_days) == ("", "", 5)
+
+    @pytest.mark.parametrize(
+        ("raw_confidence", "expected"),
+        [(150, 100), (-5, 0), (72.9, 72), ("80", 80), ("high", 0), (None, 0), (float("nan"), 0)],
+    )
+    def test_confidence_clamped(self, raw_confidence, expected) -> None:
+        """confidence は 0〜100 の int に正規化され、不正値は 0 になる。"""
+        raw = [{"symbol": "AAPL", "sentiment_analysis": {"confidence": raw_confidence}}]
+        decisions = _parse_decisions(raw, _sample_market_data())
+        assert decisions[0].confidence == expected
+
 
 class TestDecisionSchema:
     def test_schema_structure(self) -> None:
@@ -227,3 +313,343 @@ class TestDecisionSchema:
         }
         with pytest.raises(ValidationError):
             validate(instance=payload, schema=DECISION_SCHEMA)
+
+    def test_precompiled_validator_matches_validate(self) -> None:
+        """事前構築したバリデータは validate() と同じ判定をする。"""
+        from jsonschema import ValidationError
+
+        from modules.llm_analyzer import _DECISION_VALIDATOR
+
+        assert _DECISION_VALIDATOR.is_valid({"decisions": []})
+        with pytest.raises(ValidationError):
+            _DECISION_VALIDATOR.validate({"decisions": [{"symbol": "AAPL"}]})
+
+    @pytest.mark.usefixtures("schema_backend")
+    def test_backend_rejects_invalid_payload(self) -> None:
+        """どのバックエンドでも同じ入力を受理・拒否する。"""
+        import modules.llm_analyzer as llm
+
+        llm._validate_decisions({"decisions": []})
+        with pytest.raises(llm._SCHEMA_ERRORS):
+            llm._validate_decisions({"decisions": [{"symbol": "AAPL"}]})
+
+
+class TestJsonObjectScanner:
+    @staticmethod
+    def _scan(*chunks: bytes) -> tuple[int, int | None]:
+        from modules.llm_analyzer import _JsonObjectScanner
+
+        scanner = _JsonObjectScanner()
+        for chunk in chunks:
+            end = scanner.feed(chunk)
+            if end is not None:
+                return scanner.start, end
+        return scanner.start, None
+
+    def test_object_after_prose(self) -> None:
+        data = b'Here you go:\n{"a": {"b": 1}} trailing'
+        start, end = self._scan(data)
+        assert data[start:end] == b'{"a": {"b": 1}}'
+
+    def test_braces_and_escaped_quotes_in_strings(self) -> None:
+        data = b'{"note": "a } b \\" { c \\\\", "x": 1}tail'
+        start, end = self._scan(data)
+        assert data[start:end] == data[: data.index(b"tail")]
+
+    def test_split_across_chunks(self) -> None:
+        data = b'xx{"s": "\\"}", "n": [1, {"m": 2}]}yy'
+        chunks = [data[i : i + 3] for i in range(0, len(data), 3)]
+        start, end = self._scan(*chunks)
+        assert data[start:end] == data[2:-2]
+
+    def test_unterminated(self) -> None:
+        assert self._scan(b'{"a": 1', b', "b": 2')[1] is None
+
+    def test_offset_is_absolute(self) -> None:
+        """offset 指定時は返す位置もストリーム先頭からの絶対位置になる。"""
+        from modules.llm_analyzer import _JsonObjectScanner
+
+        scanner = _JsonObjectScanner(10)
+        assert scanner.feed(b' {"a": 1}') == 19
+        assert scanner.start == 11
+
+
+class TestCallClaudeWithValidation:
+    """_CLAUDE_CMD を Python スクリプトに差し替え、実プロセスで入出力を検証する。"""
+
+    @staticmethod
+    def _use_script(monkeypatch: pytest.MonkeyPatch, code: str) -> None:
+        import sys
+
+        import modules.llm_analyzer as llm
+
+        monkeypatch.setattr(llm, "_CLAUDE_CMD", (sys.executable, "-c", code))
+
+    @pytest.mark.usefixtures("schema_backend")
+    def test_valid_output_returned(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        from modules.llm_analyzer import call_claude_with_validation
+
+        self._use_script(monkeypatch, "import sys; sys.stdin.read(); print('{\"decisions\": []}')")
+        assert call_claude_with_validation("prompt", "{}") == {"decisions": []}
+
+    def test_stops_reading_once_object_closes(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """JSON が閉じたら後続出力やプロセス終了を待たずに返す。"""
+        import time
+
+        from modules.llm_analyzer import call_claude_with_validation
+
+        self._use_script(
+            monkeypatch,
+            "import sys, time; print('Result: {\"decisions\": []}', flush=True); time.sleep(30)",
+        )
+        started = time.monotonic()
+        assert call_claude_with_validation("prompt", "{}", timeout=20) == {"decisions": []}
+        assert time.monotonic() - started < 10
+
+    def test_cli_wrapper_unwrapped(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        from modules.llm_analyzer import call_claude_with_validation
+
+        self._use_script(
+            monkeypatch,
+            "import json; print(json.dumps({'type': 'result', "
+            "'result': 'x ```json\\n{\"decisions\": []}\\n```'}))",
+        )
+        assert call_claude_with_validation("prompt", "{}") == {"decisions": []}
+
+    def test_non_json_brace_skipped(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """先頭の波括弧が JSON でなければ読み飛ばして次のオブジェクトを探す。"""
+        from modules.llm_analyzer import call_claude_with_validation
+
+        self._use_script(monkeypatch, "print('set {x} then {\"decisions\": []}')")
+        assert call_claude_with_validation("prompt", "{}") == {"decisions": []}
+
+    def test_skips_objects_without_decisions(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """説明文中の例示 JSON では打ち切らず、判断結果のオブジェクトを待つ。"""
+        import time
+
+        from modules.llm_analyzer import call_claude_with_validation
+
+        self._use_script(
+            monkeypatch,
+            'import time; print(\'e.g. {"symbol": "AAPL"}\', flush=True); time.sleep(0.2); '
+            "print('{\"decisions\": []}', flush=True); time.sleep(30)",
+        )
+        started = time.monotonic()
+        assert call_claude_with_validation("prompt", "{}", timeout=20) == {"decisions": []}
+        assert time.monotonic() - started < 10
+
+    def test_falls_back_to_full_output_without_decisions(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """判断結果が見つからなければ EOF まで読んで従来の抽出に任せる。"""
+        from modules.llm_analyzer import _stream_claude
+
+        self._use_script(monkeypatch, "print('{\"note\": 1} done')")
+        returncode, stdout, _stderr, parsed = _stream_claude("prompt", timeout=20)
+        assert (returncode, parsed) == (0, None)
+        assert stdout.strip() == b'{"note": 1} done'
+
+    def test_prompt_write_counts_against_timeout(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """stdin を読まない CLI に大きなプロンプトを渡しても timeout で打ち切る。"""
+        import time
+
+        from modules.llm_analyzer import call_claude_with_validation
+
+        self._use_script(monkeypatch, "import time; time.sleep(30)")
+        started = time.monotonic()
+        assert call_claude_with_validation("x" * 4_000_000, "{}", max_retries=1, timeout=1) is None
+        assert time.monotonic() - started < 10
+
+    def test_large_prompt_delivered(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """パイプバッファを超えるプロンプトも全量を書き込む。"""
+        from modules.llm_analyzer import call_claude_with_validation
+
+        self._use_script(
+            monkeypatch,
+            "import sys; n = len(sys.stdin.read()); "
+            "print('{\"decisions\": []}' if n > 1_000_000 else 'short')",
+        )
+        assert call_claude_with_validation("x" * 1_000_000, "{}") == {"decisions": []}
+
+    def test_nonzero_exit_returns_none(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        from modules.llm_analyzer import call_claude_with_validation
+
+        self._use_script(monkeypatch, "import sys; sys.stderr.write('boom'); sys.exit(2)")
+        assert call_claude_with_validation("prompt", "{}") is None
+
+    def test_timeout_returns_none(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        from modules.llm_analyzer import call_claude_with_validation
+
+        self._use_script(monkeypatch, "import time; time.sleep(30)")
+        assert call_claude_with_validation("prompt", "{}", max_retries=1, timeout=1) is None
+
+    @pytest.mark.usefixtures("schema_backend")
+    def test_schema_error_falls_back_to_sanitize(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """スキーマ違反（使用中のバリデータの例外）は部分サニタイズにフォールバックする。"""
+        from modules.llm_analyzer import call_claude_with_validation
+
+        out = '{"decisions": [{"symbol": "AAPL", "action": "BUY"}, {"symbol": "MSFT"}]}'
+        self._use_script(monkeypatch, f"print({out!r})")
+        result = call_claude_with_validation("prompt", "{}")
+        assert result == {"decisions": [{"symbol": "AAPL", "action": "buy"}]}
+
+
+class TestGetTradingDecisions:
+    def test_input_data_serialized_with_orjson(self, tmp_path) -> None:
+        """入力データは空白なしのUTF-8 JSONで渡し、numpy スカラーも扱える。"""
+        import dataclasses
+        from unittest.mock import patch
+
+        import numpy as np
+        import orjson
+
+        from modules.llm_analyzer import get_trading_decisions
+
+        prompt = tmp_path / "prompt.md"
+        prompt.write_text("判断してください", encoding="utf-8")
+        market_data = _sample_market_data()
+        market_data["AAPL"] = dataclasses.replace(market_data["AAPL"], rsi_14=np.float64(55.5))
+        portfolio = _sample_portfolio()
+
+        with patch(
+            "modules.llm_analyzer.call_claude_with_validation", return_value={"decisions": []}
+        ) as mock_call:
+            assert get_trading_decisions(market_data, portfolio, "morning", str(prompt)) == []
+
+        input_data = mock_call.call_args.kwargs["input_data"]
+        assert input_data.startswith('{"mode":"morning"')
+        assert "\n" not in input_data
+        assert orjson.loads(input_data)["market_data"]["AAPL"]["rsi_14"] == 55.5
+
+
+class TestReadPrompt:
+    def test_cached_until_modified(self, tmp_path) -> None:
+        import os
+
+        from modules.llm_analyzer import _read_prompt
+
+        path = tmp_path / "prompt.md"
+        path.write_text("v1", encoding="utf-8")
+        mtime = os.stat(path).st_mtime_ns
+        assert _read_prompt(str(path), mtime) == "v1"
+
+        # 同じ mtime なら再読込しない
+        path.write_text("v2", encoding="utf-8")
+        os.utime(path, ns=(mtime, mtime))
+        assert _read_prompt(str(path), os.stat(path).st_mtime_ns) == "v1"
+
+        os.utime(path, ns=(mtime + 1_000_000_000, mtime + 1_000_000_000))
+        assert _read_prompt(str(path), os.stat(path).st_mtime_ns) == "v2"
+
+
+class TestShardedAnalysis:
+    @staticmethod
+    def _market_data(n: int) -> dict[str, BarData]:
+        return {
+            f"S{i}": BarData(
+                symbol=f"S{i}",
+                close=100.0,
+                volume=1000000,
+                ma_50=95.0,
+                rsi_14=50.0,
+                atr_14=2.0,
+                volume_ratio_20d=1.0,
+            )
+            for i in range(n)
+        }
+
+    def test_shard_sizes(self) -> None:
+        from modules.llm_analyzer import _shard_market_data
+
+        shards = _shard_market_data(self._market_data(5), 2)
+        assert [list(s) for s in shards] == [["S0", "S1", "S2"], ["S3", "S4"]]
+        assert len(_shard_market_data(self._market_data(2), 8)) == 2
+        assert _shard_market_data({}, 4) == [{}]
+
+    def test_parallel_shards_merged(self, tmp_path) -> None:
+        """シャードごとの判断を結合し、失敗したシャードは除外する。"""
+        import threading
+        from unittest.mock import patch
+
+        import orjson
+
+        from modules.llm_analyzer import get_trading_decisions
+
+        prompt = tmp_path / "prompt.md"
+        prompt.write_text("p", encoding="utf-8")
+        barrier = threading.Barrier(3, timeout=5)
+
+        def fake_call(prompt_text: str, input_data: str, timeout: int) -> dict | None:
+            # 3シャードが同時に呼ばれていることを確認する
+            barrier.wait()
+            symbols = list(orjson.loads(input_data)["market_data"])
+            if symbols == ["S4", "S5"]:
+                return None
+            return {
+                "decisions": [
+                    {
+                        "symbol": s,
+                        "action": "hold",
+                        "sentiment_analysis": {"overall": "neutral", "confidence": 50},
+                    }
+                    for s in symbols
+                ]
+            }
+
+        with patch("modules.llm_analyzer.call_claude_with_validation", side_effect=fake_call):
+            decisions = get_trading_decisions(
+                self._market_data(6), _sample_portfolio(), "morning", str(prompt), shards=3
+            )
+
+        assert [d.symbol for d in decisions] == ["S0", "S1", "S2", "S3"]
+
+
+class TestPrewarmClaude:
+    @staticmethod
+    def _use_script(monkeypatch: pytest.MonkeyPatch, code: str) -> None:
+        import sys
+
+        import modules.llm_analyzer as llm
+
+        monkeypatch.setattr(llm, "_CLAUDE_CMD", (sys.executable, "-c", code))
+
+    def test_warm_process_used_for_next_call(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        from unittest.mock import patch
+
+        import modules.llm_analyzer as llm
+
+        self._use_script(monkeypatch, "import sys; sys.stdin.read(); print('{\"decisions\": []}')")
+        llm.prewarm_claude(1)
+        assert len(llm._warm_procs) == 1
+
+        with patch("modules.llm_analyzer._spawn_claude") as mock_spawn:
+            assert llm.call_claude_with_validation("prompt", "{}") == {"decisions": []}
+        mock_spawn.assert_not_called()
+        assert llm._warm_procs == []
+
+    def test_tops_up_to_count(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        import modules.llm_analyzer as llm
+
+        self._use_script(monkeypatch, "import sys; sys.stdin.read()")
+        llm.prewarm_claude(2)
+        first = list(llm._warm_procs)
+        llm.prewarm_claude(2)
+        assert llm._warm_procs == first
+
+    def test_dead_warm_process_replaced(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """待機中に終了したプロセスは使わず、新たに起動する。"""
+        import modules.llm_analyzer as llm
+
+        self._use_script(monkeypatch, "pass")
+        llm.prewarm_claude(1)
+        llm._warm_procs[0].wait()
+
+        self._use_script(monkeypatch, "import sys; sys.stdin.read(); print('{\"decisions\": []}')")
+        assert llm.call_claude_with_validation("prompt", "{}") == {"decisions": []}
+
+    def test_spawn_failure_logged(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        import modules.llm_analyzer as llm
+
+        monkeypatch.setattr(llm, "_CLAUDE_CMD", ("/nonexistent/claude",))
+        llm.prewarm_claude(1)
+        assert llm._warm_procs == []
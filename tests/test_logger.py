@@ -25,6 +25,20 @@ class TestJsonFormatter:
         assert data["msg"] == "Test message"
         assert "ts" in data
 
+    def test_ts_from_record_created_utc(self) -> None:
+        """タイムスタンプはレコード生成時刻（UTC、秒精度）。"""
+        formatter = JsonFormatter()
+        record = logging.LogRecord("trading_agent", logging.INFO, "test.py", 10, "m", (), None)
+        record.created = 1768471200.75  # 2026-01-15T10:00:00.75Z
+        assert json.loads(formatter.format(record))["ts"] == "2026-01-15T10:00:00"
+        record.created = 1768471201.0
+        assert json.loads(formatter.format(record))["ts"] == "2026-01-15T10:00:01"
+
+    def test_non_ascii_not_escaped(self) -> None:
+        formatter = JsonFormatter()
+        record = logging.LogRecord("trading_agent", logging.INFO, "test.py", 10, "注文", (), None)
+        assert "注文" in formatter.format(record)
+
     def test_format_with_exec_id(self) -> None:
         formatter = JsonFormatter()
         record = logging.LogRecord(
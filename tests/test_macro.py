@@ -23,6 +23,14 @@ class TestClassifySpyRegime:
     def test_zero_ma(self) -> None:
         assert classify_spy_regime(400.0, 0.0) == MacroRegime.RANGE
 
+    def test_boundaries_are_range(self) -> None:
+        """ちょうど±2%は RANGE（閾値は厳密な大小比較）。"""
+        assert classify_spy_regime(102.0, 100.0) == MacroRegime.RANGE
+        assert classify_spy_regime(98.0, 100.0) == MacroRegime.RANGE
+
+    def test_nan_is_range(self) -> None:
+        assert classify_spy_regime(float("nan"), 400.0) == MacroRegime.RANGE
+
 
 class TestClassifyVixRegime:
     def test_low(self) -> None:
@@ -40,6 +48,12 @@ class TestClassifyVixRegime:
     def test_boundary_extreme(self) -> None:
         assert classify_vix_regime(30.0) == VixRegime.EXTREME
 
+    def test_inverted_thresholds_prefer_extreme(self) -> None:
+        """警戒閾値 > 極端閾値の設定でも、極端閾値以上は EXTREME。"""
+        assert classify_vix_regime(30.0, threshold_elevated=35.0, threshold_extreme=25.0) == (
+            VixRegime.EXTREME
+        )
+
 
 class TestDetermineMacroRegime:
     def test_bull_consensus(self) -> None:
@@ -62,6 +76,11 @@ class TestDetermineMacroRegime:
         result = determine_macro_regime(spy_close=401.0, spy_ma200=400.0, vix=18.0)
         assert result == MacroRegime.RANGE
 
+    def test_vix_boundaries(self) -> None:
+        """VIX=15 はブル側、VIX=30 はベア側に含まれる。"""
+        assert determine_macro_regime(410.0, 400.0, vix=15.0) == MacroRegime.BULL
+        assert determine_macro_regime(390.0, 400.0, vix=30.0) == MacroRegime.BEAR
+
 
 class TestMaxPositionsForVix:
     def test_low(self) -> None:
@@ -105,3 +124,21 @@ class TestRegimeTracker:
         for _ in range(3):
             tracker.update(MacroRegime.BEAR)
         assert tracker.confirmed_regime == MacroRegime.BEAR
+
+    def test_streak_restarts_after_interruption(self) -> None:
+        """中断後は新しい判定から数え直す。"""
+        tracker = RegimeTracker(consecutive_days=3)
+        for regime in (MacroRegime.BULL, MacroRegime.BULL, MacroRegime.BEAR):
+            tracker.update(regime)
+        tracker.update(MacroRegime.BULL)
+        tracker.update(MacroRegime.BULL)
+        assert tracker.confirmed_regime == MacroRegime.RANGE
+        assert tracker.update(MacroRegime.BULL) == MacroRegime.BULL
+
+    def test_confirmed_kept_while_streak_continues(self) -> None:
+        tracker = RegimeTracker(consecutive_days=2)
+        for _ in range(5):
+            tracker.update(MacroRegime.BEAR)
+        assert tracker.confirmed_regime == MacroRegime.BEAR
+        tracker.update(MacroRegime.BULL)
+        assert tracker.confirmed_regime == MacroRegime.BEAR
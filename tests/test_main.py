@@ -1,17 +1,27 @@
 """main.py オーケストレーターのテスト。"""
 
 import os
+import sqlite3
+from datetime import UTC, datetime
 from unittest.mock import MagicMock, patch
 
 import pytest
 
 from main import (
+    _close_conn,
+    _is_trading_day,
+    _nyse_calendar,
+    _nyse_sessions,
+    _seconds_until_session,
+    _upcoming_sessions,
     generate_execution_id,
     is_market_open,
     main,
     parse_args,
+    run_daemon,
     run_health_check,
     run_pipeline,
+    run_report,
 )
 from modules.types import (
     Action,
@@ -38,6 +48,23 @@ class TestParseArgs:
         with pytest.raises(SystemExit):
             parse_args(["invalid_mode"])
 
+    def test_daemon_args(self):
+        """--daemon と --interval を受け付ける。"""
+        args = parse_args(["midday", "--daemon", "--interval", "10"])
+        assert args.daemon is True
+        assert args.interval == 10
+
+    def test_daemon_rejects_manual_modes(self):
+        """preflight/report はデーモン化できない。"""
+        with pytest.raises(SystemExit):
+            parse_args(["report", "--daemon"])
+
+    @pytest.mark.parametrize("mode", ["morning", "eod", "health_check"])
+    def test_daemon_rejects_once_per_day_modes(self, mode):
+        """morning/eod 等を反復すると重複発注・重複スナップショットになるため拒否する。"""
+        with pytest.raises(SystemExit):
+            parse_args([mode, "--daemon"])
+
 
 class TestGenerateExecutionId:
     def test_format(self):
@@ -72,13 +99,77 @@ class TestIsMarketOpen:
         """エラー時はTrueを返す（フォールバック）。"""
         import exchange_calendars
 
+        _nyse_calendar.cache_clear()
+        _upcoming_sessions.cache_clear()
         with patch.dict(os.environ, {"FORCE_MARKET_OPEN": ""}):
-            with patch.object(
-                exchange_calendars, "get_calendar", side_effect=Exception("error")
-            ):
+            with patch.object(exchange_calendars, "get_calendar", side_effect=Exception("error")):
                 result = is_market_open()
             assert result is True
 
+    def test_calendar_built_once_per_day(self):
+        """同日内の2回目以降はカレンダーを再構築しない。"""
+        import exchange_calendars
+
+        _nyse_calendar.cache_clear()
+        _upcoming_sessions.cache_clear()
+        with (
+            patch.dict(os.environ, {"FORCE_MARKET_OPEN": ""}),
+            patch.object(
+                exchange_calendars, "get_calendar", wraps=exchange_calendars.get_calendar
+            ) as mock_get,
+        ):
+            first = is_market_open()
+            second = is_market_open()
+        assert first == second
+        assert mock_get.call_count == 1
+
+    def test_calendar_reused_across_days(self):
+        """日付が変わってもカレンダーオブジェクトは再構築しない。"""
+        import exchange_calendars
+
+        _nyse_calendar.cache_clear()
+        with patch.object(
+            exchange_calendars, "get_calendar", wraps=exchange_calendars.get_calendar
+        ) as mock_get:
+            _nyse_sessions("2024-01-02", 7)
+            _nyse_sessions("2024-01-03", 7)
+        assert mock_get.call_count == 1
+
+    def test_upcoming_sessions_skips_weekend(self):
+        """週末は取引日集合に含まれない。"""
+        sessions = _upcoming_sessions("2024-01-02")
+        assert "2024-01-02" in sessions
+        assert "2024-01-06" not in sessions  # 土曜日
+
+
+class TestTradingDaysTable:
+    def test_fills_table_on_first_lookup(self, in_memory_db):
+        """未収録なら取引日を補充してから判定する。"""
+        assert _is_trading_day(in_memory_db, "2024-01-06") is False  # 土曜日
+        count = in_memory_db.execute("SELECT COUNT(*) FROM trading_days").fetchone()[0]
+        assert count > 200
+        assert _is_trading_day(in_memory_db, "2024-01-08") is True
+
+    def test_no_refresh_when_covered(self, in_memory_db):
+        """収録済みの日付はカレンダーを読み込まずに判定する。"""
+        in_memory_db.executemany(
+            "INSERT INTO trading_days (date) VALUES (?)",
+            [("2024-01-05",), ("2024-01-08",)],
+        )
+        with patch("main._refresh_trading_days") as mock_refresh:
+            assert _is_trading_day(in_memory_db, "2024-01-05") is True
+            assert _is_trading_day(in_memory_db, "2024-01-06") is False
+        mock_refresh.assert_not_called()
+
+    def test_is_market_open_with_conn(self, in_memory_db):
+        """conn指定時はtrading_daysで判定する。"""
+        with (
+            patch.dict(os.environ, {"FORCE_MARKET_OPEN": ""}),
+            patch("main._is_trading_day", return_value=False) as mock_lookup,
+        ):
+            assert is_market_open(in_memory_db) is False
+        mock_lookup.assert_called_once()
+
 
 class TestRunHealthCheck:
     @patch("main.run_full_health_check")
@@ -91,7 +182,9 @@ class TestRunHealthCheck:
 
         result = run_health_check(sample_config, in_memory_db)
         assert result is True
-        mock_full_check.assert_called_once_with(sample_config, in_memory_db)
+        mock_full_check.assert_called_once_with(
+            sample_config, in_memory_db, fail_fast_on=frozenset()
+        )
 
     @patch("main.run_full_health_check")
     def test_failure(self, mock_full_check, sample_config, in_memory_db):
@@ -104,13 +197,106 @@ class TestRunHealthCheck:
         result = run_health_check(sample_config, in_memory_db)
         assert result is False
 
+    @patch("main.run_full_health_check")
+    def test_fail_fast_enabled(self, mock_full_check, sample_config, in_memory_db):
+        """health_check_fail_fast=true なら重大チェック失敗で打ち切る。"""
+        from modules.health import CRITICAL_CHECKS
+
+        config = sample_config.model_copy(
+            update={
+                "system": sample_config.system.model_copy(update={"health_check_fail_fast": True})
+            }
+        )
+        mock_full_check.return_value = MagicMock(all_ok=True)
+
+        run_health_check(config, in_memory_db)
+        mock_full_check.assert_called_once_with(config, in_memory_db, fail_fast_on=CRITICAL_CHECKS)
+
+
+class TestRunReport:
+    @patch("alpaca.trading.client.TradingClient", side_effect=Exception("offline"))
+    @patch("main.init_db")
+    @patch("main.get_config")
+    def test_trade_statistics(
+        self, mock_load_config, mock_init_db, _mock_client, sample_config, in_memory_db, capsys
+    ):
+        """positions の集計がレポートに反映される。"""
+        mock_load_config.return_value = sample_config
+        mock_init_db.return_value = in_memory_db
+        in_memory_db.executemany(
+            "INSERT INTO positions (symbol, qty, entry_price, entry_date, status, pnl) "
+            "VALUES (?, 1, 100, '2024-01-02', ?, ?)",
+            [
+                ("AAPL", "closed", 30.0),
+                ("MSFT", "closed", 10.0),
+                ("NVDA", "closed", -20.0),
+                ("JPM", "open", None),
+            ],
+        )
+
+        assert run_report() == 0
+
+        out = capsys.readouterr().out
+        assert "Open Positions:  1" in out
+        assert "Closed Trades:   3" in out
+        assert "Win Rate:        66.7% (2/3)" in out
+        assert "$       20.00" in out  # Total PnL
+        assert "Avg Win:         $       20.00" in out
+        assert "Avg Loss:        $      -20.00" in out
+
+    @patch("alpaca.trading.client.TradingClient", side_effect=Exception("offline"))
+    @patch("main.init_db")
+    @patch("main.get_config")
+    def test_snapshot_logs_and_circuit_breaker(
+        self, mock_load_config, mock_init_db, _mock_client, sample_config, in_memory_db, capsys
+    ):
+        mock_load_config.return_value = sample_config
+        mock_init_db.return_value = in_memory_db
+        in_memory_db.execute(
+            "INSERT INTO daily_snapshots (date, total_equity, cash, positions_value, "
+            "daily_pnl_pct, drawdown_pct, macro_regime, vix_close) "
+            "VALUES ('2024-01-02', 101000, 50000, 51000, 1.0, 3.5, 'bull', 14.2)"
+        )
+        in_memory_db.execute(
+            "INSERT INTO execution_logs (execution_id, mode, started_at, status) "
+            "VALUES ('20240102_eod_160000', 'eod', '2024-01-02T16:00:00', 'success')"
+        )
+        in_memory_db.execute(
+            "INSERT INTO circuit_breaker (level, triggered_at, drawdown_pct, reason) "
+            "VALUES (1, '2024-01-02 15:00:00', 4.5, 'test')"
+        )
+
+        assert run_report() == 0
+
+        out = capsys.readouterr().out
+        assert "Max Drawdown:    3.50%" in out
+        assert "--- Latest Snapshot (2024-01-02) ---" in out
+        assert "VIX:             14.20" in out
+        assert "20240102_eod_160000: eod -> success (0ms)" in out
+        assert "Circuit Breaker L1 triggered at 2024-01-02 15:00:00" in out
+
+    @patch("alpaca.trading.client.TradingClient", side_effect=Exception("offline"))
+    @patch("main.init_db")
+    @patch("main.get_config")
+    def test_empty_db(
+        self, mock_load_config, mock_init_db, _mock_client, sample_config, in_memory_db, capsys
+    ):
+        mock_load_config.return_value = sample_config
+        mock_init_db.return_value = in_memory_db
+
+        assert run_report() == 0
+
+        out = capsys.readouterr().out
+        assert "Win Rate:        0.0% (0/0)" in out
+        assert "Avg Win" not in out
+
 
 class TestRunPipeline:
     @patch("main.AlpacaOrderExecutor")
     @patch("main.get_trading_decisions")
     @patch("main.collect_market_data")
     @patch("main.init_db")
-    @patch("main.load_config")
+    @patch("main.get_config")
     @patch("main.setup_logger")
     @patch("main.is_market_open")
     def test_morning_pipeline(
@@ -198,16 +384,24 @@ class TestRunPipeline:
                 mock_rm.check_circuit_breaker.return_value = CircuitBreakerState(
                     active=False, level=0, drawdown_pct=0.0
                 )
-                mock_rm.can_open_new_position.return_value = (True, "OK")
+                mock_rm.can_open_new_positions.side_effect = lambda _p, sectors, _v: dict.fromkeys(
+                    sectors, (True, "OK")
+                )
                 mock_rm_cls.return_value = mock_rm
 
                 with patch.dict(os.environ, {"ALPACA_PAPER": "true"}):
                     result = run_pipeline("morning")
 
         assert result == 0
+        # SPY とユニバースは1回のバッチで取得し、SPY は LLM 入力に含めない
+        mock_collect.assert_called_once()
+        fetched = mock_collect.call_args.args[0]
+        assert fetched[0] == "SPY"
+        assert "AAPL" in fetched
+        assert "SPY" not in mock_llm.call_args.kwargs["market_data"]
 
     @patch("main.init_db")
-    @patch("main.load_config")
+    @patch("main.get_config")
     @patch("main.setup_logger")
     @patch("main.is_market_open")
     def test_eod_pipeline(
@@ -263,8 +457,183 @@ class TestRunPipeline:
         assert result == 0
         mock_sm.save_daily_snapshot.assert_called_once()
 
+    @patch("main.get_trading_decisions", return_value=[])
+    @patch("main.collect_market_data", return_value={})
+    @patch("main.AlpacaRiskManager")
     @patch("main.init_db")
-    @patch("main.load_config")
+    @patch("main.get_config")
+    @patch("main.setup_logger")
+    @patch("main.is_market_open", return_value=True)
+    def test_morning_without_decisions(
+        self,
+        _mock_market_open,
+        _mock_setup_logger,
+        mock_load_config,
+        mock_init_db,
+        mock_rm_cls,
+        _mock_collect,
+        _mock_llm,
+        sample_config,
+        in_memory_db,
+    ):
+        """判断0件なら decisions への書き込みとシリアライズを省略する。"""
+        mock_load_config.return_value = sample_config
+        mock_init_db.return_value = in_memory_db
+        mock_rm_cls.return_value.check_circuit_breaker.return_value = CircuitBreakerState(
+            active=False, level=0, drawdown_pct=0.0
+        )
+
+        with patch("main.AlpacaStateManager") as mock_sm_cls:
+            mock_sm = mock_sm_cls.return_value
+            mock_sm.check_execution_id.return_value = False
+            mock_sm.reconcile.return_value = []
+            mock_sm.sync.return_value = PortfolioState(
+                equity=100000.0,
+                cash=50000.0,
+                buying_power=100000.0,
+                positions={},
+                daily_pnl_pct=0.0,
+                drawdown_pct=0.0,
+            )
+
+            with patch("main.prewarm_claude") as mock_prewarm:
+                assert run_pipeline("morning") == 0
+
+        mock_prewarm.assert_called_once_with(sample_config.system.claude_parallel_sessions)
+        mock_sm.record_decisions.assert_not_called()
+        assert mock_sm.record_execution_log.call_args.kwargs["decisions_json"] == "[]"
+
+    @patch("main.archive_execution_logs")
+    @patch("main.collect_market_data", return_value={})
+    @patch("main.AlpacaRiskManager")
+    @patch("main.init_db")
+    @patch("main.get_config")
+    @patch("main.setup_logger")
+    @patch("main.is_market_open", return_value=True)
+    def test_eod_writes_in_one_transaction(
+        self,
+        _mock_market_open,
+        _mock_setup_logger,
+        mock_load_config,
+        mock_init_db,
+        mock_rm_cls,
+        _mock_collect,
+        mock_archive,
+        sample_config,
+        in_memory_db,
+    ):
+        """スナップショットと実行ログは同じトランザクション内で書き、アーカイブはコミット後。"""
+        mock_load_config.return_value = sample_config
+        mock_init_db.return_value = in_memory_db
+        mock_rm_cls.return_value.check_circuit_breaker.return_value = CircuitBreakerState(
+            active=False, level=0, drawdown_pct=0.0
+        )
+        mock_archive.return_value = 0
+        events: list[str] = []
+
+        with patch("main.AlpacaStateManager") as mock_sm_cls:
+            mock_sm = mock_sm_cls.return_value
+            mock_sm.check_execution_id.return_value = False
+            mock_sm.reconcile.return_value = []
+            mock_sm.sync.return_value = PortfolioState(
+                equity=100000.0,
+                cash=50000.0,
+                buying_power=100000.0,
+                positions={},
+                daily_pnl_pct=0.0,
+                drawdown_pct=0.0,
+            )
+            tx = mock_sm.transaction.return_value
+            tx.__enter__.side_effect = lambda *a: events.append("begin")
+            tx.__exit__.side_effect = lambda *a: events.append("commit")
+            mock_sm.save_daily_snapshot.side_effect = lambda *a: events.append("snapshot")
+            mock_sm.record_execution_log.side_effect = lambda **kw: events.append("log")
+            mock_archive.side_effect = lambda *a: events.append("archive") or 0
+
+            assert run_pipeline("eod") == 0
+
+        assert events == ["begin", "snapshot", "log", "commit", "archive"]
+
+    @patch("main.AlpacaOrderExecutor")
+    @patch("main.get_trading_decisions")
+    @patch("main.collect_market_data", return_value={})
+    @patch("main.AlpacaRiskManager")
+    @patch("main.get_config")
+    @patch("main.setup_logger")
+    @patch("main.is_market_open", return_value=True)
+    def test_order_results_survive_later_failure(
+        self,
+        _mock_market_open,
+        _mock_setup_logger,
+        mock_load_config,
+        mock_rm_cls,
+        _mock_collect,
+        mock_llm,
+        mock_executor_cls,
+        sample_config,
+        in_memory_db,
+    ):
+        """発注後の判断記録が失敗しても、約定済みの position/trade 行は残る。"""
+        from modules.state_manager import AlpacaStateManager
+
+        mock_load_config.return_value = sample_config
+        mock_rm = mock_rm_cls.return_value
+        mock_rm.check_circuit_breaker.return_value = CircuitBreakerState(
+            active=False, level=0, drawdown_pct=0.0
+        )
+        mock_rm.can_open_new_positions.side_effect = lambda _p, sectors, _v: dict.fromkeys(
+            sectors, (True, "OK")
+        )
+        mock_llm.return_value = [
+            TradingDecision(
+                symbol="AAPL",
+                action=Action.BUY,
+                confidence=85,
+                entry_price=150.0,
+                stop_loss=145.0,
+                take_profit=165.0,
+                reasoning_bull="Strong",
+                reasoning_bear="Risk",
+                catalyst="Earnings",
+            ),
+        ]
+        mock_executor_cls.return_value.execute.return_value = [
+            OrderResult(
+                symbol="AAPL",
+                success=True,
+                alpaca_order_id="order-123",
+                client_order_id="exec_AAPL_buy",
+                filled_qty=10,
+                filled_price=150.0,
+            ),
+        ]
+
+        state_manager = AlpacaStateManager(sample_config, in_memory_db, trading_client=MagicMock())
+        state_manager.reconcile = MagicMock(return_value=[])
+        state_manager.sync = MagicMock(
+            return_value=PortfolioState(
+                equity=100000.0,
+                cash=50000.0,
+                buying_power=100000.0,
+                positions={},
+                daily_pnl_pct=0.0,
+                drawdown_pct=0.0,
+            )
+        )
+        state_manager.record_decisions = MagicMock(
+            side_effect=sqlite3.IntegrityError("CHECK constraint failed: confidence")
+        )
+
+        with patch("main.AlpacaStateManager", return_value=state_manager):
+            assert run_pipeline("morning", conn=in_memory_db) == 1
+
+        assert in_memory_db.execute("SELECT COUNT(*) FROM positions").fetchone()[0] == 1
+        assert in_memory_db.execute("SELECT COUNT(*) FROM trades").fetchone()[0] == 1
+        status = in_memory_db.execute("SELECT status FROM execution_logs").fetchone()[0]
+        assert status == "error"
+
+    @patch("main.init_db")
+    @patch("main.get_config")
     @patch("main.setup_logger")
     @patch("main.is_market_open")
     def test_market_closed_skips(
@@ -291,7 +660,7 @@ class TestRunPipeline:
         assert result == 0
 
     @patch("main.init_db")
-    @patch("main.load_config")
+    @patch("main.get_config")
     @patch("main.setup_logger")
     def test_duplicate_execution_skips(
         self,
@@ -316,7 +685,7 @@ class TestRunPipeline:
 
     @patch("main.run_health_check")
     @patch("main.init_db")
-    @patch("main.load_config")
+    @patch("main.get_config")
     @patch("main.setup_logger")
     def test_health_check_mode(
         self,
@@ -342,8 +711,37 @@ class TestRunPipeline:
         assert result == 0
         mock_run_hc.assert_called_once()
 
+    @patch("main.run_health_check")
+    @patch("main.init_db")
+    @patch("main.get_config")
+    @patch("main.setup_logger")
+    def test_single_execution_log_row(
+        self,
+        mock_setup_logger,
+        mock_load_config,
+        mock_init_db,
+        mock_run_hc,
+        sample_config,
+        in_memory_db,
+    ):
+        """実行ログは完了時の1行のみ（"running"行を経由しない）。"""
+        mock_load_config.return_value = sample_config
+        mock_init_db.return_value = in_memory_db
+        mock_run_hc.return_value = True
+
+        with patch("main._close_conn"):
+            result = run_pipeline("health_check")
+
+        assert result == 0
+        rows = in_memory_db.execute(
+            "SELECT status, started_at, completed_at FROM execution_logs"
+        ).fetchall()
+        assert len(rows) == 1
+        assert rows[0]["status"] == "success"
+        assert rows[0]["started_at"] <= rows[0]["completed_at"]
+
     @patch("main.init_db")
-    @patch("main.load_config")
+    @patch("main.get_config")
     @patch("main.setup_logger")
     @patch("main.is_market_open")
     def test_pipeline_error_handling(
@@ -370,10 +768,175 @@ class TestRunPipeline:
 
         assert result == 1
 
+    @patch("main.get_config")
+    @patch("main.setup_logger")
+    def test_supplied_conn_not_closed(
+        self, mock_setup_logger, mock_load_config, sample_config, in_memory_db
+    ):
+        """呼び出し側から渡された接続はパイプライン終了後も開いたまま。"""
+        mock_load_config.return_value = sample_config
+
+        with patch("main.AlpacaStateManager") as mock_sm_cls:
+            mock_sm = MagicMock()
+            mock_sm.check_execution_id.return_value = True
+            mock_sm_cls.return_value = mock_sm
+
+            result = run_pipeline("morning", conn=in_memory_db)
+
+        assert result == 0
+        in_memory_db.execute("SELECT 1")
+
+
+class TestRunDaemon:
+    @pytest.fixture(autouse=True)
+    def _in_session(self, sample_config, tmp_path, monkeypatch):
+        """既定では取引時間中として扱い、ロックファイルは一時ディレクトリに置く。"""
+        sample_config.system.lock_file_path = str(tmp_path / "state" / "agent.lock")
+        monkeypatch.setattr("main._seconds_until_session", lambda _now: 0.0)
+
+    @patch("main.time.sleep")
+    @patch("main.run_pipeline")
+    @patch("main.init_db")
+    @patch("main.get_config")
+    def test_reuses_single_connection(
+        self, mock_load_config, mock_init_db, mock_run_pipeline, mock_sleep, sample_config
+    ):
+        """1本の接続を全イテレーションで使い回し、最後に閉じる。"""
+        conn = MagicMock()
+        mock_load_config.return_value = sample_config
+        mock_init_db.return_value = conn
+        mock_run_pipeline.return_value = 0
+
+        result = run_daemon("midday", interval_seconds=300, max_iterations=3)
+
+        assert result == 0
+        mock_init_db.assert_called_once()
+        assert mock_run_pipeline.call_count == 3
+        for call in mock_run_pipeline.call_args_list:
+            assert call.kwargs["conn"] is conn
+            assert call.kwargs["read_conn"] is None  # :memory: ではリーダーなし
+        assert mock_sleep.call_count == 2
+        conn.close.assert_called_once()
+
+    @patch("main.run_pipeline")
+    @patch("main.init_db")
+    @patch("main.get_config")
+    def test_keyboard_interrupt_closes_conn(
+        self, mock_load_config, mock_init_db, mock_run_pipeline, sample_config
+    ):
+        """停止シグナルでも接続を閉じて終了する。"""
+        conn = MagicMock()
+        mock_load_config.return_value = sample_config
+        mock_init_db.return_value = conn
+        mock_run_pipeline.side_effect = KeyboardInterrupt
+
+        result = run_daemon("midday", interval_seconds=300)
+
+        assert result == 0
+        conn.close.assert_called_once()
+
+    @patch("main.time.sleep")
+    @patch("main.run_pipeline", return_value=0)
+    @patch("main.init_db")
+    @patch("main.get_config")
+    def test_sleeps_until_session_open(
+        self, mock_load_config, _mock_init_db, mock_run_pipeline, mock_sleep, sample_config
+    ):
+        """取引時間外は実行せず、次の寄り付きまでスリープしてから実行する。"""
+        mock_load_config.return_value = sample_config
+        waits = iter([1800.0, 0.0])
+
+        with patch("main._seconds_until_session", side_effect=lambda _now: next(waits)):
+            run_daemon("midday", interval_seconds=300, max_iterations=1)
+
+        mock_sleep.assert_called_once_with(1800.0)
+        mock_run_pipeline.assert_called_once()
+
+    @patch("main.run_pipeline", return_value=0)
+    @patch("main.init_db")
+    @patch("main.get_config")
+    def test_morning_runs_while_daemon_sleeps(
+        self, mock_load_config, _mock_init_db, mock_run_pipeline, sample_config
+    ):
+        """スリープ中はロックを保持しないため、launchd の morning が実行できる。"""
+        mock_load_config.return_value = sample_config
+        results = []
+
+        with patch("main.time.sleep", side_effect=lambda _s: results.append(main(["morning"]))):
+            run_daemon("midday", interval_seconds=300, max_iterations=2)
+
+        assert results == [0]
+        assert [c.args[0] for c in mock_run_pipeline.call_args_list] == [
+            "midday",
+            "morning",
+            "midday",
+        ]
+
+    @patch("main.time.sleep")
+    @patch("main.run_pipeline")
+    @patch("main.init_db")
+    @patch("main.get_config")
+    def test_skips_iteration_while_other_run_holds_lock(
+        self, mock_load_config, _mock_init_db, mock_run_pipeline, _mock_sleep, sample_config
+    ):
+        """morning 等がロック中ならデーモンはそのイテレーションを見送る。"""
+        import fcntl
+
+        mock_load_config.return_value = sample_config
+        lock_path = sample_config.system.lock_file_path
+        os.makedirs(os.path.dirname(lock_path))
+
+        with open(lock_path, "w") as holder:
+            fcntl.flock(holder, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            run_daemon("midday", interval_seconds=300, max_iterations=1)
+
+        mock_run_pipeline.assert_not_called()
+
+
+class TestSecondsUntilSession:
+    @pytest.fixture(autouse=True)
+    def _no_force(self, monkeypatch):
+        monkeypatch.delenv("FORCE_MARKET_OPEN", raising=False)
+
+    def test_during_session(self):
+        """取引時間中（10:00 ET）は 0。"""
+        assert _seconds_until_session(datetime(2025, 3, 3, 15, 0, tzinfo=UTC)) == 0.0
+
+    def test_before_open(self):
+        """寄り付き前（9:00 ET）は 9:30 ET までの秒数。"""
+        assert _seconds_until_session(datetime(2025, 3, 3, 14, 0, tzinfo=UTC)) == 1800.0
+
+    def test_after_close_and_weekend(self):
+        """大引け後や週末は次の取引日の寄り付きまで待つ。"""
+        after_close = datetime(2025, 3, 3, 22, 0, tzinfo=UTC)
+        assert _seconds_until_session(after_close) == 16.5 * 3600
+        saturday = datetime(2025, 3, 1, 15, 0, tzinfo=UTC)
+        assert _seconds_until_session(saturday) == 47.5 * 3600
+
+    def test_force_market_open(self, monkeypatch):
+        monkeypatch.setenv("FORCE_MARKET_OPEN", "true")
+        assert _seconds_until_session(datetime(2025, 3, 1, 15, 0, tzinfo=UTC)) == 0.0
+
+
+class TestCloseConn:
+    def test_optimize_then_close(self):
+        """PRAGMA optimize を実行してから接続を閉じる。"""
+        conn = MagicMock()
+        _close_conn(conn)
+        conn.execute.assert_called_once_with("PRAGMA optimize")
+        conn.close.assert_called_once()
+
+    def test_closes_even_if_optimize_fails(self):
+        """optimize失敗時も接続は閉じる。"""
+        conn = MagicMock()
+        conn.execute.side_effect = sqlite3.OperationalError("locked")
+        _close_conn(conn)
+        conn.close.assert_called_once()
+
 
 class TestMainEntrypoint:
     @patch("main.run_pipeline")
-    @patch("main.load_config")
+    @patch("main.get_config")
     def test_main_with_lock(self, mock_load_config, mock_run_pipeline, sample_config, tmp_path):
         """ファイルロック付きのメインエントリポイント。"""
         lock_path = str(tmp_path / "agent.lock")
@@ -386,6 +949,126 @@ class TestMainEntrypoint:
         assert result == 0
         mock_run_pipeline.assert_called_once_with("morning")
 
+    @patch("main.run_pipeline")
+    @patch("main.get_config")
+    def test_main_lock_held_by_other(
+        self, mock_load_config, mock_run_pipeline, sample_config, tmp_path
+    ):
+        """他プロセスがロック中なら実行せず、ロックファイルの内容も消さない。"""
+        import fcntl
+
+        lock_path = tmp_path / "agent.lock"
+        lock_path.write_text("mode=midday pid=1 started_at=2024-01-01T12:00:00\n")
+        sample_config.system.lock_file_path = str(lock_path)
+        mock_load_config.return_value = sample_config
+
+        with open(lock_path) as holder:
+            fcntl.flock(holder, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            assert main(["morning"]) == 1
+
+        mock_run_pipeline.assert_not_called()
+        assert "mode=midday" in lock_path.read_text()
+
+    @patch("main.run_pipeline", return_value=0)
+    @patch("main.get_config")
+    def test_main_waits_for_daemon_iteration(
+        self, mock_load_config, mock_run_pipeline, sample_config, tmp_path, monkeypatch
+    ):
+        """ロック保持者がデーモンのイテレーションなら、解放を待ってから実行する。"""
+        import fcntl
+        import threading
+
+        lock_path = tmp_path / "agent.lock"
+        sample_config.system.lock_file_path = str(lock_path)
+        mock_load_config.return_value = sample_config
+        monkeypatch.setattr("main._LOCK_POLL_SECONDS", 0.02)
+
+        holder = open(lock_path, "w")  # noqa: SIM115
+        holder.write("mode=midday pid=1 started_at=2024-01-01T12:00:00 daemon=1\n")
+        holder.flush()
+        fcntl.flock(holder, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+        def _finish_iteration():
+            holder.truncate(0)
+            holder.close()
+
+        timer = threading.Timer(0.2, _finish_iteration)
+        timer.start()
+        try:
+            assert main(["morning"]) == 0
+        finally:
+            timer.join()
+        mock_run_pipeline.assert_called_once_with("morning")
+
+    @patch("main.run_pipeline")
+    @patch("main.get_config")
+    def test_main_gives_up_on_long_daemon_iteration(
+        self, mock_load_config, mock_run_pipeline, sample_config, tmp_path, monkeypatch
+    ):
+        """デーモンのイテレーションが待機上限を超えたら実行せず終了する。"""
+        import fcntl
+
+        lock_path = tmp_path / "agent.lock"
+        lock_path.write_text("mode=midday pid=1 started_at=2024-01-01T12:00:00 daemon=1\n")
+        sample_config.system.lock_file_path = str(lock_path)
+        mock_load_config.return_value = sample_config
+        monkeypatch.setattr("main._LOCK_WAIT_SECONDS", 0.1)
+        monkeypatch.setattr("main._LOCK_POLL_SECONDS", 0.02)
+
+        with open(lock_path) as holder:
+            fcntl.flock(holder, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            assert main(["morning"]) == 1
+
+        mock_run_pipeline.assert_not_called()
+
+    @patch("main.run_pipeline")
+    @patch("main.get_config")
+    def test_lock_file_sentinel(
+        self, mock_load_config, mock_run_pipeline, sample_config, tmp_path, capsys
+    ):
+        """実行中はロックファイルに実行情報を書き、正常終了時に空にする。"""
+        lock_path = tmp_path / "agent.lock"
+        sample_config.system.lock_file_path = str(lock_path)
+        mock_load_config.return_value = sample_config
+        mock_run_pipeline.side_effect = lambda mode: (
+            0 if "mode=morning" in lock_path.read_text() else 1
+        )
+
+        assert main(["morning"]) == 0
+        assert lock_path.read_text() == ""
+        assert "did not finish cleanly" not in capsys.readouterr().err
+
+    @patch("main.run_pipeline")
+    @patch("main.get_config")
+    def test_lock_file_reports_stale_run(
+        self, mock_load_config, mock_run_pipeline, sample_config, tmp_path, capsys
+    ):
+        """前回実行の情報が残っていれば異常終了として報告する。"""
+        lock_path = tmp_path / "agent.lock"
+        lock_path.write_text("mode=midday pid=1 started_at=2024-01-01T12:00:00\n")
+        sample_config.system.lock_file_path = str(lock_path)
+        mock_load_config.return_value = sample_config
+        mock_run_pipeline.return_value = 0
+
+        main(["morning"])
+
+        assert "mode=midday" in capsys.readouterr().err
+
+    @patch("main.run_daemon")
+    @patch("main.get_config")
+    def test_main_daemon(self, mock_load_config, mock_run_daemon, sample_config, tmp_path):
+        """--daemon 指定時はロックを取らずに常駐ループに入る（ロックはイテレーション単位）。"""
+        lock_path = tmp_path / "agent.lock"
+        sample_config.system.lock_file_path = str(lock_path)
+        mock_load_config.return_value = sample_config
+        mock_run_daemon.return_value = 0
+
+        result = main(["midday", "--daemon", "--interval", "2"])
+
+        assert result == 0
+        mock_run_daemon.assert_called_once_with("midday", interval_seconds=120)
+        assert not lock_path.exists()
+
 
 def _make_state_manager(config, conn, client):
     """テスト用StateManager作成ヘルパー。"""
@@ -1,11 +1,13 @@
 """order_executor モジュールのテスト。"""
 
 import os
+import threading
+import time
 from unittest.mock import MagicMock, patch
 
 import pytest
 
-from modules.order_executor import AlpacaOrderExecutor
+from modules.order_executor import _MAX_ORDER_WORKERS, AlpacaOrderExecutor
 from modules.types import Action, PortfolioState, PositionInfo, TradingDecision
 
 
@@ -229,3 +231,110 @@ class TestExecuteOrdering:
         result = executor._execute_buy(decision, portfolio, "20240101_morning_090000")
 
         assert result.client_order_id == "20240101_morning_090000_NVDA_buy"
+
+
+class TestConcurrentSubmission:
+    def test_orders_in_phase_submitted_concurrently(self, executor, mock_client, portfolio):
+        """同一フェーズの注文は並行して送信される（互いの完了を待たない）。"""
+        barrier = threading.Barrier(3, timeout=5)
+
+        def submit(request):
+            barrier.wait()  # 3件が同時に送信中でなければタイムアウトする
+            order = MagicMock()
+            order.id = f"order-{request.symbol}"
+            return order
+
+        mock_client.submit_order.side_effect = submit
+
+        decisions = [_make_buy_decision(s) for s in ("MSFT", "NVDA", "AMZN")]
+        with patch.dict(os.environ, {"ALPACA_PAPER": "true"}):
+            results = executor.execute(decisions, portfolio, "exec-001")
+
+        assert [r.symbol for r in results] == ["MSFT", "NVDA", "AMZN"]
+        assert all(r.success for r in results)
+        assert [r.alpaca_order_id for r in results] == [
+            "order-MSFT",
+            "order-NVDA",
+            "order-AMZN",
+        ]
+
+    def test_buy_phase_waits_for_all_sells(self, executor, mock_client, portfolio):
+        """BUYはSELLフェーズの全注文が完了してから送信される。"""
+        portfolio.positions["GOOG"] = portfolio.positions["AAPL"]
+        events: list[str] = []
+        lock = threading.Lock()
+
+        def submit(request):
+            if request.side.value == "sell":
+                time.sleep(0.05)
+            with lock:
+                events.append(f"{request.side.value}:{request.symbol}")
+            order = MagicMock()
+            order.id = "order"
+            return order
+
+        mock_client.submit_order.side_effect = submit
+
+        decisions = [
+            _make_buy_decision("MSFT"),
+            _make_sell_decision("AAPL"),
+            _make_buy_decision("NVDA"),
+            _make_sell_decision("GOOG"),
+        ]
+        with patch.dict(os.environ, {"ALPACA_PAPER": "true"}):
+            results = executor.execute(decisions, portfolio, "exec-001")
+
+        assert [r.symbol for r in results] == ["AAPL", "GOOG", "MSFT", "NVDA"]
+        assert {e.split(":")[0] for e in events[:2]} == {"sell"}
+        assert {e.split(":")[0] for e in events[2:]} == {"buy"}
+
+    def test_concurrency_bounded(self, executor, mock_client, portfolio):
+        """同時送信数は _MAX_ORDER_WORKERS を超えない。"""
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def submit(request):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.02)
+            with lock:
+                active -= 1
+            order = MagicMock()
+            order.id = "order"
+            return order
+
+        mock_client.submit_order.side_effect = submit
+
+        decisions = [_make_buy_decision(f"S{i}") for i in range(_MAX_ORDER_WORKERS * 2)]
+        with patch.dict(os.environ, {"ALPACA_PAPER": "true"}):
+            results = executor.execute(decisions, portfolio, "exec-001")
+
+        assert len(results) == _MAX_ORDER_WORKERS * 2
+        assert peak <= _MAX_ORDER_WORKERS
+
+    def test_retry_is_per_order(self, executor, mock_client, portfolio):
+        """1件の失敗リトライが他の注文に影響しない。"""
+        failed_once: set[str] = set()
+        lock = threading.Lock()
+
+        def submit(request):
+            with lock:
+                first = request.symbol == "NVDA" and request.symbol not in failed_once
+                failed_once.add(request.symbol)
+            if first:
+                raise ConnectionError("timeout")
+            order = MagicMock()
+            order.id = f"order-{request.symbol}"
+            return order
+
+        mock_client.submit_order.side_effect = submit
+
+        decisions = [_make_buy_decision(s) for s in ("MSFT", "NVDA")]
+        with patch.dict(os.environ, {"ALPACA_PAPER": "true"}):
+            results = executor.execute(decisions, portfolio, "exec-001")
+
+        assert all(r.success for r in results)
+        assert mock_client.submit_order.call_count == 3
@@ -1,6 +1,7 @@
 """risk_manager モジュールのテスト。"""
 
 from datetime import date
+from unittest.mock import patch
 
 import pytest
 
@@ -102,6 +103,18 @@ class TestCircuitBreaker:
         assert result.active is False
         assert result.level == 0
 
+    @pytest.mark.parametrize(("dd", "level"), [(7.0, 2), (10.0, 3), (15.0, 4), (99.0, 4)])
+    def test_boundary_exact_upper_levels(self, risk_manager, dd, level):
+        """境界値: 各閾値ちょうどでそのレベル。"""
+        result = risk_manager.check_circuit_breaker(_make_portfolio(drawdown_pct=dd))
+        assert result.level == level
+
+    def test_nan_drawdown_not_triggered(self, risk_manager):
+        """NaN のドローダウンではCBを発動しない。"""
+        result = risk_manager.check_circuit_breaker(_make_portfolio(drawdown_pct=float("nan")))
+        assert result.active is False
+        assert result.level == 0
+
     def test_cooldown_still_active(self, risk_manager, in_memory_db):
         """クールダウン中は既存CBを返す。"""
         # 直近でL1をトリガー
@@ -308,3 +321,50 @@ class TestCanOpenNewPosition:
         )
         assert can_open is False
         assert "VIX regime" in reason
+
+
+class TestCanOpenNewPositions:
+    def test_batch_mixed_results(self, risk_manager):
+        """銘柄ごとに許可/拒否を返す。"""
+        positions = {
+            "JPM": _make_position("JPM", "Financials"),
+            "V": _make_position("V", "Financials"),
+        }
+        portfolio = _make_portfolio(positions=positions)
+        results = risk_manager.can_open_new_positions(
+            portfolio,
+            {"AAPL": "Technology", "MA": "Financials", "JPM": "Financials"},
+            VixRegime.LOW,
+        )
+        assert results["AAPL"] == (True, "OK")
+        assert results["MA"][0] is False
+        assert "Sector exposure" in results["MA"][1]
+        assert "Already have" in results["JPM"][1]
+
+    def test_shared_checks_evaluated_once(self, risk_manager):
+        """CB判定と日次エントリー数は銘柄数に関わらず1回だけ評価する。"""
+        portfolio = _make_portfolio()
+        with (
+            patch.object(
+                risk_manager, "check_circuit_breaker", wraps=risk_manager.check_circuit_breaker
+            ) as mock_cb,
+            patch.object(
+                risk_manager, "check_daily_entry_limit", wraps=risk_manager.check_daily_entry_limit
+            ) as mock_daily,
+        ):
+            results = risk_manager.can_open_new_positions(
+                portfolio,
+                {"AAPL": "Technology", "JNJ": "Healthcare", "XOM": "Energy"},
+                VixRegime.LOW,
+            )
+        assert all(ok for ok, _ in results.values())
+        mock_cb.assert_called_once()
+        mock_daily.assert_called_once()
+
+    def test_circuit_breaker_blocks_all(self, risk_manager):
+        """CB発動時は全銘柄を拒否。"""
+        portfolio = _make_portfolio(drawdown_pct=5.0)
+        results = risk_manager.can_open_new_positions(
+            portfolio, {"AAPL": "Technology", "JNJ": "Healthcare"}, VixRegime.LOW
+        )
+        assert all(not ok and "Circuit breaker" in reason for ok, reason in results.values())
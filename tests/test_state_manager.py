@@ -1,6 +1,8 @@
 """state_manager モジュールのテスト。"""
 
+import sqlite3
 from datetime import date
+from types import SimpleNamespace
 from unittest.mock import MagicMock
 
 import pytest
@@ -35,9 +37,21 @@ def mock_position():
     pos.avg_entry_price = "150.00"
     pos.current_price = "155.00"
     pos.unrealized_pl = "50.00"
+    pos.market_value = "1550.00"
     return pos
 
 
+def _position(symbol: str, qty: str, market_value: str) -> SimpleNamespace:
+    return SimpleNamespace(symbol=symbol, qty=qty, market_value=market_value)
+
+
+def _set_alpaca_positions(client: MagicMock, positions: list) -> None:
+    """get_all_positions と、評価額が一致する get_account をモックに設定する。"""
+    client.get_all_positions.return_value = positions
+    total = sum(float(p.market_value) for p in positions)
+    client.get_account.return_value = SimpleNamespace(long_market_value=f"{total:.2f}")
+
+
 class TestSync:
     def test_sync_returns_portfolio_state(self, state_manager, mock_account, mock_position):
         """syncはPortfolioStateを返す。"""
@@ -103,12 +117,32 @@ class TestSync:
         # (100000 - 95000) / 95000 * 100 ≈ 5.26%
         assert abs(result.daily_pnl_pct - 5.263) < 0.1
 
+    def test_load_pipeline_context_empty(self, state_manager):
+        """スナップショットなしの場合は両方None。"""
+        context = state_manager.load_pipeline_context()
+        assert context == {"prev_high_water_mark": None, "prev_equity": None}
+
+    def test_load_pipeline_context(self, state_manager, in_memory_db):
+        """過去最大HWMと直近equityを1クエリで返す。"""
+        in_memory_db.executemany(
+            """INSERT INTO daily_snapshots (date, total_equity, cash, positions_value,
+               high_water_mark, open_positions)
+               VALUES (?, ?, 50000, 0, ?, 0)""",
+            [("2024-01-01", 110000, 110000), ("2024-01-02", 104000, 110000)],
+        )
+        in_memory_db.commit()
+
+        context = state_manager.load_pipeline_context()
+
+        assert context["prev_high_water_mark"] == 110000.0
+        assert context["prev_equity"] == 104000.0
+
 
 class TestReconcile:
     def test_reconcile_no_issues(self, state_manager):
         """差異なしの場合。"""
         client = state_manager._get_client()
-        client.get_all_positions.return_value = []
+        _set_alpaca_positions(client, [])
 
         issues = state_manager.reconcile()
         assert issues == []
@@ -116,7 +150,7 @@ class TestReconcile:
     def test_reconcile_added_missing(self, state_manager, mock_position):
         """Alpacaにあるが、DBにないポジション。"""
         client = state_manager._get_client()
-        client.get_all_positions.return_value = [mock_position]
+        _set_alpaca_positions(client, [mock_position])
 
         issues = state_manager.reconcile()
 
@@ -133,7 +167,7 @@ class TestReconcile:
         in_memory_db.commit()
 
         client = state_manager._get_client()
-        client.get_all_positions.return_value = []
+        _set_alpaca_positions(client, [])
 
         issues = state_manager.reconcile()
 
@@ -149,7 +183,7 @@ class TestReconcile:
         in_memory_db.commit()
 
         client = state_manager._get_client()
-        client.get_all_positions.return_value = []
+        _set_alpaca_positions(client, [])
 
         state_manager.reconcile()
 
@@ -167,7 +201,7 @@ class TestReconcile:
         in_memory_db.commit()
 
         client = state_manager._get_client()
-        client.get_all_positions.return_value = []
+        _set_alpaca_positions(client, [])
 
         issues = state_manager.reconcile()
 
@@ -175,24 +209,112 @@ class TestReconcile:
         # 自動修正されていない
         row = in_memory_db.execute("SELECT status FROM positions WHERE symbol = 'AAPL'").fetchone()
         assert row["status"] == "open"
+        logs = in_memory_db.execute(
+            "SELECT symbol, issue_type, auto_fixed FROM reconciliation_logs ORDER BY symbol"
+        ).fetchall()
+        assert [tuple(r) for r in logs] == [
+            ("AAPL", "CLOSED_MISSING", 0),
+            ("GOOGL", "CLOSED_MISSING", 0),
+            ("MSFT", "CLOSED_MISSING", 0),
+        ]
+
+    def test_reconcile_rolls_back_on_failure(self, state_manager, in_memory_db):
+        """ログ記録に失敗したら自動修正も含めてロールバックする。"""
+        in_memory_db.execute(
+            """INSERT INTO positions (symbol, qty, entry_price, entry_date, status, sector)
+               VALUES ('AAPL', 10, 150.0, '2024-01-01', 'open', 'Technology')"""
+        )
+        in_memory_db.commit()
+        in_memory_db.execute("DROP TABLE reconciliation_logs")
+        in_memory_db.commit()
+
+        client = state_manager._get_client()
+        _set_alpaca_positions(client, [])
+
+        with pytest.raises(sqlite3.OperationalError):
+            state_manager.reconcile()
+
+        row = in_memory_db.execute("SELECT status FROM positions WHERE symbol = 'AAPL'").fetchone()
+        assert row["status"] == "open"
 
-    def test_reconcile_api_inconsistency(self, state_manager):
-        """2回のAPI呼び出しが不一致の場合、中断。"""
-        pos1 = MagicMock()
-        pos1.symbol = "AAPL"
-        pos1.qty = "10"
+    def test_reconcile_issue_order_is_deterministic(self, state_manager, in_memory_db):
+        """差異は種類ごとに銘柄順で並ぶ（API の返却順に依存しない）。"""
+        for symbol, qty in [("MSFT", 10), ("JPM", 10), ("NVDA", 3), ("AMZN", 5)]:
+            in_memory_db.execute(
+                """INSERT INTO positions (symbol, qty, entry_price, entry_date, status, sector)
+                   VALUES (?, ?, 150.0, '2024-01-01', 'open', 'Technology')""",
+                (symbol, qty),
+            )
+        in_memory_db.commit()
 
-        pos2 = MagicMock()
-        pos2.symbol = "AAPL"
-        pos2.qty = "15"
+        client = state_manager._get_client()
+        _set_alpaca_positions(
+            client,
+            [
+                _position("TSLA", "1", "200.00"),
+                _position("NVDA", "4", "400.00"),
+                _position("AAPL", "2", "300.00"),
+                _position("AMZN", "6", "600.00"),
+            ],
+        )
 
+        issues = state_manager.reconcile()
+
+        assert [i.split(" - ")[0] for i in issues] == [
+            "ADDED_MISSING: AAPL",
+            "ADDED_MISSING: TSLA",
+            "CLOSED_MISSING: JPM",
+            "CLOSED_MISSING: MSFT",
+            "QTY_MISMATCH: AMZN",
+            "QTY_MISMATCH: NVDA",
+        ]
+
+    def test_reconcile_api_inconsistency(self, state_manager):
+        """ポジション評価額と口座評価額の不一致が取り直しても続く場合、中断。"""
         client = state_manager._get_client()
-        client.get_all_positions.side_effect = [[pos1], [pos2]]
+        _set_alpaca_positions(client, [_position("AAPL", "10", "1550.00")])
+        client.get_account.return_value = SimpleNamespace(long_market_value="3100.00")
 
         issues = state_manager.reconcile()
 
         assert len(issues) == 1
         assert "API_INCONSISTENT" in issues[0]
+        assert client.get_all_positions.call_count == 2
+
+    def test_reconcile_retries_once_on_inconsistency(self, state_manager, mock_position):
+        """1回目が不一致でも、取り直して一致すれば続行する。"""
+        client = state_manager._get_client()
+        _set_alpaca_positions(client, [mock_position])
+        client.get_account.side_effect = [
+            SimpleNamespace(long_market_value="3100.00"),
+            SimpleNamespace(long_market_value="1550.00"),
+        ]
+
+        issues = state_manager.reconcile()
+
+        assert len(issues) == 1
+        assert "ADDED_MISSING" in issues[0]
+        assert client.get_all_positions.call_count == 2
+
+    def test_reconcile_single_positions_call(self, state_manager, mock_position):
+        """整合していればポジション取得は1回だけ。"""
+        client = state_manager._get_client()
+        _set_alpaca_positions(client, [mock_position])
+
+        state_manager.reconcile()
+
+        assert client.get_all_positions.call_count == 1
+        assert client.get_account.call_count == 1
+
+    def test_reconcile_tolerates_small_price_drift(self, state_manager, mock_position):
+        """2つのAPI呼び出し間の小さな価格変動は許容する。"""
+        client = state_manager._get_client()
+        _set_alpaca_positions(client, [mock_position])
+        client.get_account.return_value = SimpleNamespace(long_market_value="1560.00")
+
+        issues = state_manager.reconcile()
+
+        assert not any("API_INCONSISTENT" in i for i in issues)
 
     def test_reconcile_qty_mismatch(self, state_manager, in_memory_db):
         """数量不一致の検出。"""
@@ -202,12 +324,8 @@ class TestReconcile:
         )
         in_memory_db.commit()
 
-        pos = MagicMock()
-        pos.symbol = "AAPL"
-        pos.qty = "10"
-
         client = state_manager._get_client()
-        client.get_all_positions.return_value = [pos]
+        _set_alpaca_positions(client, [_position("AAPL", "10", "1550.00")])
 
         issues = state_manager.reconcile()
 
@@ -410,6 +528,28 @@ class TestExecutionLog:
         assert row["status"] == "success"
         assert row["execution_time_ms"] == 300000
 
+    def test_record_execution_log_update_keeps_start(self, state_manager, in_memory_db):
+        """更新時は mode / started_at を書き換えず、行も増えない。"""
+        state_manager.record_execution_log(
+            execution_id="test-456",
+            mode="morning",
+            status="running",
+            started_at="2024-01-01T09:00:00",
+        )
+        state_manager.record_execution_log(
+            execution_id="test-456",
+            mode="eod",
+            status="error",
+            started_at="2024-01-01T16:00:00",
+            error_message="boom",
+        )
+
+        rows = in_memory_db.execute(
+            "SELECT mode, started_at, status, error_message FROM execution_logs "
+            "WHERE execution_id = 'test-456'"
+        ).fetchall()
+        assert [tuple(r) for r in rows] == [("morning", "2024-01-01T09:00:00", "error", "boom")]
+
     def test_get_today_entry_count(self, state_manager, in_memory_db):
         """当日エントリー数カウント。"""
         today = date.today().isoformat()
@@ -424,3 +564,136 @@ class TestExecutionLog:
         in_memory_db.commit()
 
         assert state_manager.get_today_entry_count() == 2
+
+
+def _decision(symbol: str, action: Action, confidence: int) -> TradingDecision:
+    """テスト用TradingDecision作成ヘルパー。"""
+    return TradingDecision(
+        symbol=symbol,
+        action=action,
+        confidence=confidence,
+        entry_price=100.0,
+        stop_loss=95.0,
+        take_profit=110.0,
+        reasoning_bull="",
+        reasoning_bear="",
+        catalyst="",
+    )
+
+
+class TestTransaction:
+    @staticmethod
+    def _result(symbol: str) -> OrderResult:
+        return OrderResult(
+            symbol=symbol,
+            success=True,
+            alpaca_order_id=f"order-{symbol}",
+            client_order_id=f"exec_{symbol}_buy",
+            filled_qty=10,
+            filled_price=100.0,
+        )
+
+    def test_commits_once_at_end(self, sample_config):
+        """ブロック内の書き込みはまとめて1回だけコミットされる。"""
+        conn = MagicMock()
+        sm = AlpacaStateManager(sample_config, conn, trading_client=MagicMock())
+
+        with sm.transaction():
+            sm.record_trade(self._result("AAPL"), None)
+            sm.record_trade(self._result("MSFT"), None)
+            conn.commit.assert_not_called()
+
+        conn.commit.assert_called_once()
+
+    def test_rollback_on_error(self, state_manager, in_memory_db):
+        """例外時はブロック内の書き込みを全てロールバックする。"""
+        with pytest.raises(RuntimeError), state_manager.transaction():
+            state_manager.open_position(_decision("AAPL", Action.BUY, 80), self._result("AAPL"))
+            raise RuntimeError("boom")
+
+        count = in_memory_db.execute("SELECT COUNT(*) FROM positions").fetchone()[0]
+        assert count == 0
+
+    def test_close_position_links_trade(self, state_manager, in_memory_db):
+        """クローズしたposition_idをSELLのtradeに紐付けられる。"""
+        pos_id = state_manager.open_position(
+            _decision("AAPL", Action.BUY, 80), self._result("AAPL")
+        )
+        with state_manager.transaction():
+            closed_id = state_manager.close_position("AAPL", "signal", 110.0)
+            state_manager.record_trade(self._result("AAPL"), closed_id)
+
+        assert closed_id == pos_id
+        row = in_memory_db.execute("SELECT position_id FROM trades").fetchone()
+        assert row["position_id"] == pos_id
+
+
+class TestRecordDecisions:
+    def test_record_decisions_batch(self, state_manager, in_memory_db):
+        """判断を銘柄ごとに1行ずつ保存する。"""
+        decisions = [
+            _decision("AAPL", Action.BUY, 85),
+            _decision("MSFT", Action.HOLD, 40),
+        ]
+
+        state_manager.record_decisions("exec-1", decisions)
+
+        rows = in_memory_db.execute(
+            "SELECT symbol, action, confidence FROM decisions "
+            "WHERE execution_id = 'exec-1' ORDER BY symbol"
+        ).fetchall()
+        assert [tuple(r) for r in rows] == [("AAPL", "buy", 85), ("MSFT", "hold", 40)]
+
+    def test_record_decisions_replaces_same_key(self, state_manager, in_memory_db):
+        """同じ (execution_id, symbol) は上書きされる。"""
+        state_manager.record_decisions("exec-1", [_decision("AAPL", Action.BUY, 85)])
+        state_manager.record_decisions("exec-1", [_decision("AAPL", Action.SELL, 70)])
+
+        rows = in_memory_db.execute("SELECT action FROM decisions").fetchall()
+        assert [r["action"] for r in rows] == ["sell"]
+
+    def test_record_decisions_from_partial_llm_output(self, state_manager, in_memory_db):
+        """サニタイズ済みの部分出力でも CHECK 制約に違反せず保存できる。"""
+        from modules.llm_analyzer import _parse_decisions, _sanitize_partial
+
+        partial = _sanitize_partial(
+            {
+                "decisions": [
+                    {"symbol": "AAPL", "action": "BUY", "sentiment_analysis": {"confidence": 150}},
+                    {"symbol": "MSFT", "action": "hold", "sentiment_analysis": {"confidence": "?"}},
+                    {"symbol": "NVDA", "action": "sell"},
+                ]
+            }
+        )
+
+        state_manager.record_decisions("exec-1", _parse_decisions(partial["decisions"], {}))
+
+        rows = in_memory_db.execute(
+            "SELECT symbol, confidence FROM decisions WHERE execution_id = 'exec-1' ORDER BY symbol"
+        ).fetchall()
+        assert [tuple(r) for r in rows] == [("AAPL", 100), ("MSFT", 0), ("NVDA", 0)]
+
+
+class TestReadConnection:
+    def test_reads_use_reader_writes_use_writer(self, sample_config, tmp_path):
+        """参照は読み取り接続、書き込みはライター接続を使う。"""
+        from modules.db import init_db, open_reader
+
+        db_path = str(tmp_path / "test.db")
+        writer = init_db(db_path)
+        reader = open_reader(db_path)
+        try:
+            sm = AlpacaStateManager(
+                sample_config, writer, trading_client=MagicMock(), read_conn=reader
+            )
+            sm.record_execution_log(
+                execution_id="test-rw",
+                mode="morning",
+                status="success",
+                started_at="2024-01-01T09:00:00",
+            )
+            assert sm.check_execution_id("test-rw") is True
+            assert sm._read_conn is reader
+        finally:
+            reader.close()
+            writer.close()
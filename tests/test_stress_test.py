@@ -1,5 +1,9 @@
 """ストレステストモジュールのテスト。"""
 
+import random
+
+import pytest
+
 from modules.stress_test import (
     ALL_SCENARIOS,
     COVID_CRASH,
@@ -7,6 +11,8 @@ from modules.stress_test import (
     INFLATION_SHOCK,
     SVB_CRISIS,
     YEN_CARRY_UNWIND,
+    Scenario,
+    ScenarioDay,
     ScenarioResult,
     format_stress_test_report,
     run_all_stress_tests,
@@ -73,6 +79,72 @@ class TestRunScenario:
         result = run_scenario(FLASH_CRASH)
         assert len(result.daily_equity) == len(FLASH_CRASH.days)
 
+    def test_empty_scenario(self):
+        result = run_scenario(Scenario("empty", "", []))
+        assert result.final_equity == result.initial_equity
+        assert result.daily_equity == []
+        assert result.circuit_breaker_triggers == []
+
+    def test_l3_trigger_closes_all_positions(self):
+        """L3以上の発動翌日からは資産が変動しない。"""
+        days = [ScenarioDay(1, -20.0, 50), ScenarioDay(2, -5.0, 60), ScenarioDay(3, 8.0, 40)]
+        result = run_scenario(Scenario("crash", "", days), position_exposure_pct=100.0)
+        assert result.circuit_breaker_triggers[0]["level"] == 4
+        assert result.daily_equity == [80_000.0, 80_000.0, 80_000.0]
+
+
+def _reference_run(scenario, exposure_pct, thresholds):
+    """日ごとのループで計算する参照実装（資産推移・最大DD・発動記録）。"""
+    equity = hwm = 100_000.0
+    exposure = exposure_pct / 100.0
+    cb_active = False
+    max_dd = 0.0
+    daily, triggers = [], []
+    for day in scenario.days:
+        if cb_active:
+            exposure = min(exposure, 0.3)
+        equity *= 1 + day.spy_return_pct / 100.0 * exposure
+        daily.append(equity)
+        hwm = max(hwm, equity)
+        dd = (hwm - equity) / hwm * 100
+        max_dd = max(max_dd, dd)
+        level = max((lv for lv, th in thresholds.items() if dd >= th), default=0)
+        if level and not cb_active:
+            cb_active = True
+            triggers.append((day.day, level))
+            if level >= 3:
+                exposure = 0.0
+    return daily, max_dd, triggers
+
+
+class TestVectorizedSimulation:
+    @pytest.mark.parametrize("scenario", ALL_SCENARIOS, ids=lambda s: s.name)
+    @pytest.mark.parametrize("exposure_pct", [30.0, 80.0, 100.0])
+    @pytest.mark.parametrize(
+        "thresholds",
+        [{1: 4.0, 2: 7.0, 3: 10.0, 4: 15.0}, {1: 1.0, 2: 2.0, 3: 3.0, 4: 5.0}],
+    )
+    def test_matches_day_by_day_loop(self, scenario, exposure_pct, thresholds):
+        result = run_scenario(
+            scenario, position_exposure_pct=exposure_pct, cb_thresholds=thresholds
+        )
+        daily, max_dd, triggers = _reference_run(scenario, exposure_pct, thresholds)
+        assert result.daily_equity == daily
+        assert result.max_drawdown_pct == max_dd
+        assert [(t["day"], t["level"]) for t in result.circuit_breaker_triggers] == triggers
+
+    def test_long_scenario_matches_loop(self):
+        rng = random.Random(1)
+        days = [ScenarioDay(i, rng.gauss(0.05, 1.5), 20) for i in range(1, 1001)]
+        scenario = Scenario("long", "", days)
+        thresholds = {1: 4.0, 2: 7.0, 3: 10.0, 4: 15.0}
+        result = run_scenario(scenario, cb_thresholds=thresholds)
+        daily, max_dd, triggers = _reference_run(scenario, 80.0, thresholds)
+        assert result.daily_equity == daily
+        assert result.final_equity == daily[-1]
+        assert result.max_drawdown_pct == max_dd
+        assert [(t["day"], t["level"]) for t in result.circuit_breaker_triggers] == triggers
+
 
 class TestScenarioResult:
     def test_total_return_pct(self):
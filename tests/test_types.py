@@ -152,6 +152,35 @@ class TestPortfolioState:
         assert "AAPL" in portfolio.positions
         assert portfolio.high_water_mark == 101000.0
 
+    def test_sector_counts(self) -> None:
+        """セクター別保有数は positions から集計され、同じインスタンスでは再計算しない。"""
+        positions = {
+            symbol: PositionInfo(
+                symbol=symbol,
+                qty=1.0,
+                avg_entry_price=100.0,
+                current_price=100.0,
+                unrealized_pnl=0.0,
+                sector=sector,
+            )
+            for symbol, sector in [
+                ("AAPL", "Technology"),
+                ("MSFT", "Technology"),
+                ("JPM", "Financials"),
+            ]
+        }
+        portfolio = PortfolioState(
+            equity=100000.0,
+            cash=50000.0,
+            buying_power=100000.0,
+            positions=positions,
+            daily_pnl_pct=0.0,
+            drawdown_pct=0.0,
+        )
+        assert portfolio.sector_counts == {"Technology": 2, "Financials": 1}
+        assert portfolio.sector_counts["Energy"] == 0
+        assert portfolio.sector_counts is portfolio.sector_counts
+
 
 class TestTradingDecision:
     def test_create(self) -> None:
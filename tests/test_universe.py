@@ -4,6 +4,7 @@ from modules.universe import (
     DEFAULT_UNIVERSE,
     get_all_sectors,
     get_sector,
+    get_sectors,
     get_sectors_map,
     get_symbols,
     get_symbols_by_sector,
@@ -23,6 +24,9 @@ class TestUniverse:
         assert get_sector("JPM") == "Financials"
         assert get_sector("UNKNOWN") == "Unknown"
 
+    def test_get_sectors(self) -> None:
+        assert get_sectors(["AAPL", "UNKNOWN"]) == {"AAPL": "Technology", "UNKNOWN": "Unknown"}
+
     def test_get_sectors_map(self) -> None:
         mapping = get_sectors_map()
         assert mapping["AAPL"] == "Technology"
@@ -0,0 +1,66 @@
+"""modules/vix_cache.py のテスト。"""
+
+import json
+import time
+from datetime import date
+from unittest.mock import patch
+
+from modules import vix_cache
+from modules.vix_cache import _yf_ticker, get_vix
+
+TODAY = date(2024, 1, 15)
+
+
+class TestGetVix:
+    @patch("modules.vix_cache._download_vix", return_value=18.5)
+    def test_miss_downloads_and_writes_cache(self, mock_download, tmp_path) -> None:
+        assert get_vix(str(tmp_path), 3600, today=TODAY) == 18.5
+        payload = json.loads((tmp_path / "vix_20240115.json").read_text())
+        assert payload["value"] == 18.5
+        mock_download.assert_called_once()
+
+    @patch("modules.vix_cache._download_vix", return_value=18.5)
+    def test_hit_skips_download(self, mock_download, tmp_path) -> None:
+        get_vix(str(tmp_path), 3600, today=TODAY)
+        assert get_vix(str(tmp_path), 3600, today=TODAY) == 18.5
+        mock_download.assert_called_once()
+
+    @patch("modules.vix_cache._download_vix", return_value=22.0)
+    def test_expired_cache_refetches(self, mock_download, tmp_path) -> None:
+        stale = {"ts": time.time() - 7200, "value": 18.5}
+        (tmp_path / "vix_20240115.json").write_text(json.dumps(stale))
+        assert get_vix(str(tmp_path), 3600, today=TODAY) == 22.0
+        mock_download.assert_called_once()
+
+    @patch("modules.vix_cache._download_vix", return_value=22.0)
+    def test_corrupt_cache_refetches(self, mock_download, tmp_path) -> None:
+        (tmp_path / "vix_20240115.json").write_text("not json")
+        assert get_vix(str(tmp_path), 3600, today=TODAY) == 22.0
+
+    @patch("modules.vix_cache._download_vix", return_value=None)
+    def test_failure_not_cached(self, mock_download, tmp_path) -> None:
+        assert get_vix(str(tmp_path), 3600, today=TODAY) is None
+        assert not (tmp_path / "vix_20240115.json").exists()
+
+    @patch("modules.vix_cache._download_vix", return_value=18.5)
+    def test_ttl_zero_disables_cache(self, mock_download, tmp_path) -> None:
+        get_vix(str(tmp_path), 0, today=TODAY)
+        get_vix(str(tmp_path), 0, today=TODAY)
+        assert mock_download.call_count == 2
+        assert list(tmp_path.iterdir()) == []
+
+    @patch("modules.vix_cache._download_vix", return_value=18.5)
+    def test_old_days_removed(self, mock_download, tmp_path) -> None:
+        (tmp_path / "vix_20240112.json").write_text("{}")
+        get_vix(str(tmp_path), 3600, today=TODAY)
+        assert [p.name for p in tmp_path.iterdir()] == ["vix_20240115.json"]
+
+
+class TestYfTicker:
+    def test_ticker_reused(self) -> None:
+        with (
+            patch.dict(vix_cache._ticker_cache, clear=True),
+            patch("yfinance.Ticker") as mock_ticker,
+        ):
+            assert _yf_ticker("^VIX") is _yf_ticker("^VIX")
+            mock_ticker.assert_called_once_with("^VIX")